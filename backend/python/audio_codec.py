@@ -0,0 +1,186 @@
+"""
+Compressed audio for everything the server sends to listeners
+Synthesized speech comes out of the TTS engine as 22 kHz PCM WAV (~44 KB per
+second); encoded as Opus at 24 kbit/s the same speech is ~3 KB per second.
+Encoding runs through ffmpeg pipes, in memory. Without ffmpeg (or when
+encoding fails) the audio stays WAV, so callers always get something
+playable; the returned format says which one it is.
+
+relay() prepares received audio (e.g. a speaker's WebM/Opus chunk) for
+rebroadcast: audio that is already in the requested codec is only remuxed,
+never re-encoded.
+
+Environment:
+    TTS_OUTPUT_FORMAT   wav, opus, ogg, mp3 or webm (default wav)
+    TTS_OUTPUT_BITRATE  encoder bitrate, e.g. 24k (default 24k)
+"""
+
+import io
+import os
+import sys
+import time
+import wave
+import shutil
+import threading
+import subprocess
+
+OUTPUT_FORMAT = os.getenv('TTS_OUTPUT_FORMAT', 'wav').lower()
+BITRATE = os.getenv('TTS_OUTPUT_BITRATE', '24k')
+
+# format -> (file extension, ffmpeg codec and container arguments). Opus at
+# compression level 5 encodes speech about twice as fast as the default 10
+# for a file within 1% of the size.
+FORMATS = {
+    'wav': ('wav', ['-c:a', 'pcm_s16le', '-f', 'wav']),
+    'opus': ('opus', ['-c:a', 'libopus', '-application', 'voip', '-compression_level', '5', '-f', 'ogg']),
+    'ogg': ('ogg', ['-c:a', 'libvorbis', '-f', 'ogg']),
+    'mp3': ('mp3', ['-c:a', 'libmp3lame', '-f', 'mp3']),
+    'webm': ('webm', ['-c:a', 'libopus', '-application', 'voip', '-compression_level', '5', '-f', 'webm']),
+}
+# Codec inside each compressed format, to decide when relay() can skip re-encoding
+CODECS = {'opus': 'opus', 'webm': 'opus', 'ogg': 'vorbis', 'mp3': 'mp3'}
+
+SILENCE_SECONDS = 1.0
+SILENCE_SAMPLE_RATE = 22050
+
+_lock = threading.Lock()
+_ffmpeg = None  # path, '' when not installed
+_silence = {}   # format -> encoded bytes
+_stats = {'encodes': 0, 'failures': 0, 'encode_time': 0.0, 'bytes_in': 0, 'bytes_out': 0,
+          'remuxes': 0, 'silence_hits': 0}
+
+
+def _ffmpeg_path():
+    global _ffmpeg
+    if _ffmpeg is None:
+        _ffmpeg = shutil.which('ffmpeg') or ''
+        if not _ffmpeg:
+            print("[WARNING] ffmpeg not found, audio stays uncompressed WAV", file=sys.stderr)
+    return _ffmpeg
+
+
+def extension(audio_format):
+    return FORMATS.get(audio_format, FORMATS['wav'])[0]
+
+
+def with_extension(path, audio_format):
+    """path with its extension replaced by the one of audio_format"""
+    return f"{os.path.splitext(path)[0]}.{extension(audio_format)}"
+
+
+def _run_ffmpeg(data, output_args, input_args=()):
+    command = [_ffmpeg_path(), '-hide_banner', '-loglevel', 'error', *input_args, '-i', 'pipe:0',
+               '-vn', *output_args, 'pipe:1']
+    result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def encode(data, audio_format=None, bitrate=None):
+    """
+    Encode audio bytes (WAV or anything ffmpeg reads) to audio_format
+    Returns (bytes, format_used); format_used is 'wav' with the input
+    returned unchanged when encoding is unavailable or fails.
+    """
+    audio_format = audio_format or OUTPUT_FORMAT
+    if audio_format == 'wav' or audio_format not in FORMATS or not _ffmpeg_path():
+        return data, 'wav'
+
+    start = time.perf_counter()
+    try:
+        # Speech: mono is enough and halves the bitrate the encoder spends
+        encoded = _run_ffmpeg(data, ['-ac', '1', *FORMATS[audio_format][1], '-b:a', bitrate or BITRATE])
+    except (RuntimeError, OSError) as e:
+        print(f"[WARNING] Encoding to {audio_format} failed, keeping WAV: {e}", file=sys.stderr)
+        with _lock:
+            _stats['failures'] += 1
+        return data, 'wav'
+
+    with _lock:
+        _stats['encodes'] += 1
+        _stats['encode_time'] += time.perf_counter() - start
+        _stats['bytes_in'] += len(data)
+        _stats['bytes_out'] += len(encoded)
+    return encoded, audio_format
+
+
+def relay(data, source_format, audio_format=None, bitrate=None):
+    """
+    Received audio in source_format ('webm', 'ogg', 'wav', ...) prepared for
+    rebroadcast as audio_format. Same format: unchanged. Same codec in another
+    container: remuxed without re-encoding. Otherwise encoded.
+    Returns (bytes, format_used).
+    """
+    audio_format = audio_format or OUTPUT_FORMAT
+    if audio_format == source_format:
+        return data, source_format
+    if CODECS.get(source_format) and CODECS.get(source_format) == CODECS.get(audio_format) and _ffmpeg_path():
+        try:
+            remuxed = _run_ffmpeg(data, ['-c:a', 'copy', '-f', FORMATS[audio_format][1][-1]])
+            with _lock:
+                _stats['remuxes'] += 1
+            return remuxed, audio_format
+        except (RuntimeError, OSError) as e:
+            print(f"[WARNING] Remux {source_format} -> {audio_format} failed: {e}", file=sys.stderr)
+    if audio_format == 'wav' or source_format in CODECS:
+        # Compressed input is never expanded back to WAV for relaying
+        return data, source_format
+    return encode(data, audio_format, bitrate)
+
+
+def silence(audio_format=None):
+    """One second of silence in audio_format, encoded once per process; (bytes, format_used)"""
+    audio_format = audio_format or OUTPUT_FORMAT
+    with _lock:
+        cached = _silence.get(audio_format)
+        if cached is not None:
+            _stats['silence_hits'] += 1
+            return cached
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SILENCE_SAMPLE_RATE)
+        wav_file.writeframes(b'\x00\x00' * int(SILENCE_SAMPLE_RATE * SILENCE_SECONDS))
+    result = encode(buffer.getvalue(), audio_format)
+    with _lock:
+        _silence[audio_format] = result
+    return result
+
+
+def write_audio(data, audio_format, output_path):
+    """Write encoded audio next to output_path with the format's extension; returns the path"""
+    path = with_extension(output_path, audio_format)
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def get_codec_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['format'] = OUTPUT_FORMAT
+    stats['bitrate'] = BITRATE
+    stats['avg_encode_ms'] = stats['encode_time'] / stats['encodes'] * 1000 if stats['encodes'] else 0.0
+    stats['compression_ratio'] = stats['bytes_in'] / stats['bytes_out'] if stats['bytes_out'] else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    # Re-encode or relay a file: python audio_codec.py <input> <output_base> [format]
+    if len(sys.argv) < 3:
+        print("Usage: python audio_codec.py <input_file> <output_path> [format]")
+        sys.exit(1)
+
+    input_path, output_path = sys.argv[1], sys.argv[2]
+    audio_format = sys.argv[3] if len(sys.argv) > 3 else OUTPUT_FORMAT
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    source_format = os.path.splitext(input_path)[1].lstrip('.').lower()
+    data, used = relay(data, source_format, audio_format)
+    print(write_audio(data, used, output_path))
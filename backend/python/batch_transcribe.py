@@ -0,0 +1,557 @@
+"""
+Bulk transcription and translation of long recordings
+A file (or every audio file in a directory) is decoded as a stream and cut
+into overlapping windows; windows are transcribed, and their text
+translated, in parallel on a process pool. Only a bounded number of windows
+is in flight at once, so memory stays flat however long the recording is.
+
+Results are written in order as they complete, per input file:
+    <name>.jsonl           one line per window: start, end, text, translations
+    <name>.srt             subtitles in the recording's language
+    <name>.<lang>.srt      subtitles per target language
+    <name>.checkpoint.json progress; an interrupted run picks up from here
+
+A window that fails (recognizer unreachable, worker error) is written with
+an "error" and kept in the checkpoint; running the same command again
+retries the windows that failed in earlier runs, appends their lines to <name>.jsonl (a later
+line for an index replaces the earlier one) and rewrites the subtitles. A
+recording is only marked done once no failed windows remain. The engine is
+checked before the first window: a missing recognizer package or offline
+model stops the run with one message instead of failing every window.
+
+Words repeated in the overlap of two windows are dropped from the second
+window's text. Subtitle cues cover each window minus half the overlap on
+each side, so their times are window-accurate, not word-accurate.
+
+    python batch_transcribe.py meeting.webm --targets ta,hi --output-dir out/
+    python batch_transcribe.py recordings/ --language en-US --engine offline
+
+Environment:
+    BATCH_WINDOW_SECONDS   window length (default 30)
+    BATCH_OVERLAP_SECONDS  overlap between windows (default 2)
+    BATCH_WORKERS          worker processes (default: CPU count)
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import subprocess
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from decoder import PCMConverter, read_wav_header, SAMPLE_RATE
+
+WINDOW_SECONDS = float(os.getenv('BATCH_WINDOW_SECONDS', '30'))
+OVERLAP_SECONDS = float(os.getenv('BATCH_OVERLAP_SECONDS', '2'))
+WORKERS = int(os.getenv('BATCH_WORKERS', '0')) or os.cpu_count() or 1
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.opus', '.mp3', '.m4a', '.flac', '.aac', '.mp4', '.mkv')
+READ_SECONDS = 1.0  # decoded per read, independent of the window length
+CHECKPOINT_VERSION = 2
+# Repeated words at a window boundary: at least 2 (a single common word is
+# more often a real repetition), at most what a few seconds of speech holds
+MIN_OVERLAP_WORDS = 2
+MAX_OVERLAP_WORDS = 12
+RECOGNIZER_ERRORS = ('Speech recognition service error', 'Error processing audio')
+
+
+def find_audio_files(path):
+    """path itself, or the audio files under a directory in name order"""
+    if not os.path.isdir(path):
+        return [path]
+    found = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        found.extend(os.path.join(root, name) for name in sorted(files)
+                     if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS)
+    return found
+
+
+def _read_pcm_wav(path, start_seconds):
+    with wave.open(path, 'rb') as wav_file:
+        rate, channels, width = wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()
+        wav_file.setpos(min(int(start_seconds * rate), wav_file.getnframes()))
+        converter = PCMConverter(rate, channels)
+        while True:
+            frames = wav_file.readframes(int(READ_SECONDS * rate))
+            if not frames:
+                break
+            yield converter.convert(frames, width)
+        yield converter.flush()
+
+
+def _read_pcm_ffmpeg(path, start_seconds):
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found; only WAV recordings can be read")
+    # Native rate and channels out as WAV, resampled here like every other decode
+    command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-ss', f"{start_seconds:.3f}", '-i', path,
+               '-vn', '-c:a', 'pcm_s16le', '-f', 'wav', 'pipe:1']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finished = False
+    try:
+        rate, channels, width = read_wav_header(process.stdout)
+        converter = PCMConverter(rate, channels)
+        block = int(READ_SECONDS * rate) * channels * width
+        while True:
+            data = process.stdout.read(block)
+            if not data:
+                break
+            yield converter.convert(data, width)
+        yield converter.flush()
+        finished = True
+    except EOFError:
+        finished = True  # no audio stream: nothing to yield
+    finally:
+        if not finished:
+            process.kill()  # stopped early (interrupted, or the caller had enough)
+        process.stdout.close()
+        error = process.stderr.read().decode(errors='replace').strip()
+        process.stderr.close()
+        if process.wait() != 0 and error and finished:
+            raise RuntimeError(f"ffmpeg failed on {path}: {error}")
+
+
+def read_pcm(path, start_seconds=0.0):
+    """16 kHz mono int16 blocks of a recording from start_seconds on, decoded as it is read"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return _read_pcm_wav(path, start_seconds)
+    return _read_pcm_ffmpeg(path, start_seconds)
+
+
+def windows(path, window=WINDOW_SECONDS, overlap=OVERLAP_SECONDS, first_index=0):
+    """
+    (index, start_seconds, end_seconds, pcm bytes) of overlapping windows
+    Window i starts at i * (window - overlap); first_index resumes mid-file
+    without decoding what comes before it.
+    """
+    if not 0 <= overlap < window:
+        raise ValueError("overlap must be at least 0 and shorter than the window")
+    hop = window - overlap
+    window_samples = int(window * SAMPLE_RATE)
+    hop_samples = int(hop * SAMPLE_RATE)
+    overlap_samples = window_samples - hop_samples
+
+    index = first_index
+    buffer = np.empty(window_samples, dtype='<i2')
+    filled = 0
+    for block in read_pcm(path, index * hop):
+        offset = 0
+        while offset < len(block):
+            take = min(len(block) - offset, window_samples - filled)
+            buffer[filled:filled + take] = block[offset:offset + take]
+            filled += take
+            offset += take
+            if filled == window_samples:
+                start = index * hop
+                yield index, start, start + window, buffer[:filled].tobytes()
+                # The overlap stays as the beginning of the next window
+                buffer[:overlap_samples] = buffer[hop_samples:filled]
+                filled = overlap_samples
+                index += 1
+    # The last, shorter window, unless it holds nothing new
+    if filled > (overlap_samples if index else 0):
+        start = index * hop
+        yield index, start, start + filled / SAMPLE_RATE, buffer[:filled].tobytes()
+
+
+def merge_overlap(previous, text):
+    """text without the words that repeat the end of previous (the window overlap)"""
+    tail = previous.split()[-MAX_OVERLAP_WORDS:]
+    words = text.split()
+
+    def normalize(word):
+        return word.strip('.,!?;:"\'').lower()
+
+    for count in range(min(len(tail), len(words)), MIN_OVERLAP_WORDS - 1, -1):
+        if [normalize(word) for word in tail[-count:]] == [normalize(word) for word in words[:count]]:
+            return ' '.join(words[count:])
+    return text
+
+
+def check_engine(engine, language):
+    """Raise RuntimeError, with what to install, when the engine cannot run at all"""
+    try:
+        if engine == 'offline':
+            import transcribe_offline
+            transcribe_offline._load_vosk()
+            lang_code = transcribe_offline.resolve_language(language)
+            if transcribe_offline.find_model_path(lang_code) is None:
+                raise transcribe_offline.ModelNotFoundError(
+                    f"No offline model for {lang_code} in {transcribe_offline.MODEL_DIR}")
+        else:
+            from transcribe import _load_recognizer
+            _load_recognizer()
+    except ImportError as e:
+        raise RuntimeError(f"The {engine} engine is not installed: {e}") from e
+
+
+def _transcribe_window(pcm, language, engine):
+    """Process pool task: text of one window"""
+    if engine == 'offline':
+        from transcribe_offline import transcribe_pcm
+        return {'text': transcribe_pcm(pcm, language)}
+
+    from transcribe import transcribe_bytes
+    text = transcribe_bytes(pcm, language, 'pcm')
+    if text.startswith(RECOGNIZER_ERRORS):
+        return {'error': text}
+    if text.startswith('Could not understand audio'):
+        return {'text': ''}
+    return {'text': text}
+
+
+def _translate_window(text, targets, source_lang):
+    """Process pool task: {target: translation} of one window's text"""
+    from translate import translate_text_multi
+    return translate_text_multi(text, targets, source_lang)
+
+
+def _window_result(future):
+    """A window's result; an exception in the task (or a crashed pool) counts as a failed window"""
+    try:
+        return future.result()
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def _read_records(path):
+    """{index: record} of a results file, later lines replacing earlier ones"""
+    records = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['index']] = record
+    return records
+
+
+def _cue_times(index, start, end, overlap):
+    """Subtitle times of a window: neighbouring cues share the overlap"""
+    cue_start = start + overlap / 2 if index else start
+    return cue_start, max(cue_start, end - overlap / 2)
+
+
+def _srt_time(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+class _Outputs:
+    """The result files of one recording, appended to and truncated back on resume"""
+
+    def __init__(self, base, targets, sizes=None):
+        self.paths = {'jsonl': f"{base}.jsonl", 'srt': f"{base}.srt"}
+        for target in targets:
+            self.paths[f"srt:{target}"] = f"{base}.{target}.srt"
+        self.files = {}
+        for name, path in self.paths.items():
+            f = open(path, 'ab')
+            # Drop anything written after the last checkpoint
+            f.truncate((sizes or {}).get(name, 0))
+            f.seek(0, os.SEEK_END)
+            self.files[name] = f
+
+    def write(self, name, text):
+        self.files[name].write(text.encode('utf-8'))
+
+    def rewrite(self, name, text):
+        f = self.files[name]
+        f.seek(0)
+        f.truncate()
+        f.write(text.encode('utf-8'))
+
+    def sizes(self):
+        for f in self.files.values():
+            f.flush()
+        return {name: f.tell() for name, f in self.files.items()}
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def _load_checkpoint(path, settings):
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('settings') != settings:
+        print(f"[WARNING] {path} is from other settings or another file; starting over", file=sys.stderr)
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def transcribe_long(path, pool, output_dir=None, language='auto', targets=(), window=WINDOW_SECONDS,
+                    overlap=OVERLAP_SECONDS, engine='online', max_in_flight=2 * WORKERS):
+    """
+    Transcribe (and translate) one recording on pool, a concurrent.futures executor
+    At most max_in_flight windows are decoded and not yet written. Resumes
+    from the recording's checkpoint when there is one, then retries the
+    windows that failed. Returns {'audio_seconds', 'wall_seconds', 'windows',
+    'errors', 'failed', 'retried', 'resumed_at'}; failed lists the windows
+    still without a transcript.
+    """
+    targets = list(dict.fromkeys(targets))
+    source_lang = 'auto' if language == 'auto' else language.split('-')[0]
+    base = os.path.join(output_dir or os.path.dirname(path) or '.', os.path.splitext(os.path.basename(path))[0])
+    checkpoint_path = f"{base}.checkpoint.json"
+
+    stat = os.stat(path)
+    settings = {'source': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                'window': window, 'overlap': overlap, 'language': language, 'targets': targets, 'engine': engine}
+    checkpoint = _load_checkpoint(checkpoint_path, settings) or {
+        'version': CHECKPOINT_VERSION, 'settings': settings, 'next_index': 0, 'last_text': '', 'cues': 0,
+        'audio_seconds': 0.0, 'errors': 0, 'sizes': {}, 'end_index': None, 'failed': [], 'done': False,
+    }
+    summary = {'audio_seconds': 0.0, 'wall_seconds': 0.0, 'windows': 0, 'errors': 0, 'failed': [],
+               'retried': 0, 'resumed_at': checkpoint['next_index']}
+    if checkpoint['done']:
+        print(f"[INFO] {path} already done, see {base}.jsonl", file=sys.stderr)
+        return summary
+
+    start_time = time.perf_counter()
+    outputs = _Outputs(base, targets, checkpoint['sizes'])
+    pending = deque()  # [index, start, end, transcription future, text, translation future], in order
+    last_text = checkpoint['last_text']
+
+    def advance(block):
+        """Merge, translate and write finished windows in order; block: wait for the oldest one"""
+        nonlocal last_text
+        # Overlap merging needs the previous window's text, so it goes in order
+        for entry in pending:
+            if entry[4] is not None:
+                continue
+            if not entry[3].done() and not (block and entry is pending[0]):
+                break
+            result = _window_result(entry[3])
+            raw = result.get('text', '')
+            entry[4] = dict(result, text=merge_overlap(last_text, raw) if raw else '')
+            last_text = raw or last_text
+            if targets and entry[4]['text']:
+                entry[5] = pool.submit(_translate_window, entry[4]['text'], targets, source_lang)
+        while pending and pending[0][4] is not None:
+            entry = pending[0]
+            if entry[5] is not None and not entry[5].done():
+                if not block:
+                    return
+                entry[5].result()
+            pending.popleft()
+            write_window(entry)
+            block = False
+
+    def write_window(entry):
+        index, start, end, _, result, translation = entry
+        record = {'file': os.path.basename(path), 'index': index, 'start': round(start, 3),
+                  'end': round(end, 3), 'text': result['text']}
+        if 'error' in result:
+            record['error'] = result['error']
+            summary['errors'] += 1
+            checkpoint['errors'] += 1
+            if index not in checkpoint['failed']:
+                checkpoint['failed'].append(index)
+        if translation is not None:
+            try:
+                record['translations'] = translation.result()
+            except Exception as e:
+                record['translation_error'] = str(e)
+        outputs.write('jsonl', json.dumps(record, ensure_ascii=False) + '\n')
+
+        if record['text']:
+            cue_start, cue_end = _cue_times(index, start, end, overlap)
+            checkpoint['cues'] += 1
+            timing = f"{checkpoint['cues']}\n{_srt_time(cue_start)} --> {_srt_time(cue_end)}\n"
+            outputs.write('srt', f"{timing}{record['text']}\n\n")
+            for target, translated in record.get('translations', {}).items():
+                outputs.write(f"srt:{target}", f"{timing}{translated}\n\n")
+
+        audio_seconds = end - start - (overlap if index else 0)
+        summary['windows'] += 1
+        summary['audio_seconds'] += audio_seconds
+        checkpoint.update(next_index=index + 1, last_text=last_text, sizes=outputs.sizes(),
+                          audio_seconds=checkpoint['audio_seconds'] + audio_seconds)
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    def retry_failed(failed):
+        """Transcribe failed windows again; the subtitles are rewritten if any succeeded"""
+        print(f"[INFO] Retrying {len(failed)} failed windows of {path}", file=sys.stderr)
+        outputs.sizes()
+        records = _read_records(outputs.paths['jsonl'])
+        for offset in range(0, len(failed), max_in_flight):
+            jobs = []
+            for index in failed[offset:offset + max_in_flight]:
+                for _, start, end, pcm in windows(path, window, overlap, index):
+                    jobs.append((index, start, end, pool.submit(_transcribe_window, pcm, language, engine)))
+                    break
+                else:
+                    checkpoint['failed'].remove(index)  # past the end of the recording
+            for index, start, end, future in jobs:
+                result = _window_result(future)
+                if 'error' in result:
+                    summary['errors'] += 1
+                    continue
+                raw = result.get('text', '')
+                previous = records.get(index - 1, {}).get('text', '')
+                record = {'file': os.path.basename(path), 'index': index, 'start': round(start, 3),
+                          'end': round(end, 3), 'text': merge_overlap(previous, raw) if raw else ''}
+                if targets and record['text']:
+                    try:
+                        record['translations'] = pool.submit(
+                            _translate_window, record['text'], targets, source_lang).result()
+                    except Exception as e:
+                        record['translation_error'] = str(e)
+                outputs.write('jsonl', json.dumps(record, ensure_ascii=False) + '\n')
+                records[index] = record
+                checkpoint['failed'].remove(index)
+                summary['retried'] += 1
+                checkpoint.update(sizes=outputs.sizes())
+                _save_checkpoint(checkpoint_path, checkpoint)
+        if summary['retried']:
+            rewrite_subtitles(records)
+
+    def rewrite_subtitles(records):
+        """Every subtitle file again from the results, in window order"""
+        texts = {name: [] for name in outputs.paths if name.startswith('srt')}
+        cues = 0
+        for index in sorted(records):
+            record = records[index]
+            if not record.get('text'):
+                continue
+            cues += 1
+            cue_start, cue_end = _cue_times(index, record['start'], record['end'], overlap)
+            timing = f"{cues}\n{_srt_time(cue_start)} --> {_srt_time(cue_end)}\n"
+            texts['srt'].append(f"{timing}{record['text']}\n\n")
+            for target, translated in record.get('translations', {}).items():
+                if f"srt:{target}" in texts:
+                    texts[f"srt:{target}"].append(f"{timing}{translated}\n\n")
+        for name, parts in texts.items():
+            outputs.rewrite(name, ''.join(parts))
+        checkpoint.update(cues=cues, sizes=outputs.sizes())
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    # Windows that failed in an earlier run; those failing now wait for the next one
+    failed_before = sorted(checkpoint['failed'])
+    try:
+        if checkpoint['end_index'] is None:
+            for index, start, end, pcm in windows(path, window, overlap, checkpoint['next_index']):
+                while len(pending) >= max_in_flight:
+                    advance(block=True)
+                try:
+                    future = pool.submit(_transcribe_window, pcm, language, engine)
+                except BrokenProcessPool:
+                    # Record the windows in flight as failed, so a rerun retries them
+                    while pending:
+                        advance(block=True)
+                    raise
+                pending.append([index, start, end, future, None, None])
+                advance(block=False)
+            while pending:
+                advance(block=True)
+            checkpoint['end_index'] = checkpoint['next_index']
+            _save_checkpoint(checkpoint_path, checkpoint)
+        if failed_before:
+            retry_failed(failed_before)
+        checkpoint['done'] = not checkpoint['failed']
+        _save_checkpoint(checkpoint_path, checkpoint)
+    finally:
+        outputs.close()
+
+    summary['wall_seconds'] = time.perf_counter() - start_time
+    summary['total_audio_seconds'] = checkpoint['audio_seconds']
+    summary['failed'] = sorted(checkpoint['failed'])
+    return summary
+
+
+def _init_worker():
+    # Windows are short-lived tasks; keep their prints off the parent's stdout
+    sys.stdout = sys.stderr
+
+
+def transcribe_paths(paths, output_dir=None, workers=WORKERS, **options):
+    """
+    Every recording under paths on one process pool; returns the summary with audio-hours per hour
+    Raises RuntimeError before any work when the engine cannot run (see check_engine).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    check_engine(options.get('engine', 'online'), options.get('language', 'auto'))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    files = [found for path in paths for found in find_audio_files(path)]
+    totals = {'files': len(files), 'audio_seconds': 0.0, 'wall_seconds': 0.0, 'windows': 0, 'errors': 0,
+              'retried': 0, 'failed': 0}
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for path in files:
+            summary = transcribe_long(path, pool, output_dir, max_in_flight=2 * workers, **options)
+            for key in ('audio_seconds', 'windows', 'errors', 'retried'):
+                totals[key] += summary[key]
+            totals['failed'] += len(summary['failed'])
+            rate = summary['audio_seconds'] / summary['wall_seconds'] if summary['wall_seconds'] else 0.0
+            print(f"[INFO] {path}: {summary['audio_seconds'] / 60:.1f} min of audio in "
+                  f"{summary['wall_seconds']:.1f} s ({rate:.1f} audio-hours per hour), "
+                  f"{summary['windows']} windows, {summary['errors']} errors, {summary['retried']} retried, "
+                  f"{len(summary['failed'])} still failed", file=sys.stderr)
+    totals['wall_seconds'] = time.perf_counter() - start_time
+    totals['audio_hours_per_hour'] = (totals['audio_seconds'] / totals['wall_seconds']
+                                      if totals['wall_seconds'] else 0.0)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and translate long recordings")
+    parser.add_argument('paths', nargs='+', help="audio files or directories")
+    parser.add_argument('--output-dir', help="where results go (default: next to each recording)")
+    parser.add_argument('--language', default='auto', help="recording language, e.g. en-US (default auto)")
+    parser.add_argument('--targets', default='', help="comma-separated translation languages, e.g. ta,hi")
+    parser.add_argument('--engine', choices=('online', 'offline'), default='online')
+    parser.add_argument('--window', type=float, default=WINDOW_SECONDS, help="window length in seconds")
+    parser.add_argument('--overlap', type=float, default=OVERLAP_SECONDS, help="overlap in seconds")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    try:
+        totals = transcribe_paths(args.paths, args.output_dir, workers=max(1, args.workers), language=args.language,
+                                  targets=[t for t in args.targets.split(',') if t], window=args.window,
+                                  overlap=args.overlap, engine=args.engine)
+    except KeyboardInterrupt:
+        print("[INFO] Interrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    except BrokenProcessPool as e:
+        print(f"[ERROR] The worker pool crashed ({e}); run the same command again to resume", file=sys.stderr)
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(totals, indent=2))
+    if totals['failed']:
+        print(f"[WARNING] {totals['failed']} windows failed; run the same command again to retry them",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-batching for translation APIs that accept arrays of texts
+Concurrent requests for the same key (e.g. (source, target) pair) are
+collected for a short window or until the batch is full, sent as one
+call, and the results are split back to the callers.
+"""
+
+import sys
+import time
+import threading
+
+
+class MicroBatcher:
+    """
+    batch_fn(key, items) must return a list of results, one per item, in order
+    max_batch: flush as soon as this many items are waiting for a key
+    max_wait:  seconds the oldest item of a batch may wait before a flush
+    """
+
+    def __init__(self, batch_fn, max_batch=32, max_wait=0.015, max_concurrent_batches=8, name='batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._pending = {}  # key -> (first_arrival, [(item, future), ...])
+        self._cond = threading.Condition()
+        # Thread and executor start with the first request: batchers are built at
+        # import time, and concurrent.futures alone adds ~8 ms to a CLI start-up
+        self._thread = None
+        self._executor = None
+        self._stats = {'requests': 0, 'batches': 0, 'largest_batch': 0}
+
+    def submit(self, key, item):
+        """Queue one item; returns a Future with its result"""
+        from concurrent.futures import Future
+
+        future = Future()
+        with self._cond:
+            self._ensure_thread()
+            if key not in self._pending:
+                self._pending[key] = (time.monotonic(), [])
+            self._pending[key][1].append((item, future))
+            self._stats['requests'] += 1
+            self._cond.notify()
+        return future
+
+    def call(self, key, item, timeout=None):
+        return self.submit(key, item).result(timeout)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent_batches,
+                thread_name_prefix=f'{self.name}-flush'
+            )
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                ready = self._take_ready_batches()
+                while not ready:
+                    self._cond.wait(self._time_to_next_deadline())
+                    ready = self._take_ready_batches()
+            for key, batch in ready:
+                self._executor.submit(self._flush, key, batch)
+
+    def _time_to_next_deadline(self):
+        """Seconds until the oldest pending batch must be flushed, None if idle"""
+        if not self._pending:
+            return None
+        oldest = min(first for first, _ in self._pending.values())
+        return max(0.0, oldest + self.max_wait - time.monotonic())
+
+    def _take_ready_batches(self):
+        """Remove and return batches that are full or past their window; caller holds the lock"""
+        now = time.monotonic()
+        ready = []
+        for key in list(self._pending):
+            first_arrival, entries = self._pending[key]
+            if len(entries) >= self.max_batch or now - first_arrival >= self.max_wait:
+                del self._pending[key]
+                # Split oversized batches so each call respects max_batch
+                for start in range(0, len(entries), self.max_batch):
+                    ready.append((key, entries[start:start + self.max_batch]))
+        return ready
+
+    def _flush(self, key, batch):
+        with self._cond:
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+
+        items = [item for item, _ in batch]
+        try:
+            results = self.batch_fn(key, items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(items)} items")
+        except Exception as e:
+            print(f"[ERROR] {self.name} batch of {len(items)} failed: {e}", file=sys.stderr)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
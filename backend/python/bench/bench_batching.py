@@ -0,0 +1,92 @@
+"""
+Benchmark: micro-batched vs one-request-per-text translation
+Runs concurrent callers against the local stub server and reports
+throughput and how many HTTP requests reached the "provider".
+
+Usage:
+    python bench/bench_batching.py [--backend azure|deepl] [--callers 64] [--texts 1000]
+                                   [--delay-ms 50] [--window-ms 15] [--batch-size 100]
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from stub_translate_server import start_stub_server
+
+
+def stub_stats(base_url):
+    with urllib.request.urlopen(base_url + '/stats') as response:
+        return json.loads(response.read())
+
+
+def run(translate, base_url, callers, texts):
+    before = stub_stats(base_url)['requests']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda i: translate(f"sentence number {i}", 'ta', 'en'), range(texts)))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for result in results if result.startswith('[Translation Error]'))
+    requests_made = stub_stats(base_url)['requests'] - before
+    return elapsed, requests_made, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', choices=['azure', 'deepl'], default='azure')
+    parser.add_argument('--callers', type=int, default=64)
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--delay-ms', type=float, default=50)
+    parser.add_argument('--window-ms', type=float, default=15)
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(delay_ms=args.delay_ms)
+
+    # Every text must reach the stub, so the translation cache is off
+    os.environ['TRANSLATION_CACHE_SIZE'] = '0'
+    os.environ['AZURE_TRANSLATOR_ENDPOINT'] = base_url
+    os.environ['DEEPL_SERVER_URL'] = base_url
+
+    if args.backend == 'azure':
+        import translate_azure as module
+        translate = module.translate_with_azure
+        translate_batch = module.translate_batch_with_azure
+    else:
+        import translate_deepl as module
+        translate = module.translate_with_deepl
+        translate_batch = module.translate_batch_with_deepl
+
+    module._batcher.max_wait = args.window_ms / 1000
+    if args.batch_size:
+        module._batcher.max_batch = args.batch_size
+
+    def unbatched(text, target_lang, source_lang):
+        # One HTTP request per text, as before micro-batching
+        return translate_batch([text], target_lang, source_lang)[0]
+
+    print(f"Backend: {args.backend}, {args.texts} texts, {args.callers} callers, "
+          f"stub RTT {args.delay_ms:.0f} ms")
+    for label, func in [
+        ('unbatched', unbatched),
+        (f'batched ({args.window_ms:.0f} ms, <= {module._batcher.max_batch})', translate),
+    ]:
+        elapsed, requests_made, errors = run(func, base_url, args.callers, args.texts)
+        print(f"{label:<28} {args.texts / elapsed:9.1f} texts/s  "
+              f"{requests_made:6d} HTTP requests  {errors} errors  {elapsed:6.2f} s")
+
+    print(f"Batcher stats: {module.get_batch_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: size and encode latency of compressed TTS output
+Encodes speech-like clips at the TTS engine's 22,050 Hz through
+audio_codec.encode() for each format and bitrate and reports bytes per
+second of speech (vs. WAV) and the encode latency it adds per clip. Also
+times the silent fallback: the first call encodes, later ones are cached.
+
+Usage:
+    python bench/bench_codec.py [--formats opus,ogg,mp3,webm] [--bitrates 16k,24k,32k]
+                                [--seconds 1,3,10] [--repeat 5]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import audio_codec
+from fixtures import speech_like
+
+SAMPLE_RATE = 22050
+
+
+def wav_clip(seconds, seed=0):
+    samples = (speech_like(seconds, SAMPLE_RATE, seed) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressed audio output benchmark")
+    parser.add_argument('--formats', default='opus,ogg,mp3,webm')
+    parser.add_argument('--bitrates', default='16k,24k,32k')
+    parser.add_argument('--seconds', default='1,3,10')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not audio_codec._ffmpeg_path():
+        print("[ERROR] ffmpeg is required for this benchmark", file=sys.stderr)
+        sys.exit(1)
+
+    clips = {float(seconds): wav_clip(float(seconds)) for seconds in args.seconds.split(',')}
+    report = {'wav': {f"{seconds:g}s": {'bytes_per_second': len(data) / seconds} for seconds, data in clips.items()}}
+
+    for audio_format in args.formats.split(','):
+        for bitrate in args.bitrates.split(','):
+            results = {}
+            for seconds, data in clips.items():
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    encoded, used = audio_codec.encode(data, audio_format, bitrate)
+                    timings.append(time.perf_counter() - start)
+                if used != audio_format:
+                    print(f"[WARNING] {audio_format} unavailable in this ffmpeg build", file=sys.stderr)
+                    break
+                results[f"{seconds:g}s"] = {
+                    'bytes_per_second': len(encoded) / seconds,
+                    'ratio_vs_wav': len(data) / len(encoded),
+                    'encode_ms_p50': statistics.median(timings) * 1000,
+                    'encode_ms_max': max(timings) * 1000,
+                }
+            if not results:
+                continue
+            report[f"{audio_format}@{bitrate}"] = results
+            longest = results[max(results, key=lambda key: float(key[:-1]))]
+            shortest = results[min(results, key=lambda key: float(key[:-1]))]
+            print(f"{audio_format:5s} {bitrate:>4s}: {longest['bytes_per_second'] / 1024:6.2f} KB/s "
+                  f"({longest['ratio_vs_wav']:5.1f}x smaller)  encode {shortest['encode_ms_p50']:6.1f} ms "
+                  f"(shortest clip) .. {longest['encode_ms_p50']:6.1f} ms (longest)", file=sys.stderr)
+
+    fallback_format = args.formats.split(',')[0]
+    start = time.perf_counter()
+    audio_codec.silence(fallback_format)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    data, _ = audio_codec.silence(fallback_format)
+    cached = time.perf_counter() - start
+    report['silence'] = {'format': fallback_format, 'bytes': len(data),
+                         'first_ms': first * 1000, 'cached_ms': cached * 1000}
+    print(f"silence ({fallback_format}): {len(data)} bytes, first {first * 1000:.1f} ms, "
+          f"cached {cached * 1000:.3f} ms", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
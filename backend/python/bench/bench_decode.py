@@ -0,0 +1,270 @@
+"""
+Benchmark: decoding received audio to 16 kHz mono PCM
+Compares, per second of decoded audio:
+- per_chunk_ffmpeg: the previous path, one ffmpeg process per chunk that
+  also resamples (ffmpeg -ar 16000)
+- chunk_ffmpeg:     decoder.decode_chunk() with DECODER_BACKEND=ffmpeg, one
+                    process per chunk at the native rate, NumPy resampling
+- chunk_av:         decoder.decode_chunk() in process with PyAV (if installed)
+- stream:           one continuous WebM/Opus stream cut into pieces, fed to
+                    a single long-lived StreamDecoder
+for wall time, CPU time (this process and its children) and the peak
+memory allocated per chunk (tracemalloc, i.e. the copies made of the
+signal). The resampler alone is compared against the previous linear
+np.interp conversion on WAV input, including how much of a 10 kHz tone
+aliases into the 16 kHz output.
+
+Before measuring, check_buffer_reuse() verifies the per-thread PCM buffer
+contract (--check runs only that and exits non-zero on a failure).
+
+Usage:
+    python bench/bench_decode.py [--seconds 12] [--chunk-ms 1000] [--repeat 3] [--check]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+
+import decoder
+from fixtures import speech_like, write_wav
+from transcribe import PCMBuffer, SAMPLE_RATE, decode_audio
+
+SOURCE_RATE = 48000
+
+
+def per_chunk_ffmpeg(data, buffer):
+    """The previous decode path, kept here for comparison"""
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+         '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+        input=bytes(data), stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    buffer.write(result.stdout)
+    return buffer.view()
+
+
+def interp_resample(frames, channels, sample_rate):
+    """The previous WAV conversion: downmix, then linear interpolation"""
+    samples = np.frombuffer(frames, dtype='<i2').astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    out_count = int(len(samples) * SAMPLE_RATE / sample_rate)
+    positions = np.arange(out_count) * (sample_rate / SAMPLE_RATE)
+    samples = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(samples, -32768, 32767).astype('<i2')
+
+
+def encode_webm(samples, sample_rate, path):
+    pcm = (samples * 32767).astype('<i2').tobytes()
+    subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-f', 's16le', '-ar', str(sample_rate),
+         '-ac', '1', '-i', 'pipe:0', '-c:a', 'libopus', '-b:a', '32k', path],
+        input=pcm, check=True
+    )
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def measure(name, run, chunks, audio_seconds, repeat):
+    """
+    Run all chunks repeat times; wall/CPU per audio second and peak allocation per chunk
+    run(chunks, observe) decodes the chunks and calls observe() after each one when given.
+    """
+    run(chunks, None)  # warm-up: imports, filter banks, page cache
+    walls, cpus = [], []
+    for _ in range(repeat):
+        cpu = cpu_seconds()
+        start = time.perf_counter()
+        run(chunks, None)
+        walls.append(time.perf_counter() - start)
+        cpus.append(cpu_seconds() - cpu)
+
+    peaks = []
+
+    def observe():
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    run(chunks, observe)
+    tracemalloc.stop()
+
+    result = {
+        'wall_ms_per_audio_s': min(walls) / audio_seconds * 1000,
+        'cpu_ms_per_audio_s': min(cpus) / audio_seconds * 1000,
+        'peak_alloc_kb_per_chunk': sum(peaks) / len(peaks) / 1024,
+    }
+    print(f"{name:18s} wall {result['wall_ms_per_audio_s']:7.2f} ms/s  cpu {result['cpu_ms_per_audio_s']:7.2f} ms/s  "
+          f"peak alloc {result['peak_alloc_kb_per_chunk']:8.1f} KB/chunk", file=sys.stderr)
+    return result
+
+
+def bench_resampler(seconds, repeat):
+    """np.interp vs the polyphase converter on 44.1 kHz stereo WAV frames"""
+    rate = 44100
+    mono = (speech_like(seconds, rate) * 32767).astype('<i2')
+    frames = np.repeat(mono[:, None], 2, axis=1).reshape(-1).tobytes()
+    buffer = PCMBuffer()
+
+    def old(chunks, observe):
+        for chunk in chunks:
+            interp_resample(chunk, 2, rate)
+            observe and observe()
+
+    def new(chunks, observe):
+        for chunk in chunks:
+            decoder.convert_pcm(chunk, 2, 2, rate, buffer)
+            observe and observe()
+
+    report = {
+        'interp': measure('resample_interp', old, [frames], seconds, repeat),
+        'polyphase': measure('resample_polyphase', new, [frames], seconds, repeat),
+    }
+
+    # A 10 kHz tone is above the 8 kHz output Nyquist: whatever remains is aliasing
+    t = np.arange(rate) / rate
+    tone = (8000 * np.sin(2 * np.pi * 10000 * t)).astype('<i2')
+    tone_rms = 8000 / np.sqrt(2)
+    for name, output in (('interp', interp_resample(tone.tobytes(), 1, rate)),
+                         ('polyphase', np.frombuffer(decoder.convert_pcm(tone.tobytes(), 1, 2, rate, buffer), '<i2'))):
+        residual = output[200:-200].astype(np.float64)
+        report[name]['alias_db'] = 20 * np.log10(max(np.sqrt(np.mean(residual ** 2)), 1e-3) / tone_rms)
+    return report
+
+
+def check_buffer_reuse():
+    """
+    Regression check: a decode that grows the per-thread buffer while an
+    earlier view is alive used to raise BufferError; a stale view must fail
+    loudly, and PCM still exported elsewhere must not be overwritten.
+    Returns the list of failures.
+    """
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='voice-bench-buffer-')
+    try:
+        clips = []
+        for seconds in (1, 5):
+            path = os.path.join(work_dir, f"{seconds}.wav")
+            write_wav(path, speech_like(seconds, SAMPLE_RATE, seed=seconds), SAMPLE_RATE, 1)
+            with open(path, 'rb') as f:
+                clips.append(f.read())
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+    first = decode_audio(clips[0])
+    kept = np.frombuffer(first, dtype='<i2')
+    expected = kept.copy()
+    try:
+        second = decode_audio(clips[1])
+    except BufferError as e:
+        return [f"growing the buffer with a live view: {e}"]
+    if len(second) != 5 * SAMPLE_RATE * 2:
+        failures.append(f"second decode returned {len(second)} bytes")
+    if not np.array_equal(kept, expected):
+        failures.append("an exported array was overwritten by the next decode")
+    try:
+        bytes(first)
+        failures.append("a stale view stayed readable after the next decode")
+    except ValueError:
+        pass
+    second_pcm = bytes(second)
+    if bytes(decode_audio(second, 'pcm')) != second_pcm:
+        failures.append("re-decoding the current view changed it")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio decode benchmark")
+    parser.add_argument('--seconds', type=float, default=12.0)
+    parser.add_argument('--chunk-ms', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true', help="only run the buffer reuse check")
+    args = parser.parse_args()
+
+    failures = check_buffer_reuse()
+    for failure in failures:
+        print(f"[ERROR] PCM buffer: {failure}", file=sys.stderr)
+    if args.check or failures:
+        if not failures:
+            print("[INFO] PCM buffer reuse check passed", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+    report = {'resampler': bench_resampler(args.seconds, args.repeat)}
+    if not decoder.shutil.which('ffmpeg'):
+        print("[WARNING] ffmpeg not found: only the resampler was measured", file=sys.stderr)
+        print(json.dumps(report, indent=2))
+        return
+
+    samples = speech_like(args.seconds, SOURCE_RATE)
+    chunk_samples = SOURCE_RATE * args.chunk_ms // 1000
+    work_dir = tempfile.mkdtemp(prefix='voice-bench-decode-')
+    try:
+        # Browser-style self-contained chunks, and one continuous stream cut into as many pieces
+        chunks = [encode_webm(samples[i:i + chunk_samples], SOURCE_RATE, os.path.join(work_dir, f"{i}.webm"))
+                  for i in range(0, len(samples), chunk_samples)]
+        stream = encode_webm(samples, SOURCE_RATE, os.path.join(work_dir, 'stream.webm'))
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+    piece = -(-len(stream) // len(chunks))
+    pieces = [stream[i:i + piece] for i in range(0, len(stream), piece)]
+    buffer = PCMBuffer()
+
+    def run_per_chunk_ffmpeg(items, observe):
+        for chunk in items:
+            per_chunk_ffmpeg(chunk, buffer)
+            observe and observe()
+
+    def run_chunk(backend):
+        def run(items, observe):
+            decoder.BACKEND = backend
+            for chunk in items:
+                decoder.decode_chunk(chunk, buffer)
+                observe and observe()
+        return run
+
+    stream_ids = iter(range(1 << 30))
+
+    def run_stream(items, observe):
+        stream_id = f"bench-{next(stream_ids)}"
+        for chunk in items:
+            decoder.decode_stream(stream_id, chunk, buffer)
+            observe and observe()
+        decoder.close_stream(stream_id)
+
+    report['decode'] = {
+        'chunks': len(chunks),
+        'per_chunk_ffmpeg': measure('per_chunk_ffmpeg', run_per_chunk_ffmpeg, chunks, args.seconds, args.repeat),
+        'chunk_ffmpeg': measure('chunk_ffmpeg', run_chunk('ffmpeg'), chunks, args.seconds, args.repeat),
+    }
+    try:
+        import av  # noqa: F401
+        report['decode']['chunk_av'] = measure('chunk_av', run_chunk('av'), chunks, args.seconds, args.repeat)
+    except ImportError:
+        print("chunk_av           skipped: PyAV is not installed", file=sys.stderr)
+    report['decode']['stream'] = measure('stream', run_stream, pieces, args.seconds, args.repeat)
+    report['decoder_stats'] = decoder.get_decoder_stats()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
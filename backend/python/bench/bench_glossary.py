@@ -0,0 +1,138 @@
+"""
+Benchmark: glossary lookup time vs glossary size
+Builds synthetic phrase tables (1-4 word phrases over a fixed vocabulary),
+writes each one as <lang>.tsv.gz, and for every size reports:
+- load + compile time of the phrase trie
+- exact whole-utterance lookup time (the fast path before the backends)
+- single-pass phrase matching time over meeting-length utterances
+- the old approach for comparison: a substring scan over every phrase
+Latencies are per utterance, in microseconds.
+
+Usage:
+    python bench/bench_glossary.py [--sizes 100,1000,10000,50000] [--utterances 2000] [--seed 1]
+"""
+
+import os
+import sys
+import json
+import time
+import gzip
+import random
+import shutil
+import argparse
+import tempfile
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from glossary import Glossary, load_phrases
+
+
+def make_vocabulary(rng, words=3000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(2, 9))) for _ in range(words)]
+
+
+def make_phrases(rng, vocabulary, size):
+    phrases = {}
+    while len(phrases) < size:
+        phrase = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4)))
+        phrases[phrase] = phrase.upper()
+    return phrases
+
+
+def make_utterances(rng, vocabulary, phrases, count):
+    """~15-word utterances; about half contain a glossary phrase, a few are exactly one"""
+    keys = list(phrases)
+    utterances = []
+    for i in range(count):
+        if i % 10 == 0:
+            utterances.append(rng.choice(keys).capitalize() + '.')
+            continue
+        words = [rng.choice(vocabulary) for _ in range(15)]
+        if i % 2:
+            words.insert(rng.randint(0, len(words)), rng.choice(keys))
+        utterances.append(' '.join(words).capitalize() + '?')
+    return utterances
+
+
+def linear_scan(phrases):
+    """The original translate_simple: first phrase contained anywhere in the text"""
+    def translate(text):
+        text_lower = text.lower().strip()
+        for english, translated in phrases.items():
+            if english in text_lower:
+                return translated
+        return None
+    return translate
+
+
+def time_per_call(function, inputs, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        for value in inputs:
+            start = time.perf_counter()
+            function(value)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'p50_us': samples[len(samples) // 2] * 1e6,
+        'p99_us': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        'mean_us': sum(samples) / len(samples) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Glossary lookup benchmark")
+    parser.add_argument('--sizes', default='100,1000,10000,50000')
+    parser.add_argument('--utterances', type=int, default=2000)
+    parser.add_argument('--linear-limit', type=int, default=10000,
+                        help="skip the linear scan above this many phrases (it gets slow)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    work_dir = tempfile.mkdtemp(prefix='voice-bench-glossary-')
+    report = {}
+    try:
+        for size in [int(value) for value in args.sizes.split(',')]:
+            phrases = make_phrases(rng, vocabulary, size)
+            utterances = make_utterances(rng, vocabulary, phrases, args.utterances)
+
+            path = os.path.join(work_dir, 'xx.tsv.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as f:
+                f.writelines(f"{phrase}\t{translation}\n" for phrase, translation in phrases.items())
+
+            start = time.perf_counter()
+            loaded = load_phrases('xx', work_dir)
+            load_ms = (time.perf_counter() - start) * 1000
+            glossary = Glossary(loaded)
+
+            result = {
+                'phrases': len(glossary),
+                'file_kb': os.path.getsize(path) / 1024,
+                'load_ms': load_ms,
+                'compile_ms': glossary.compile_ms,
+                'lookup': time_per_call(glossary.lookup, utterances),
+                'find': time_per_call(glossary.find, utterances),
+                'matched': sum(1 for text in utterances if glossary.find(text)) / len(utterances),
+            }
+            if size <= args.linear_limit:
+                result['linear_scan'] = time_per_call(linear_scan(phrases), utterances)
+            report[size] = result
+
+            # The linear scan stops at its first hit, so its p99 is the fair comparison
+            linear = result.get('linear_scan', {}).get('p99_us')
+            print(f"{size:6d} phrases: load {load_ms:6.1f} ms  compile {glossary.compile_ms:6.1f} ms  "
+                  f"lookup p50 {result['lookup']['p50_us']:5.1f} us  "
+                  f"find p50 {result['find']['p50_us']:5.1f} us p99 {result['find']['p99_us']:5.1f} us  "
+                  f"linear p99 {f'{linear:7.1f} us' if linear is not None else '      -'}", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: handing audio chunks from the server to the transcriber
+Only the handoff is measured, no decoding or recognition: the consumer
+touches every byte of each chunk and moves on.
+
+- file:       the previous path, per chunk: write uploads/room_chunk_*.webm,
+              read it back, copy it to public/, delete it (one process)
+- file_spawn: the same with a new `python` process reading each file, as
+              server.js does when it execs transcribe.py
+- ring:       shm_ring.AudioRing, producer in this process, consumer in a
+              child process that, like shm_ring.serve(), hands every frame
+              in place (no copy) to a lane thread per stream, which touches
+              it and releases the slot
+
+Reports chunks/s and MB/s with the producer going as fast as it can, and
+producer-to-consumer latency p50/p99 with one chunk in flight at a time (the
+ring consumer polls every SHM_RING_POLL_MS while idle), for each chunk size
+(default: a 1 s WebM/Opus chunk and 1 s of 48 kHz stereo PCM).
+
+Usage:
+    python bench/bench_handoff.py [--chunks 2000] [--sizes 4000,192000] [--spawn-chunks 20]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np
+
+import shm_ring
+
+READER = "import sys; data = open(sys.argv[1], 'rb').read(); sys.exit(0 if data is not None else 1)"
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def touch(data):
+    """Read every byte once, as a decoder would"""
+    return int(np.frombuffer(data, dtype=np.uint8).max())
+
+
+def report(name, size, count, wall, latencies):
+    result = {
+        'chunks_per_s': count / wall,
+        'mb_per_s': count * size / wall / 1e6,
+        'latency_p50_us': percentile(latencies, 0.5) * 1e6,
+        'latency_p99_us': percentile(latencies, 0.99) * 1e6,
+    }
+    print(f"{name:10s} {size:7d} B  {result['chunks_per_s']:9.0f} chunks/s  {result['mb_per_s']:8.1f} MB/s  "
+          f"latency p50 {result['latency_p50_us']:9.1f} us  p99 {result['latency_p99_us']:9.1f} us", file=sys.stderr)
+    return result
+
+
+def bench_file(chunk, count, work_dir, spawn=False):
+    uploads = os.path.join(work_dir, 'uploads')
+    public = os.path.join(work_dir, 'public')
+    os.makedirs(uploads, exist_ok=True)
+    os.makedirs(public, exist_ok=True)
+    latencies = []
+    start = time.perf_counter()
+    for index in range(count):
+        sent = time.perf_counter()
+        path = os.path.join(uploads, f"room_chunk_{index}.webm")
+        with open(path, 'wb') as f:
+            f.write(chunk)
+        if spawn:
+            subprocess.run([sys.executable, '-c', READER, path], check=True)
+        else:
+            with open(path, 'rb') as f:
+                touch(f.read())
+        latencies.append(time.perf_counter() - sent)
+        shutil.copyfile(path, os.path.join(public, f"original_audio_{index}.webm"))
+        os.remove(path)
+        os.remove(os.path.join(public, f"original_audio_{index}.webm"))
+    return time.perf_counter() - start, latencies
+
+
+def _ring_consumer(path, count, conn):
+    """Like shm_ring.serve(): each frame, still in its slot, goes to its stream's lane thread"""
+    import zlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    ring = shm_ring.AudioRing(path)
+    lanes = [ThreadPoolExecutor(max_workers=1) for _ in range(shm_ring.THREADS)]
+    received = {}  # seq -> time, as lanes finish out of order
+
+    def run(frame):
+        touch(frame.data)
+        received[frame.seq] = time.monotonic()
+        ring.release(frame)
+
+    for _ in range(count):
+        frame = ring.read(timeout=5.0)
+        if frame is None:
+            break
+        lanes[zlib.crc32(frame.stream.encode('utf-8')) % len(lanes)].submit(run, frame)
+    for lane in lanes:
+        lane.shutdown(wait=True)
+    ring.close()
+    conn.send([received[seq] for seq in sorted(received)])
+
+
+def bench_ring(chunk, count, slots, paced=False):
+    """paced: wait for each chunk to be consumed before sending the next"""
+    path = shm_ring.default_path(f"bench-handoff-{os.getpid()}")
+    ring = shm_ring.AudioRing.create(path, slots=slots, slot_bytes=max(len(chunk), 4096))
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    consumer = multiprocessing.Process(target=_ring_consumer, args=(path, count, sender))
+    consumer.start()
+    sent = []
+    full = 0
+    try:
+        start = time.monotonic()
+        for index in range(count):
+            stamp = time.monotonic()
+            while ring.write(chunk, stream=f"room1:{index % 4}", audio_format='webm') is None:
+                full += 1
+                time.sleep(0.0001)
+            sent.append(stamp)
+            while paced and ring.stats()['tail'] <= index:
+                time.sleep(0)
+        received = receiver.recv()
+        wall = time.monotonic() - start
+        consumer.join()
+    finally:
+        ring.close()
+        os.remove(path)
+    if full:
+        print(f"{'':10s} producer waited {full} times on a full ring", file=sys.stderr)
+    return wall, [done - stamp for stamp, done in zip(sent, received)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio handoff benchmark")
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--sizes', default='4000,192000', help="comma-separated chunk sizes in bytes")
+    parser.add_argument('--paced-chunks', type=int, default=200, help="chunks for the latency runs")
+    parser.add_argument('--spawn-chunks', type=int, default=20, help="chunks for file_spawn (0 skips it)")
+    parser.add_argument('--slots', type=int, default=shm_ring.SLOTS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    report_data = {'ring_dir': shm_ring.RING_DIR}
+    work_dir = tempfile.mkdtemp(prefix='voice-bench-handoff-', dir='.')
+    try:
+        for size in (int(value) for value in args.sizes.split(',')):
+            chunk = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+            results = report_data[str(size)] = {}
+            results['file'] = report('file', size, args.chunks, *bench_file(chunk, args.chunks, work_dir))
+            if args.spawn_chunks:
+                results['file_spawn'] = report('file_spawn', size, args.spawn_chunks,
+                                               *bench_file(chunk, args.spawn_chunks, work_dir, spawn=True))
+            wall, _ = bench_ring(chunk, args.chunks, args.slots)
+            _, latencies = bench_ring(chunk, args.paced_chunks, args.slots, paced=True)
+            results['ring'] = report('ring', size, args.chunks, wall, latencies)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(report_data, indent=2))
+
+
+if __name__ == "__main__":
+    main()
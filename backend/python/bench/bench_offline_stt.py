@@ -0,0 +1,142 @@
+"""
+Benchmark: offline speech recognition (transcribe_offline.py)
+For every language with an installed model (or --languages) reports:
+- load_ms / model_rss_mb: time and resident memory to load the model
+- stream_rss_mb: extra memory per open recognizer stream
+- real_time_factor: recognition time / audio time for one stream fed in
+  100 ms frames as they would arrive (below 1.0 keeps up with live speech)
+- feed_ms: per-frame recognition latency (p50/p99)
+- batch: several speakers recognized concurrently with transcribe_batch;
+  aggregate real-time factor = wall time / total audio
+Audio is the speech-like fixture by default; pass real recordings with
+--audio for meaningful transcripts. Exits with status 1 when no model is
+installed.
+
+Usage:
+    python bench/bench_offline_stt.py [--languages en-US,hi-IN] [--audio a.wav,b.wav]
+                                      [--speakers 4] [--model-dir models/vosk]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import generate_fixtures, DEFAULT_DIR
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def bench_language(offline, lang_code, clips, speakers):
+    from transcribe import SAMPLE_RATE, SAMPLE_WIDTH
+
+    result = {}
+    offline.get_model(lang_code)
+    info = offline.get_offline_stt_stats()['models'][lang_code]
+    result['model'] = os.path.basename(info['path'])
+    result['load_ms'] = info['load_ms']
+    result['model_rss_mb'] = info['rss_mb']
+
+    # One stream, fed frame by frame
+    feed_ms = []
+    audio_seconds = recognition_seconds = 0.0
+    transcripts = []
+    for pcm in clips:
+        stream = offline.OfflineStream(lang_code)
+        start = time.perf_counter()
+        for offset in range(0, len(pcm), offline.FEED_BYTES):
+            frame_start = time.perf_counter()
+            stream.feed(pcm[offset:offset + offline.FEED_BYTES])
+            feed_ms.append((time.perf_counter() - frame_start) * 1000)
+        transcripts.append(stream.finish())
+        recognition_seconds += time.perf_counter() - start
+        audio_seconds += len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    result['real_time_factor'] = recognition_seconds / audio_seconds
+    result['feed_ms'] = {'p50': percentile(feed_ms, 0.5), 'p99': percentile(feed_ms, 0.99)}
+    result['transcripts'] = transcripts
+
+    # Memory of open streams on top of the resident model
+    rss_before = offline._rss_mb()
+    streams = [offline.OfflineStream(lang_code) for _ in range(speakers)]
+    for stream in streams:
+        stream.feed(clips[0][:offline.FEED_BYTES])
+    rss_after = offline._rss_mb()
+    if rss_before is not None and rss_after is not None:
+        result['stream_rss_mb'] = (rss_after - rss_before) / speakers
+    del streams
+
+    # Several speakers at once
+    items = [
+        {'data': clips[i % len(clips)], 'audio_format': 'pcm', 'language': lang_code, 'session': f"speaker-{i}"}
+        for i in range(speakers)
+    ]
+    batch_audio = sum(len(item['data']) for item in items) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    start = time.perf_counter()
+    results = offline.transcribe_batch(items)
+    wall = time.perf_counter() - start
+    result['batch'] = {
+        'speakers': speakers,
+        'audio_seconds': batch_audio,
+        'wall_seconds': wall,
+        'real_time_factor': wall / batch_audio,
+        'errors': sum(1 for item in results if 'error' in item),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline speech recognition benchmark")
+    parser.add_argument('--languages', help="comma-separated language codes (default: every installed model)")
+    parser.add_argument('--audio', help="comma-separated audio files (default: speech-like fixture)")
+    parser.add_argument('--speakers', type=int, default=4)
+    parser.add_argument('--model-dir', help="overrides OFFLINE_STT_MODEL_DIR")
+    args = parser.parse_args()
+
+    if args.model_dir:
+        os.environ['OFFLINE_STT_MODEL_DIR'] = args.model_dir
+    # The VAD would drop the fixture's pauses from the batch; measure the recognizer alone
+    os.environ.setdefault('VAD_ENABLED', '0')
+
+    import transcribe_offline as offline
+    from transcribe import decode_audio
+
+    languages = args.languages.split(',') if args.languages else offline.installed_languages()
+    if not languages:
+        print(f"[ERROR] No offline models in {offline.MODEL_DIR}; see transcribe_offline.py", file=sys.stderr)
+        sys.exit(1)
+
+    paths = args.audio.split(',') if args.audio else [generate_fixtures(DEFAULT_DIR)['long_48k_mono']]
+    clips = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            clips.append(bytes(decode_audio(f.read())))
+
+    report = {}
+    for lang_code in languages:
+        try:
+            result = bench_language(offline, lang_code, clips, args.speakers)
+        except (ImportError, offline.ModelNotFoundError) as e:
+            print(f"{lang_code:6s} skipped: {e}", file=sys.stderr)
+            report[lang_code] = {'error': str(e)}
+            continue
+        report[lang_code] = result
+        print(f"{lang_code:6s} {result['model']}: load {result['load_ms']:7.0f} ms  "
+              f"model {result['model_rss_mb'] or 0:6.1f} MB  stream {result.get('stream_rss_mb', 0):5.1f} MB  "
+              f"RTF {result['real_time_factor']:.3f}  feed p99 {result['feed_ms']['p99']:6.1f} ms  "
+              f"batch x{args.speakers} RTF {result['batch']['real_time_factor']:.3f}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if all('error' in result for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
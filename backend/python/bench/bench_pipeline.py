@@ -0,0 +1,352 @@
+"""
+End-to-end benchmark of the speech-translation pipeline, fully offline
+Drives transcribe -> translate -> synthesize through a worker pool
+(worker.py --socket) with generated audio fixtures. Every provider is replaced
+by the local stub server (Google speech, Azure, DeepL, OpenAI), with a
+configurable round trip and jitter.
+
+For each concurrency level it reports:
+- throughput
+- end-to-end and per-stage p50/p95/p99, measured by the client
+- the server-side stage histograms from metrics.py
+- peak RSS and peak process count of the worker process tree
+The results are written as JSON. --baseline compares them with an earlier run.
+
+Usage:
+    python bench/bench_pipeline.py [--concurrency 1,4,16] [--requests 48] [--workers 2]
+                                   [--delay-ms 80] [--jitter-ms 20] [--targets ta,hi]
+                                   [--fixture utterance_44k_stereo] [--language en]
+                                   [--output run.json] [--baseline previous.json]
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import base64
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from worker import WorkerClient
+from fixtures import generate_fixtures, DEFAULT_DIR
+from stub_translate_server import start_stub_server
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {'count': len(ordered), 'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def _process_tree(root_pid):
+    """PIDs of root_pid and all of its descendants (Linux /proc)"""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # The command name may contain spaces; ppid follows the closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+
+    tree = [root_pid]
+    for pid in tree:
+        tree.extend(children.get(pid, []))
+    return tree
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class TreeSampler(threading.Thread):
+    """Samples total RSS and process count of a process tree until stopped"""
+
+    def __init__(self, root_pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_processes = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if not os.path.isdir('/proc'):
+            return
+        while not self._stop_event.is_set():
+            tree = _process_tree(self.root_pid)
+            self.peak_processes = max(self.peak_processes, len(tree))
+            self.peak_rss = max(self.peak_rss, sum(_rss_bytes(pid) for pid in tree))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def provider_environment(stub_url, metrics_dir):
+    """Environment pointing every provider at the stub and turning caches off"""
+    env = dict(os.environ)
+    env.update({
+        'STT_GOOGLE_ENDPOINT': stub_url + '/speech-api/v2/recognize',
+        'AZURE_TRANSLATOR_KEY': 'stub',
+        'AZURE_TRANSLATOR_ENDPOINT': stub_url,
+        'DEEPL_API_KEY': 'stub:fx',
+        'DEEPL_SERVER_URL': stub_url,
+        'OPENAI_API_KEY': 'stub',
+        'OPENAI_BASE_URL': stub_url + '/v1',
+        # Measure the providers, not the caches
+        'TRANSLATION_CACHE_SIZE': '0',
+        'TTS_CACHE_DIR': '',
+        'METRICS_SAMPLE_RATE': '1',
+        'METRICS_DIR': metrics_dir,
+        'METRICS_FLUSH_SECONDS': '0.5',
+    })
+    env.setdefault('ROUTER_BACKENDS', 'azure')
+    return env
+
+
+def start_worker(env, workers, socket_path):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PYTHON_DIR, 'worker.py'), '--socket', socket_path, '--workers', str(workers)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if os.path.exists(socket_path):
+            try:
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                probe.connect(socket_path)
+                probe.close()
+                return process
+            except OSError:
+                pass
+        if process.poll() is not None:
+            raise RuntimeError("worker exited during start-up")
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("worker did not start within 60 s")
+
+
+def is_silence(path):
+    """True for a WAV file with no signal (or none that can be read)"""
+    try:
+        with wave.open(path, 'rb') as wav_file:
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (OSError, EOFError, wave.Error):
+        return True
+    return not frames.strip(b'\x00')
+
+
+def run_level(args, env, audio, concurrency):
+    work_dir = tempfile.mkdtemp(prefix='voice-bench-')
+    socket_path = os.path.join(work_dir, 'worker.sock')
+    process = start_worker(env, args.workers, socket_path)
+    sampler = TreeSampler(process.pid)
+    sampler.start()
+
+    audio_b64 = base64.b64encode(audio).decode('ascii')
+    targets = args.targets.split(',')
+    timings = {'e2e': [], 'stt': [], 'translate': [], 'tts': []}
+    errors = []
+    lock = threading.Lock()
+
+    tts_enabled = args.tts
+    if tts_enabled:
+        # Without a working TTS engine, measure the other stages only.
+        # synthesize_speech() writes a second of silence when the engine
+        # fails, which would otherwise be timed as synthesis.
+        probe = WorkerClient(socket_path=socket_path)
+        try:
+            path = probe.call('synthesize_speech', ['probe', 'en', os.path.join(work_dir, 'probe.wav'), 'wav'])
+            if not path or is_silence(path):
+                raise RuntimeError("the engine failed and wrote the silent placeholder")
+        except RuntimeError as e:
+            print(f"[WARNING] TTS stage skipped: {e}", file=sys.stderr)
+            tts_enabled = False
+        probe.close()
+
+    def caller(index):
+        client = WorkerClient(socket_path=socket_path)
+        try:
+            for request in range(index, args.requests, concurrency):
+                try:
+                    start = time.perf_counter()
+                    text = client.call('transcribe_bytes', {
+                        'data_b64': audio_b64, 'language': args.language, 'session': f"bench-{index}"
+                    })
+                    stt_done = time.perf_counter()
+
+                    translations = {
+                        target: client.call(args.translate_method, [text or 'silence', target, 'en'])
+                        for target in targets
+                    }
+                    translate_done = time.perf_counter()
+
+                    if tts_enabled:
+                        for target, translated in translations.items():
+                            client.call('synthesize_speech', [
+                                translated, target, os.path.join(work_dir, f"tts_{request}_{target}.wav")
+                            ])
+                    tts_done = time.perf_counter()
+                except RuntimeError as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+
+                with lock:
+                    timings['stt'].append(stt_done - start)
+                    timings['translate'].append(translate_done - stt_done)
+                    if tts_enabled:
+                        timings['tts'].append(tts_done - translate_done)
+                    timings['e2e'].append(tts_done - start)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(caller, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    # Let every worker flush its histograms, then read them merged
+    time.sleep(1.0)
+    client = WorkerClient(socket_path=socket_path)
+    try:
+        server_stages = client.call('get_metrics').get('stages', [])
+    except RuntimeError:
+        server_stages = []
+    client.close()
+
+    sampler.stop()
+    process.terminate()
+    process.wait()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'concurrency': concurrency,
+        'requests': args.requests,
+        'completed': len(timings['e2e']),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'tts_measured': tts_enabled,
+        'wall_s': elapsed,
+        'throughput_rps': len(timings['e2e']) / elapsed if elapsed else 0.0,
+        'e2e': percentiles(timings['e2e']),
+        'stages': {stage: percentiles(values) for stage, values in timings.items() if stage != 'e2e'},
+        'server_stages': server_stages,
+        'peak_rss_mb': sampler.peak_rss / (1024 * 1024),
+        'peak_processes': sampler.peak_processes,
+    }
+
+
+def compare(report, baseline):
+    """Print throughput and e2e latency changes against a previous report"""
+    previous = {level['concurrency']: level for level in baseline.get('levels', [])}
+    for level in report['levels']:
+        old = previous.get(level['concurrency'])
+        if not old or not old.get('e2e') or not level.get('e2e'):
+            continue
+
+        def change(new_value, old_value):
+            return (new_value - old_value) / old_value * 100 if old_value else 0.0
+
+        print(f"concurrency {level['concurrency']:3d}: "
+              f"throughput {change(level['throughput_rps'], old['throughput_rps']):+6.1f}%  "
+              f"p50 {change(level['e2e']['p50_ms'], old['e2e']['p50_ms']):+6.1f}%  "
+              f"p99 {change(level['e2e']['p99_ms'], old['e2e']['p99_ms']):+6.1f}%  "
+              f"rss {change(level['peak_rss_mb'], old['peak_rss_mb']):+6.1f}%", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=48, help="requests per concurrency level")
+    parser.add_argument('--workers', type=int, default=2, help="worker processes")
+    parser.add_argument('--delay-ms', type=float, default=80, help="stub provider round trip")
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--fixture', default='utterance_44k_stereo')
+    parser.add_argument('--language', default='en', help="'auto' adds language detection requests")
+    parser.add_argument('--targets', default='ta,hi')
+    parser.add_argument('--translate-method', default='translate_routed',
+                        help="worker method used for translation")
+    parser.add_argument('--no-tts', dest='tts', action='store_false')
+    parser.add_argument('--fixtures-dir', default=DEFAULT_DIR)
+    parser.add_argument('--output', help="write the JSON report here as well as to stdout")
+    parser.add_argument('--baseline', help="earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    fixtures = generate_fixtures(args.fixtures_dir)
+    with open(fixtures[args.fixture], 'rb') as f:
+        audio = f.read()
+
+    server, stub_url = start_stub_server(delay_ms=args.delay_ms, jitter_ms=args.jitter_ms)
+    metrics_dir = tempfile.mkdtemp(prefix='voice-bench-metrics-')
+    env = provider_environment(stub_url, metrics_dir)
+
+    levels = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        # Fresh metrics per level: the server-side histograms are cumulative
+        for name in os.listdir(metrics_dir):
+            os.unlink(os.path.join(metrics_dir, name))
+        level = run_level(args, env, audio, concurrency)
+        levels.append(level)
+        e2e = level['e2e'] or {}
+        print(f"concurrency {concurrency:3d}: {level['throughput_rps']:6.2f} req/s  "
+              f"p50 {e2e.get('p50_ms', 0):7.1f} ms  p99 {e2e.get('p99_ms', 0):7.1f} ms  "
+              f"rss {level['peak_rss_mb']:6.1f} MB  processes {level['peak_processes']}  "
+              f"errors {level['errors']}", file=sys.stderr)
+
+    server.shutdown()
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'levels': levels,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
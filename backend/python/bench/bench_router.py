@@ -0,0 +1,128 @@
+"""
+Benchmark: serial fallback vs latency-aware routing vs hedged routing
+Runs the router over fake backends with injected latency and failures:
+    slow_first  ~120 ms, 10% of calls hang for 1 s and then fail (like a
+                googletrans timeout); first in the serial order
+    fast_flaky  ~40 ms, fails 10% of the time and is down from 1 s to 2.5 s
+    heavy_tail  ~70 ms, but 5% of calls take 600 ms
+and reports p50/p95/p99 latency and failures for each strategy.
+
+Usage:
+    python bench/bench_router.py [--requests 400] [--callers 8] [--seed 1]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from router import TranslationRouter
+
+
+def fake_backend(name, latency_ms, failure_rate=0.0, tail_rate=0.0, tail_ms=0, tail_fails=False, outage=None):
+    """outage: (start, end) seconds since the benchmark started during which every call fails"""
+    started = time.monotonic()
+
+    def translate(text, target_lang, source_lang):
+        elapsed = time.monotonic() - started
+        slow = random.random() < tail_rate
+        time.sleep((tail_ms if slow else random.uniform(0.8, 1.2) * latency_ms) / 1000)
+        if slow and tail_fails:
+            raise TimeoutError(f"{name} timed out")
+        if outage and outage[0] <= elapsed < outage[1]:
+            raise ConnectionError(f"{name} unavailable")
+        if random.random() < failure_rate:
+            return None
+        return f"[{target_lang}:{name}] {text}"
+    return translate
+
+
+def make_backends():
+    return {
+        'slow_first': fake_backend('slow_first', 120, tail_rate=0.1, tail_ms=1000, tail_fails=True),
+        'fast_flaky': fake_backend('fast_flaky', 40, failure_rate=0.1, outage=(1, 2.5)),
+        'heavy_tail': fake_backend('heavy_tail', 70, tail_rate=0.05, tail_ms=600),
+    }
+
+
+def serial_fallback(backends):
+    """The current behaviour: fixed order, next backend only after a failure"""
+    def translate(text, target_lang, source_lang):
+        for backend in backends.values():
+            try:
+                result = backend(text, target_lang, source_lang)
+            except Exception:
+                result = None
+            if result:
+                return result
+        return None
+    return translate
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(translate, requests, callers):
+    pairs = [('en', 'ta'), ('en', 'hi'), ('ta', 'en')]
+
+    def one(i):
+        source, target = pairs[i % len(pairs)]
+        start = time.perf_counter()
+        result = translate(f"sentence {i}", target, source)
+        return time.perf_counter() - start, result is not None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return {
+        'wall_s': elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'failures': sum(1 for _, ok in results if not ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translation router benchmark with fake backends")
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--callers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    report = {}
+    strategies = [
+        ('serial', lambda backends: serial_fallback(backends)),
+        # Short memory and cooldown so the few seconds of the run show recovery
+        ('routed', lambda backends: TranslationRouter(
+            backends, hedge=False, max_age=1.0, breaker_cooldown=0.5).translate),
+        ('hedged', lambda backends: TranslationRouter(
+            backends, hedge=True, hedge_min_ms=50, max_age=1.0, breaker_cooldown=0.5).translate),
+    ]
+    for name, build in strategies:
+        random.seed(args.seed)
+        translate = build(make_backends())
+        report[name] = run(translate, args.requests, args.callers)
+        router = getattr(translate, '__self__', None)
+        if router is not None:
+            stats = router.stats()
+            report[name].update({key: stats[key] for key in ('hedged', 'hedge_wins', 'fallbacks')})
+        print(f"{name:7s} p50 {report[name]['p50_ms']:6.1f} ms  p95 {report[name]['p95_ms']:6.1f} ms  "
+              f"p99 {report[name]['p99_ms']:6.1f} ms  failures {report[name]['failures']}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
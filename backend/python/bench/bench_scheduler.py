@@ -0,0 +1,198 @@
+"""
+Benchmark: deadline-aware scheduler vs first-come-first-served under overload
+Synthetic jobs, no models or network: every room sends 1 s PCM chunks
+(transcribe_bytes) with Poisson arrivals, one room floods at several times
+the normal rate, and one-off /tts calls (synthesize_speech) arrive on the
+side. A job "runs" by sleeping for a fixed overhead plus a time proportional
+to its audio, on as many threads as the pool has workers, so merged chunks
+are cheaper than the chunks run one by one.
+
+Reported for FIFO (every job run in arrival order, as the worker pool did
+before) and for the scheduler:
+- latency p50/p99 of live chunks and /tts calls (arrival to result; a merged
+  chunk gets its result with the job it was merged into)
+- on_time: fraction of live chunks whose result came before their deadline
+- shed / merged counts
+- fairness: Jain's index over the on-time fraction of the normal rooms
+  (1.0 = every room served alike) and the flooding room's own on-time fraction
+
+Usage:
+    python bench/bench_scheduler.py [--seconds 10] [--rooms 5] [--workers 2] [--flood 10]
+                                    [--deadline-ms 3000] [--overflow coalesce]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from scheduler import Scheduler, JobShed
+
+CHUNK_BYTES = 32000  # 1 s of 16 kHz mono 16-bit PCM
+OVERHEAD = 0.08      # seconds per call, independent of the audio
+PER_AUDIO_SECOND = 0.12
+TTS_SECONDS = 0.15
+
+
+def fake_job(method, params):
+    """Sleep as long as the real call might take"""
+    if method == 'synthesize_speech':
+        time.sleep(TTS_SECONDS)
+        return 'out.wav'
+    audio_seconds = len(params['data']) / CHUNK_BYTES
+    time.sleep(OVERHEAD + PER_AUDIO_SECOND * audio_seconds)
+    return f"{audio_seconds:.0f}s"
+
+
+def arrivals(seconds, rooms, flood, tts_rate, seed):
+    """[(time, room or None, kind)] for the whole run, sorted by time"""
+    rng = random.Random(seed)
+    events = []
+    for index in range(rooms + 1):
+        room = f"room{index}"
+        rate = flood if index == rooms else 1.0
+        t = rng.expovariate(rate)
+        while t < seconds:
+            events.append((t, room, 'live'))
+            t += rng.expovariate(rate)
+    t = rng.expovariate(tts_rate)
+    while t < seconds:
+        events.append((t, None, 'tts'))
+        t += rng.expovariate(tts_rate)
+    return sorted(events, key=lambda event: event[0])
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def jain(values):
+    values = [value for value in values if value is not None]
+    if not values or not any(values):
+        return 0.0
+    return sum(values) ** 2 / (len(values) * sum(value * value for value in values))
+
+
+def run(events, workers, use_scheduler, deadline_ms, overflow):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    scheduler = Scheduler(lambda method, params, stream: executor.submit(fake_job, method, params),
+                          capacity=workers, overflow=overflow) if use_scheduler else None
+    lock = threading.Lock()
+    jobs = {}  # tag -> {'room', 'kind', 'arrival', 'done', 'outcome', 'merged_into'}
+
+    def record(tag, future):
+        with lock:
+            job = jobs[tag]
+            job['done'] = time.monotonic()
+            try:
+                future.result()
+                job['outcome'] = 'ok'
+            except JobShed as e:
+                job['outcome'] = e.reason
+                job['merged_into'] = e.merged_into
+
+    futures = []
+    start = time.monotonic()
+    for tag, (offset, room, kind) in enumerate(events):
+        delay = start + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        method = 'transcribe_bytes' if kind == 'live' else 'synthesize_speech'
+        params = ({'data': bytes(CHUNK_BYTES), 'audio_format': 'pcm', 'language': 'en-US'}
+                  if kind == 'live' else {'text': 'hello', 'language': 'en'})
+        with lock:
+            jobs[tag] = {'room': room, 'kind': kind, 'arrival': time.monotonic(), 'done': None,
+                         'outcome': None, 'merged_into': None}
+        if scheduler is None:
+            future = executor.submit(fake_job, method, params)
+        elif kind == 'live':
+            future = scheduler.submit(method, params, room=room, priority='live', deadline_ms=deadline_ms,
+                                      stream=f"{room}:speaker", tag=tag)
+        else:
+            future = scheduler.submit(method, params, priority='interactive', tag=tag)
+        future.add_done_callback(lambda f, tag=tag: record(tag, f))
+        futures.append(future)
+    # Queued jobs are dispatched as running ones finish: wait for all before stopping the threads
+    wait(futures)
+    executor.shutdown(wait=True)
+    wall = time.monotonic() - start
+
+    def delivered(job):
+        """When the job's input reached a result, following merges"""
+        seen = 0
+        while job['outcome'] == 'merged' and seen < len(jobs):
+            job = jobs[job['merged_into']]
+            seen += 1
+        return job['done'] if job['outcome'] == 'ok' else None
+
+    latencies = {'live': [], 'tts': []}
+    per_room = {}
+    for job in jobs.values():
+        done = delivered(job)
+        if done is not None:
+            latencies[job['kind']].append(done - job['arrival'])
+        if job['kind'] == 'live':
+            counts = per_room.setdefault(job['room'], [0, 0])
+            counts[0] += 1
+            counts[1] += done is not None and done - job['arrival'] <= deadline_ms / 1000
+
+    on_time = {room: met / total for room, (met, total) in ((r, (c[1], c[0])) for r, c in per_room.items())}
+    flood_room = max(per_room, key=lambda room: per_room[room][0])
+    live_total = sum(counts[0] for counts in per_room.values())
+    result = {
+        'wall_seconds': wall,
+        'jobs': len(jobs),
+        'live_p50_ms': (percentile(latencies['live'], 0.5) or 0) * 1000,
+        'live_p99_ms': (percentile(latencies['live'], 0.99) or 0) * 1000,
+        'tts_p50_ms': (percentile(latencies['tts'], 0.5) or 0) * 1000,
+        'tts_p99_ms': (percentile(latencies['tts'], 0.99) or 0) * 1000,
+        'on_time': sum(counts[1] for counts in per_room.values()) / live_total if live_total else 0.0,
+        'fairness': jain([ratio for room, ratio in on_time.items() if room != flood_room]),
+        'flood_on_time': on_time[flood_room],
+        'outcomes': {},
+    }
+    for job in jobs.values():
+        result['outcomes'][job['outcome']] = result['outcomes'].get(job['outcome'], 0) + 1
+    if scheduler is not None:
+        result['scheduler'] = scheduler.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job scheduler load test")
+    parser.add_argument('--seconds', type=float, default=10.0, help="duration of the arrivals")
+    parser.add_argument('--rooms', type=int, default=5, help="normal rooms, one chunk per second each")
+    parser.add_argument('--flood', type=float, default=10.0, help="chunks per second of the flooding room")
+    parser.add_argument('--tts-rate', type=float, default=1.0, help="one-off /tts calls per second")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--deadline-ms', type=float, default=3000)
+    parser.add_argument('--overflow', default='coalesce', choices=('coalesce', 'drop_oldest'))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    events = arrivals(args.seconds, args.rooms, args.flood, args.tts_rate, args.seed)
+    load = ((args.rooms + args.flood) * (OVERHEAD + PER_AUDIO_SECOND) + args.tts_rate * TTS_SECONDS) / args.workers
+    print(f"{len(events)} jobs over {args.seconds:.0f} s, offered load {load:.2f} x capacity", file=sys.stderr)
+
+    report = {'offered_load': load}
+    for name, use_scheduler in (('fifo', False), ('scheduler', True)):
+        result = report[name] = run(events, args.workers, use_scheduler, args.deadline_ms, args.overflow)
+        print(f"{name:10s} live p50 {result['live_p50_ms']:7.0f} ms  p99 {result['live_p99_ms']:7.0f} ms  "
+              f"tts p99 {result['tts_p99_ms']:7.0f} ms  on time {result['on_time']:6.1%}  "
+              f"fairness {result['fairness']:.3f}  flood on time {result['flood_on_time']:6.1%}  "
+              f"{result['outcomes']}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Load generator for the asyncio service: concurrency vs latency
+Each request decodes one second of 44.1 kHz stereo WAV in the process pool
+and translates a unique sentence through async Azure against the local stub
+server, so no real provider is contacted.
+
+Usage:
+    python bench/bench_service.py [--concurrency 1,8,32,128] [--requests 256]
+                                  [--delay-ms 50] [--processes 4]
+"""
+
+import io
+import os
+import sys
+import math
+import json
+import time
+import wave
+import struct
+import asyncio
+import argparse
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+from stub_translate_server import start_stub_server
+
+
+def make_wav(seconds=1.0, rate=44100):
+    frames = b''.join(
+        struct.pack('<hh', sample, sample)
+        for sample in (int(6000 * math.sin(2 * math.pi * 220 * i / rate)) for i in range(int(seconds * rate)))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(frames)
+    return buffer.getvalue()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_level(service, wav, concurrency, requests):
+    latencies = []
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            start = time.perf_counter()
+            await service.decode(wav)
+            await service.translate(f"level {concurrency} sentence {i}", 'ta', 'en')
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'throughput_rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def main_async(args):
+    from service import Service
+
+    wav = make_wav()
+    results = []
+    async with Service(processes=args.processes, translator='azure') as service:
+        # Warm the process pool so start-up is not counted
+        await asyncio.gather(*(service.decode(wav) for _ in range(args.processes)))
+        for concurrency in args.concurrency:
+            result = await run_level(service, wav, concurrency, args.requests)
+            results.append(result)
+            print(f"concurrency {concurrency:4d}: {result['throughput_rps']:8.1f} req/s  "
+                  f"p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms", file=sys.stderr)
+        stats = service.stats()
+    return results, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio service concurrency benchmark")
+    parser.add_argument('--concurrency', default='1,8,32,128',
+                        type=lambda value: [int(level) for level in value.split(',')])
+    parser.add_argument('--requests', type=int, default=256, help="requests per concurrency level")
+    parser.add_argument('--delay-ms', type=float, default=50, help="stub translation round trip")
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(delay_ms=args.delay_ms)
+    os.environ['AZURE_TRANSLATOR_ENDPOINT'] = url
+    os.environ['TRANSLATION_CACHE_SIZE'] = '0'
+
+    results, stats = asyncio.run(main_async(args))
+    server.shutdown()
+    print(json.dumps({'levels': results, 'stages': stats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Cold-start benchmark for the per-request Python entry points
+server.js runs a fresh interpreter for every transcribe/translate/synthesize
+call, so import time is paid on every request. For each entry module this
+measures, over several runs (medians):
+- import_ms: cumulative import time of the module (python -X importtime)
+- wall_ms:   wall time of `python -c "import module"` minus a bare interpreter
+and checks import_ms against bench/startup_budget.json (wall time is too
+noisy on a busy machine to gate on, so it is only reported). Exits with
+status 1 when a module goes over its budget, so a new top-level import of a
+heavy SDK shows up as a failure. Modules that cannot be imported here (missing
+optional packages) are reported and skipped.
+
+Usage:
+    python bench/bench_startup.py [--runs 7] [--modules transcribe,translate]
+                                  [--update] [--headroom 1.5] [--margin-ms 10]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCH_DIR)
+BUDGET_PATH = os.path.join(BENCH_DIR, 'startup_budget.json')
+
+ENTRY_MODULES = [
+    'transcribe',
+    'transcribe_offline',
+    'translate',
+    'translate_azure',
+    'translate_deepl',
+    'translate_openai',
+    'synthesize',
+    'worker',
+]
+
+# Budgets never go below this, so tiny modules do not fail on noise
+MIN_BUDGET_MS = 15.0
+# Added to every budget on --update: scheduler and disk noise is a few ms
+# whatever the module costs, which a ratio alone leaves too tight on light ones
+MARGIN_MS = 10.0
+
+
+def _run(code, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', code]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=PYTHON_DIR, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def import_ms(module):
+    """Cumulative import time of module in ms, or None when it fails to import"""
+    _, result = _run(f"import {module}", importtime=True)
+    if result.returncode != 0:
+        return None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].rstrip() == ' ' + module:
+            return int(parts[1]) / 1000
+    return None
+
+
+def measure(module, runs, baseline_s):
+    imports, walls = [], []
+    for _ in range(runs):
+        cost = import_ms(module)
+        if cost is None:
+            _, result = _run(f"import {module}")
+            error = result.stderr.strip().splitlines()
+            return {'error': error[-1] if error else 'import failed'}
+        imports.append(cost)
+        elapsed, _ = _run(f"import {module}")
+        walls.append(max(0.0, elapsed - baseline_s) * 1000)
+    return {'import_ms': statistics.median(imports), 'wall_ms': statistics.median(walls)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the Python entry points")
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--modules', default=','.join(ENTRY_MODULES))
+    parser.add_argument('--update', action='store_true', help="rewrite the budget from this run")
+    parser.add_argument('--headroom', type=float, default=1.5,
+                        help="budget = measured * headroom + margin (with --update)")
+    parser.add_argument('--margin-ms', type=float, default=MARGIN_MS)
+    args = parser.parse_args()
+
+    # Warm the bytecode cache so the first run does not pay for compilation
+    modules = args.modules.split(',')
+    for module in modules:
+        _run(f"import {module}")
+    baseline_s = statistics.median(_run("pass")[0] for _ in range(args.runs))
+
+    budget = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH) as f:
+            budget = json.load(f)
+
+    report = {'baseline_ms': baseline_s * 1000, 'modules': {}}
+    over_budget = []
+    for module in modules:
+        result = measure(module, args.runs, baseline_s)
+        report['modules'][module] = result
+        if 'error' in result:
+            print(f"{module:20s} skipped: {result['error']}", file=sys.stderr)
+            continue
+
+        limit = budget.get(module)
+        status = 'ok'
+        if limit is not None and result['import_ms'] > limit:
+            status = 'OVER BUDGET'
+            over_budget.append(f"{module} import {result['import_ms']:.1f} ms > {limit:.1f} ms")
+        print(f"{module:20s} import {result['import_ms']:7.1f} ms (budget {limit or '-'})  "
+              f"wall {result['wall_ms']:7.1f} ms  {status}", file=sys.stderr)
+
+    if args.update:
+        for module, result in report['modules'].items():
+            if 'error' not in result:
+                budget[module] = round(max(MIN_BUDGET_MS, result['import_ms'] * args.headroom + args.margin_ms), 1)
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump(budget, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"[INFO] Budget written to {BUDGET_PATH}", file=sys.stderr)
+        over_budget = []
+
+    print(json.dumps(report, indent=2))
+    if over_budget:
+        for line in over_budget:
+            print(f"[ERROR] Start-up regression: {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: persistent worker vs one `python` process per call
+
+By default both paths run transcribe_offline on one second of silent WAV
+generated here (decoded, then skipped by the VAD), so the numbers measure
+process/import overhead rather than recognition or network latency. Pass
+--method translate to compare real translate_text calls instead. A call
+that fails on either path stops the bench, so failures are never timed.
+
+Usage:
+    python bench/bench_worker.py [--calls 20] [--workers 2] [--method offline|translate]
+"""
+
+import sys
+import os
+import time
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PYTHON_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+
+from fixtures import write_wav
+from worker import WorkerClient
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(f"{label:<16} calls={len(timings):<4} "
+          f"mean={statistics.mean(timings) * 1000:8.1f} ms  "
+          f"p50={statistics.median(timings) * 1000:8.1f} ms  "
+          f"p95={p95 * 1000:8.1f} ms")
+
+
+def bench_fork(script, args, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.join(PYTHON_DIR, script)] + args,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.decode(errors='replace').splitlines()
+                      if not line.startswith('[DEBUG]')]
+            raise RuntimeError(f"{script} exited {result.returncode}: {errors[-1] if errors else 'no output'}")
+    return timings
+
+
+def bench_worker(client, method, params, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client.call(method, params)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--method', choices=['offline', 'translate'], default='offline')
+    args = parser.parse_args()
+
+    fd, audio_path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    write_wav(audio_path, np.zeros(16000), 16000, 1)
+
+    if args.method == 'offline':
+        script, script_args = 'transcribe_offline.py', [audio_path]
+        method, params = 'transcribe_audio_offline', [audio_path]
+    else:
+        script, script_args = 'translate.py', ['hello, how are you', 'ta', 'en']
+        method, params = 'translate_text', ['hello, how are you', 'ta', 'en']
+
+    try:
+        try:
+            fork_timings = bench_fork(script, script_args, args.calls)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+
+        start = time.perf_counter()
+        client = WorkerClient(workers=args.workers)
+        client.call('ping')
+        startup = time.perf_counter() - start
+        try:
+            worker_timings = bench_worker(client, method, params, args.calls)
+        finally:
+            client.close()
+    finally:
+        os.unlink(audio_path)
+
+    print(f"Method: {method}")
+    summarize("fork-per-call", fork_timings)
+    summarize("worker", worker_timings)
+    print(f"worker startup   {startup * 1000:8.1f} ms (paid once)")
+    speedup = statistics.mean(fork_timings) / max(statistics.mean(worker_timings), 1e-9)
+    print(f"speedup          {speedup:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Deterministic audio fixtures for the benchmarks
+Speech-like signals (a voiced harmonic tone with a syllable envelope,
+separated by pauses over a low noise floor) so that the VAD and the
+segmenter treat them like real speech. Generated on demand instead of
+being stored in the repository; WebM/Opus is produced only when ffmpeg is
+installed.
+
+Usage:
+    python bench/fixtures.py [output_dir]   (default <tmp>/voice-bench-fixtures)
+"""
+
+import os
+import sys
+import wave
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'voice-bench-fixtures')
+
+FIXTURES = {
+    # name: (seconds, sample_rate, channels)
+    'utterance_16k_mono': (3.0, 16000, 1),
+    'utterance_44k_stereo': (3.0, 44100, 2),
+    'long_48k_mono': (12.0, 48000, 1),
+}
+
+
+def speech_like(seconds, sample_rate, seed=0):
+    """Float samples in [-1, 1]: syllables of a harmonic tone, pauses, background noise"""
+    rng = np.random.default_rng(seed)
+    count = int(seconds * sample_rate)
+    t = np.arange(count) / sample_rate
+
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(phase * harmonic) / harmonic for harmonic in range(1, 6))
+
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    # 1.2 s of speech, then a 0.6 s pause
+    speaking = (t % 1.8) < 1.2
+    signal = 0.25 * voiced * syllables * speaking + rng.normal(0, 0.002, count)
+    return np.clip(signal, -1, 1)
+
+
+def write_wav(path, samples, sample_rate, channels):
+    pcm = (samples * 32767).astype('<i2')
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1).reshape(-1)
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+
+def generate_fixtures(output_dir):
+    """Write the fixtures (if missing) and return {name: path}"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for seed, (name, (seconds, sample_rate, channels)) in enumerate(sorted(FIXTURES.items())):
+        path = os.path.join(output_dir, f"{name}.wav")
+        if not os.path.exists(path):
+            write_wav(path, speech_like(seconds, sample_rate, seed), sample_rate, channels)
+        paths[name] = path
+
+    if shutil.which('ffmpeg'):
+        source = paths['utterance_44k_stereo']
+        path = os.path.join(output_dir, 'utterance_opus.webm')
+        if not os.path.exists(path):
+            subprocess.run(
+                ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', source,
+                 '-c:a', 'libopus', '-b:a', '32k', path],
+                check=True
+            )
+        paths['utterance_opus'] = path
+    return paths
+
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DIR
+    for name, path in generate_fixtures(output_dir).items():
+        print(f"{name}: {path}")
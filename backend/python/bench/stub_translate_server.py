@@ -0,0 +1,178 @@
+"""
+Local stub of the Azure, DeepL, OpenAI and Google speech APIs for benchmarks
+Every request sleeps for a configurable round-trip time (plus jitter), so
+throughput numbers reflect how many HTTP requests a client makes.
+
+Endpoints:
+    POST /translate              Azure Translator v3 (JSON body [{"text": ...}], repeated ?to=)
+    POST /v2/translate           DeepL (form or JSON with text=... repeated, target_lang=...)
+    POST /v1/chat/completions    OpenAI chat completions (echoes the last line of the prompt)
+    POST /speech-api/v2/recognize  Google speech (what speech_recognition's recognize_google calls)
+    GET  /stats                  {"requests": N, "texts": M}
+
+Usage:
+    python bench/stub_translate_server.py [--port 8089] [--delay-ms 50] [--jitter-ms 0]
+Point the clients at it with:
+    AZURE_TRANSLATOR_ENDPOINT=http://127.0.0.1:8089
+    DEEPL_SERVER_URL=http://127.0.0.1:8089
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1
+    STT_GOOGLE_ENDPOINT=http://127.0.0.1:8089/speech-api/v2/recognize
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_translation(text, target_lang):
+    return f"[{target_lang}] {text}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _simulate_latency(self, texts):
+        server = self.server
+        with server.stats_lock:
+            server.stats['requests'] += 1
+            server.stats['texts'] += texts
+        delay = server.delay + random.uniform(-server.jitter, server.jitter)
+        time.sleep(max(0.0, delay))
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/stats':
+            with self.server.stats_lock:
+                return self._send_json(dict(self.server.stats))
+        self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        body = self._read_body()
+
+        if url.path == '/translate':
+            items = json.loads(body or b'[]')
+            targets = query.get('to', ['en'])
+            self._simulate_latency(len(items))
+            return self._send_json([
+                {
+                    'detectedLanguage': {'language': 'en', 'score': 1.0},
+                    'translations': [
+                        {'text': fake_translation(item['text'], target), 'to': target}
+                        for target in targets
+                    ]
+                }
+                for item in items
+            ])
+
+        if url.path == '/v2/translate':
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params = json.loads(body or b'{}')
+                texts = params.get('text', [])
+                target = params.get('target_lang', 'EN-US')
+            else:
+                params = parse_qs(body.decode('utf-8'))
+                texts = params.get('text', [])
+                target = params.get('target_lang', ['EN-US'])[0]
+            if isinstance(texts, str):
+                texts = [texts]
+            self._simulate_latency(len(texts))
+            return self._send_json({
+                'translations': [
+                    {'detected_source_language': 'EN', 'text': fake_translation(text, target)}
+                    for text in texts
+                ]
+            })
+
+        if url.path == '/v1/chat/completions':
+            messages = json.loads(body or b'{}').get('messages', [])
+            prompt = messages[-1]['content'] if messages else ''
+            self._simulate_latency(1)
+            return self._send_json({
+                'id': 'stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': 'stub',
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': fake_translation(prompt.splitlines()[-1], 'llm')},
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+
+        if url.path == '/speech-api/v2/recognize':
+            language = query.get('lang', ['en-US'])[0]
+            self._simulate_latency(1)
+            # Google sends an empty result line first, then the alternatives
+            result = {
+                'result': [{
+                    'alternative': [{'transcript': f"stub transcript {len(body)} bytes", 'confidence': 0.95}],
+                    'final': True,
+                }],
+                'result_index': 0,
+            }
+            payload = ('{"result":[]}\n' + json.dumps(result) + '\n').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Content-Language', language)
+            self.end_headers()
+            return self.wfile.write(payload)
+
+        self._send_json({'error': 'not found'}, 404)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # benchmarks open many connections at once
+
+
+def start_stub_server(port=0, delay_ms=50, jitter_ms=0):
+    """Start the stub in a background thread; returns (server, base_url)"""
+    server = StubServer(('127.0.0.1', port), StubHandler)
+    server.delay = delay_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.stats = {'requests': 0, 'texts': 0}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub translation and speech provider server")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.delay_ms, args.jitter_ms)
+    print(f"Stub provider server on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Offline phrase glossary: English phrases to translations, per target language
+Each language's phrase table is compiled once per process into a trie over
+words, and the text is matched left to right in one pass, taking the longest
+phrase at each position. Matching works on whole words, so "no" never
+matches inside "know", and overlaps resolve leftmost-longest: "good morning"
+wins over "morning" and does not depend on the order of the table.
+
+Two entry points:
+- lookup(): the whole utterance is one glossary phrase. A dict hit, cheap
+  enough to try before any network backend.
+- translate_phrases(): translations of every phrase found in the text, in
+  order; the offline last resort when every backend failed.
+
+On disk a glossary is one file per target language in GLOSSARY_DIR, named
+<target_lang>.tsv or <target_lang>.tsv.gz, with one "phrase<TAB>translation"
+pair per line; blank lines and lines starting with '#' are ignored. File
+entries extend and override the built-in phrases below.
+
+Environment:
+    GLOSSARY_DIR        directory with <lang>.tsv[.gz] files (default: built-in phrases only)
+    GLOSSARY_FAST_PATH  0 disables the exact-match lookup before the backends (default 1)
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import threading
+import unicodedata
+
+GLOSSARY_DIR = os.getenv('GLOSSARY_DIR') or None
+FAST_PATH = os.getenv('GLOSSARY_FAST_PATH', '1') != '0'
+
+BUILTIN_PHRASES = {
+    'ta': {
+        'hello': 'வணக்கம்',
+        'how are you': 'எப்படி இருக்கிறீர்கள்',
+        'thank you': 'நன்றி',
+        'good morning': 'காலை வணக்கம்',
+        'yes': 'ஆம்',
+        'no': 'இல்லை'
+    },
+    'hi': {
+        'hello': 'नमस्ते',
+        'how are you': 'आप कैसे हैं',
+        'thank you': 'धन्यवाद',
+        'good morning': 'सुप्रभात',
+        'yes': 'हाँ',
+        'no': 'नहीं'
+    },
+    'fr': {
+        'hello': 'Bonjour',
+        'how are you': 'Comment allez-vous',
+        'thank you': 'Merci',
+        'good morning': 'Bonjour',
+        'yes': 'Oui',
+        'no': 'Non'
+    },
+    'es': {
+        'hello': 'Hola',
+        'how are you': 'Cómo estás',
+        'thank you': 'Gracias',
+        'good morning': 'Buenos días',
+        'yes': 'Sí',
+        'no': 'No'
+    }
+}
+
+# Words are split on whitespace and these marks, so "Thank you!" is "thank you"
+WORD = re.compile(r'[^\s.,!?;:"()\[\]{}¡¿।。！？、，]+')
+# Trie key under which a node stores the translation of the phrase ending there
+_END = ''
+
+_lock = threading.Lock()
+_glossaries = {}  # target_lang -> Glossary (None when there is no phrase table)
+_stats = {'lookups': 0, 'exact_hits': 0, 'phrase_lookups': 0, 'phrase_hits': 0}
+
+
+def tokenize(text):
+    """Case-folded words of a text; phrases and input share this form"""
+    return WORD.findall(unicodedata.normalize('NFC', text).casefold())
+
+
+class Glossary:
+    """Compiled phrase table for one target language"""
+
+    def __init__(self, phrases):
+        start = time.perf_counter()
+        self.exact = {}  # 'word word' -> translation
+        self._trie = {}  # word -> child node, _END -> translation
+        self.longest_phrase = 0
+        for phrase, translation in phrases.items():
+            words = tokenize(phrase)
+            if not words or not translation:
+                continue
+            self.exact[' '.join(words)] = translation
+            node = self._trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_END] = translation
+            self.longest_phrase = max(self.longest_phrase, len(words))
+        self.compile_ms = (time.perf_counter() - start) * 1000
+
+    def __len__(self):
+        return len(self.exact)
+
+    def lookup(self, text):
+        """Translation when the whole text is one phrase, else None"""
+        return self.exact.get(' '.join(tokenize(text)))
+
+    def find(self, text):
+        """
+        Non-overlapping (start, end, translation) matches over the words of the
+        text, leftmost-longest; start and end are word indices
+        """
+        words = tokenize(text)
+        root = self._trie
+        matches = []
+        position = 0
+        while position < len(words):
+            node = root
+            best = None
+            index = position
+            while index < len(words):
+                node = node.get(words[index])
+                if node is None:
+                    break
+                index += 1
+                if _END in node:
+                    best = (index, node[_END])
+            if best is None:
+                position += 1
+            else:
+                matches.append((position, best[0], best[1]))
+                position = best[0]
+        return matches
+
+
+def _read_phrase_file(path):
+    if path.endswith('.gz'):
+        import gzip
+        opener = gzip.open
+    else:
+        opener = open
+    phrases = {}
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            phrase, separator, translation = line.partition('\t')
+            if separator:
+                phrases[phrase] = translation.strip()
+    return phrases
+
+
+def load_phrases(target_lang, glossary_dir=None):
+    """Built-in phrases for a language, extended by its file in the glossary directory"""
+    phrases = dict(BUILTIN_PHRASES.get(target_lang, {}))
+    glossary_dir = glossary_dir or GLOSSARY_DIR
+    if glossary_dir:
+        for name in (f"{target_lang}.tsv", f"{target_lang}.tsv.gz"):
+            path = os.path.join(glossary_dir, name)
+            if os.path.exists(path):
+                try:
+                    phrases.update(_read_phrase_file(path))
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"[WARNING] Could not read glossary {path}: {e}", file=sys.stderr)
+    return phrases
+
+
+def get_glossary(target_lang):
+    """Compiled glossary for a target language, built on first use; None if it has no phrases"""
+    with _lock:
+        if target_lang not in _glossaries:
+            phrases = load_phrases(target_lang)
+            _glossaries[target_lang] = Glossary(phrases) if phrases else None
+        return _glossaries[target_lang]
+
+
+def lookup(text, target_lang, source_lang='auto'):
+    """
+    Exact glossary translation of the whole text, or None
+    Only used for English (or undetected) input, since the phrases are English.
+    """
+    if not FAST_PATH or not text or source_lang not in ('auto', 'en'):
+        return None
+    glossary = get_glossary(target_lang)
+    result = glossary.lookup(text) if glossary is not None else None
+    with _lock:
+        _stats['lookups'] += 1
+        if result is not None:
+            _stats['exact_hits'] += 1
+    if result is not None:
+        print(f"[DEBUG] Glossary: {text} -> {result}", file=sys.stderr)
+    return result
+
+
+def translate_phrases(text, target_lang):
+    """Translations of the glossary phrases found in the text, joined in order; None if none"""
+    glossary = get_glossary(target_lang) if text else None
+    matches = glossary.find(text) if glossary is not None else []
+    with _lock:
+        _stats['phrase_lookups'] += 1
+        if matches:
+            _stats['phrase_hits'] += 1
+    if not matches:
+        return None
+    return ' '.join(translation for _, _, translation in matches)
+
+
+def get_glossary_stats():
+    """Lookup counters plus phrase count and compile time of each loaded language"""
+    with _lock:
+        stats = dict(_stats)
+        stats['languages'] = {
+            lang: {'phrases': len(glossary), 'compile_ms': glossary.compile_ms}
+            for lang, glossary in _glossaries.items() if glossary is not None
+        }
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python glossary.py <text> <target_language>")
+        sys.exit(1)
+
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    text, target_lang = sys.argv[1], sys.argv[2]
+    result = lookup(text, target_lang) or translate_phrases(text, target_lang)
+    print(result if result else f"[{target_lang.upper()}] {text}")
@@ -0,0 +1,162 @@
+"""
+Shared HTTP clients for the translation backends
+Keep-alive connection pools with timeouts and retry-with-backoff, built once
+per process (or once per thread for clients that are not thread-safe), plus
+per-backend request/connection statistics.
+
+Environment:
+    HTTP_POOL_SIZE   connections kept alive per host (default 10)
+    HTTP_TIMEOUT     seconds per request (default 10)
+    HTTP_RETRIES     retries on connection errors / 429 / 5xx (default 2)
+    HTTP_BACKOFF     backoff factor between retries in seconds (default 0.3)
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+BACKOFF = float(os.getenv('HTTP_BACKOFF', '0.3'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_local = threading.local()
+_sessions = {}  # backend -> requests.Session
+_clients = {}   # backend -> SDK client shared by all threads
+_pools = {}     # name -> ThreadPoolExecutor for per-language fan-out
+_stats = {}     # backend -> counters
+
+
+def _backend_stats(backend):
+    """Counters for one backend; caller holds the lock"""
+    if backend not in _stats:
+        _stats[backend] = {'requests': 0, 'errors': 0, 'total_time': 0.0, 'clients_created': 0}
+    return _stats[backend]
+
+
+def get_session(backend):
+    """Pooled requests.Session for a backend, created on first use"""
+    with _lock:
+        session = _sessions.get(backend)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=None,  # translation requests are safe to repeat, POST included
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[backend] = session
+            _backend_stats(backend)['clients_created'] += 1
+        return session
+
+
+def request(backend, method, url, **kwargs):
+    """session.request() through the backend's pool, with the default timeout"""
+    kwargs.setdefault('timeout', TIMEOUT)
+    with track(backend):
+        response = get_session(backend).request(method, url, **kwargs)
+    if response.status_code >= 400:
+        with _lock:
+            _backend_stats(backend)['errors'] += 1
+    return response
+
+
+def get_client(backend, factory):
+    """SDK client (deepl.Translator, OpenAI, ...) shared by every thread"""
+    with _lock:
+        client = _clients.get(backend)
+        if client is None:
+            client = _clients[backend] = factory()
+            _backend_stats(backend)['clients_created'] += 1
+        return client
+
+
+def get_fanout_pool(name):
+    """Long-lived threads for per-language fan-out, so their per-thread clients
+    and connections are reused between utterances; created on first use"""
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=8, thread_name_prefix=name)
+        return pool
+
+
+def get_thread_client(backend, factory):
+    """SDK client kept per thread, for clients that must not be shared"""
+    clients = getattr(_local, 'clients', None)
+    if clients is None:
+        clients = _local.clients = {}
+    client = clients.get(backend)
+    if client is None:
+        client = clients[backend] = factory()
+        with _lock:
+            _backend_stats(backend)['clients_created'] += 1
+    return client
+
+
+@contextmanager
+def track(backend):
+    """Record duration and failure of one provider call"""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if failed:
+            metrics.observe('provider_call', elapsed, backend=backend, error='true')
+        else:
+            metrics.observe('provider_call', elapsed, backend=backend)
+        with _lock:
+            stats = _backend_stats(backend)
+            stats['requests'] += 1
+            stats['total_time'] += elapsed
+            if failed:
+                stats['errors'] += 1
+
+
+def connection_stats():
+    """Per-backend request counts, latency and (for pooled sessions) connections opened"""
+    with _lock:
+        result = {}
+        for backend, counters in _stats.items():
+            stats = dict(counters)
+            stats['avg_ms'] = stats['total_time'] / stats['requests'] * 1000 if stats['requests'] else 0.0
+
+            session = _sessions.get(backend)
+            if session is not None:
+                pools = [
+                    adapter.poolmanager.pools[key]
+                    for adapter in set(session.adapters.values())
+                    for key in adapter.poolmanager.pools.keys()
+                ]
+                stats['connections_opened'] = sum(pool.num_connections for pool in pools)
+                stats['pooled_requests'] = sum(pool.num_requests for pool in pools)
+            result[backend] = stats
+        return result
+
+
+def get_googletrans_translator():
+    """googletrans Translator for the current thread (its httpx client is not thread-safe)"""
+    def factory():
+        from googletrans import Translator
+        return Translator(timeout=TIMEOUT)
+    return get_thread_client('googletrans', factory)
@@ -0,0 +1,389 @@
+"""
+Latency spans and histograms for the speech pipeline
+Stages are timed with
+
+    with metrics.span('decode', format='webm'):
+        ...
+
+and aggregated into fixed-bucket histograms that can be rendered in the
+Prometheus text format or as JSON. Only a sampled fraction of spans is
+recorded; with METRICS_SAMPLE_RATE=0, span() returns a shared no-op context
+and nothing is measured at all.
+
+Each process keeps its own histograms. When METRICS_DIR is set, every
+process also writes a snapshot there (<pid>.json) as soon as it records
+something and every few seconds after that, and collect() merges them, so
+one endpoint can report a whole worker pool and short-lived CLI runs. At
+exit a process folds its histograms into retired.json and removes its
+snapshot; collect() does the same for snapshots of processes that died
+without exiting cleanly, so files do not pile up and a reused pid never
+replaces (and shrinks) counts already reported.
+
+Environment:
+    METRICS_SAMPLE_RATE    fraction of spans recorded, 0 disables (default 0.1)
+    METRICS_DIR            directory for per-process snapshots (default: none)
+    METRICS_FLUSH_SECONDS  snapshot interval (default 5)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from contextlib import nullcontext
+
+SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_histograms = {}  # (stage, ((label, value), ...)) -> [bucket counts..., count, sum]
+_flusher = None
+_write_lock = threading.Lock()  # a snapshot taken later is never overwritten by an older one
+_finished = False  # set at exit, once this process's histograms are in retired.json
+
+RETIRED_NAME = 'retired.json'
+
+
+def _metrics_dir():
+    """
+    METRICS_DIR, read when needed rather than at import: worker.py sets it
+    after this module may already have been imported
+    """
+    return os.getenv('METRICS_DIR') or None
+
+
+class _Span:
+    __slots__ = ('stage', 'labels', 'start')
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels['error'] = exc_type.__name__
+        _observe(self.stage, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+def span(stage, **labels):
+    """Context manager timing one stage; a no-op unless this call is sampled"""
+    if SAMPLE_RATE <= 0 or (SAMPLE_RATE < 1 and random.random() >= SAMPLE_RATE):
+        return _NOOP
+    return _Span(stage, labels)
+
+
+def observe(stage, seconds, **labels):
+    """Record a duration that was measured elsewhere, subject to the same sampling"""
+    if SAMPLE_RATE <= 0 or (SAMPLE_RATE < 1 and random.random() >= SAMPLE_RATE):
+        return
+    _observe(stage, seconds, labels)
+
+
+def _observe(stage, seconds, labels):
+    key = (stage, tuple(sorted(labels.items())))
+    index = 0
+    while index < len(BUCKETS) and seconds > BUCKETS[index]:
+        index += 1
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0, 0.0]
+        histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+    if _flusher is None and _metrics_dir():
+        _start_flusher()
+
+
+def _snapshot():
+    """This process's histograms as a JSON-serializable list"""
+    with _lock:
+        return [
+            {'stage': stage, 'labels': dict(labels), 'buckets': values[:-2], 'count': values[-2], 'sum': values[-1]}
+            for (stage, labels), values in _histograms.items()
+        ]
+
+
+def _write_json(path, entries):
+    import tempfile
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entries, f)
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _write_snapshot():
+    directory = _metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, f"{os.getpid()}.json"), _snapshot())
+
+
+class _DirectoryLock:
+    """Exclusive lock on METRICS_DIR across processes (a no-op without fcntl)"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.lock')
+        self.fd = None
+
+    def __enter__(self):
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.fd is not None:
+            os.close(self.fd)  # releases the lock
+            self.fd = None
+        return False
+
+
+def _retire(path):
+    """Fold a finished process's snapshot into retired.json and remove it"""
+    with _DirectoryLock(os.path.dirname(path)):
+        _retire_locked(path)
+
+
+def _retire_locked(path):
+    if not os.path.exists(path):
+        return  # retired by another process meanwhile
+    retired_path = os.path.join(os.path.dirname(path), RETIRED_NAME)
+    _write_json(retired_path, _merge([_read_json(retired_path), _read_json(path)]))
+    os.remove(path)
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        return True  # os.kill(pid, 0) would terminate it on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _flush():
+    try:
+        with _write_lock:
+            if not _finished:
+                _write_snapshot()
+    except OSError as e:
+        print(f"[WARNING] Could not write metrics snapshot: {e}", file=sys.stderr)
+
+
+def close():
+    """
+    A last snapshot, folded into retired.json; runs at exit. Nothing this
+    process records afterwards is written.
+    """
+    global _finished
+    try:
+        with _write_lock:
+            if _finished:
+                return
+            _finished = True
+            _write_snapshot()
+            directory = _metrics_dir()
+            if directory:
+                _retire(os.path.join(directory, f"{os.getpid()}.json"))
+    except OSError as e:
+        print(f"[WARNING] Could not write metrics snapshot: {e}", file=sys.stderr)
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+
+        def flush_loop():
+            while True:
+                time.sleep(FLUSH_SECONDS)
+                _flush()
+
+        _flusher = threading.Thread(target=flush_loop, name='metrics-flush', daemon=True)
+        _flusher.start()
+
+    # A snapshot under this pid is left by a dead process the pid belonged to
+    directory = _metrics_dir()
+    if os.path.exists(os.path.join(directory, f"{os.getpid()}.json")):
+        try:
+            _retire(os.path.join(directory, f"{os.getpid()}.json"))
+        except OSError as e:
+            print(f"[WARNING] Could not retire metrics snapshot: {e}", file=sys.stderr)
+
+    # First snapshot right away and a last one at exit: per-call scripts often
+    # live shorter than FLUSH_SECONDS
+    _flush()
+    import atexit
+    atexit.register(close)
+    if 'multiprocessing' in sys.modules:
+        # Pool worker processes leave through os._exit, which skips atexit
+        from multiprocessing.util import Finalize
+        Finalize(None, close, exitpriority=0)
+
+
+def collect():
+    """
+    Histograms of this process, merged with the snapshots in METRICS_DIR
+    (those of dead processes are retired first)
+    """
+    snapshots = [_snapshot()]
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return _merge(snapshots)
+    # Locked, so a process retiring meanwhile is counted exactly once
+    with _DirectoryLock(directory):
+        for name in os.listdir(directory):
+            pid = name[:-len('.json')]
+            if not name.endswith('.json') or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            path = os.path.join(directory, name)
+            if _pid_alive(int(pid)):
+                snapshots.append(_read_json(path))
+                continue
+            try:
+                _retire_locked(path)
+            except OSError as e:
+                print(f"[WARNING] Could not retire metrics snapshot {name}: {e}", file=sys.stderr)
+        snapshots.append(_read_json(os.path.join(directory, RETIRED_NAME)))
+    return _merge(snapshots)
+
+
+def _merge(snapshots):
+    """Histogram entries of several snapshots, summed per stage and label set"""
+    merged = {}
+    for entries in snapshots:
+        for entry in entries:
+            key = (entry['stage'], tuple(sorted(entry['labels'].items())))
+            target = merged.get(key)
+            if target is None:
+                merged[key] = {**entry, 'buckets': list(entry['buckets'])}
+                continue
+            target['buckets'] = [a + b for a, b in zip(target['buckets'], entry['buckets'])]
+            target['count'] += entry['count']
+            target['sum'] += entry['sum']
+    return sorted(merged.values(), key=lambda entry: (entry['stage'], sorted(entry['labels'].items())))
+
+
+def _quantile(buckets, count, fraction):
+    """Upper bound of the bucket holding the given quantile, in seconds"""
+    if not count:
+        return None
+    rank = fraction * count
+    seen = 0
+    for bound, bucket in zip(BUCKETS, buckets):
+        seen += bucket
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+
+def get_metrics():
+    """JSON view: per stage and label set, count, mean and approximate p50/p95/p99 in ms"""
+    stages = []
+    for entry in collect():
+        stats = {
+            'stage': entry['stage'],
+            'labels': entry['labels'],
+            'count': entry['count'],
+            'mean_ms': entry['sum'] / entry['count'] * 1000 if entry['count'] else 0.0,
+        }
+        for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            value = _quantile(entry['buckets'], entry['count'], fraction)
+            stats[name] = value * 1000 if value is not None else None
+        stages.append(stats)
+    return {'sample_rate': SAMPLE_RATE, 'stages': stages}
+
+
+def _format_labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def render_prometheus():
+    """Prometheus text exposition of every stage histogram"""
+    lines = [
+        '# HELP voice_stage_duration_seconds Duration of pipeline stages (sampled)',
+        '# TYPE voice_stage_duration_seconds histogram',
+    ]
+    for entry in collect():
+        labels = [('stage', entry['stage'])] + sorted(entry['labels'].items())
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + (float('inf'),), entry['buckets']):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'voice_stage_duration_seconds_bucket{{{_format_labels(labels + [("le", le)])}}} {cumulative}')
+        lines.append(f'voice_stage_duration_seconds_sum{{{_format_labels(labels)}}} {entry["sum"]}')
+        lines.append(f'voice_stage_duration_seconds_count{{{_format_labels(labels)}}} {entry["count"]}')
+    lines.append('# HELP voice_metrics_sample_rate Fraction of spans recorded')
+    lines.append('# TYPE voice_metrics_sample_rate gauge')
+    lines.append(f'voice_metrics_sample_rate {SAMPLE_RATE}')
+    return '\n'.join(lines) + '\n'
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """Serve /metrics (Prometheus) and /metrics.json from a background thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = render_prometheus().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(get_metrics()).encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"[INFO] Metrics on http://{host}:{server.server_address[1]}/metrics", file=sys.stderr)
+    return server
+
+
+if __name__ == "__main__":
+    # Print the merged metrics of a running worker pool: METRICS_DIR=... python metrics.py [--json]
+    if len(sys.argv) > 1 and sys.argv[1] == '--json':
+        print(json.dumps(get_metrics(), indent=2))
+    else:
+        sys.stdout.write(render_prometheus())
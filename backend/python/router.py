@@ -0,0 +1,345 @@
+"""
+Latency-aware router over the translation backends
+Keeps a rolling window of latency and failures per backend and
+(source, target) pair, sends each request to the fastest healthy backend and,
+when that backend is slower than its own p95, hedges with the next one and
+takes whichever answers first. A backend that keeps failing is skipped by a
+circuit breaker until its cooldown has passed, then gets one trial call.
+
+Environment:
+    ROUTER_BACKENDS        comma-separated backends to route over, in preference
+                           order (default: every configured one)
+    ROUTER_HEDGE           0 disables hedged requests (default 1)
+    ROUTER_HEDGE_MIN_MS    never hedge earlier than this (default 150)
+    ROUTER_WINDOW          samples kept per backend and pair (default 100)
+    ROUTER_MAX_AGE         seconds after which samples are forgotten, so a
+                           backend that recovered gets tried again (default 60)
+    ROUTER_BREAKER_FAILURES  consecutive failures that open the breaker (default 5)
+    ROUTER_BREAKER_COOLDOWN  seconds before an open breaker lets one trial call through (default 30)
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import glossary
+from translation_cache import is_cacheable
+
+HEDGE = os.getenv('ROUTER_HEDGE', '1') != '0'
+HEDGE_MIN_MS = float(os.getenv('ROUTER_HEDGE_MIN_MS', '150'))
+WINDOW = int(os.getenv('ROUTER_WINDOW', '100'))
+MAX_AGE = float(os.getenv('ROUTER_MAX_AGE', '60'))
+BREAKER_FAILURES = int(os.getenv('ROUTER_BREAKER_FAILURES', '5'))
+BREAKER_COOLDOWN = float(os.getenv('ROUTER_BREAKER_COOLDOWN', '30'))
+
+# Below this many samples for a pair, the backend-wide window is used instead
+MIN_PAIR_SAMPLES = 10
+
+
+class RollingStats:
+    """Latency (seconds) and success of the most recent calls"""
+
+    def __init__(self, window=WINDOW, max_age=MAX_AGE):
+        self.samples = deque(maxlen=window)
+        self._times = deque(maxlen=window)
+        self.max_age = max_age
+
+    def record(self, latency, ok, now):
+        self.samples.append((latency, ok))
+        self._times.append(now)
+
+    def expire(self, now):
+        while self._times and now - self._times[0] > self.max_age:
+            self._times.popleft()
+            self.samples.popleft()
+
+    def latency_percentile(self, fraction):
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def score(self):
+        """Expected time until a success if failed calls were repeated: mean / success rate"""
+        if not self.samples:
+            return 0.0  # untried backends get tried
+        mean = sum(latency for latency, _ in self.samples) / len(self.samples)
+        return mean / max(0.01, 1.0 - self.error_rate())
+
+    def summary(self):
+        p50 = self.latency_percentile(0.50)
+        p95 = self.latency_percentile(0.95)
+        return {
+            'samples': len(self.samples),
+            'p50_ms': p50 * 1000 if p50 is not None else None,
+            'p95_ms': p95 * 1000 if p95 is not None else None,
+            'error_rate': self.error_rate(),
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures; after the cooldown it is half-open and
+    lets a single trial call through, whose result closes or re-opens it
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self, now):
+        """Closed, or open past its cooldown with no trial call running"""
+        if self.opened_at is None:
+            return True
+        return not self.probing and now - self.opened_at >= self.cooldown
+
+    def acquire(self, now):
+        """Permission to make a call; taking the trial call of a half-open breaker"""
+        if not self.allow(now):
+            return False
+        if self.opened_at is not None:
+            self.probing = True
+        return True
+
+    def record(self, ok, now):
+        self.probing = False
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            # A failed trial call re-opens it for another cooldown
+            if self.failures >= self.max_failures:
+                self.opened_at = now
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.probing else 'open'
+
+
+class TranslationRouter:
+    """
+    Routes translate(text, target_lang, source_lang) over named backends
+    backends: {name: fn(text, target_lang, source_lang) -> str}; a backend
+    fails by raising or returning None / '[Translation Error] ...'.
+    """
+
+    def __init__(self, backends, hedge=HEDGE, hedge_min_ms=HEDGE_MIN_MS, max_age=MAX_AGE,
+                 breaker_failures=BREAKER_FAILURES, breaker_cooldown=BREAKER_COOLDOWN, max_workers=32):
+        self.backends = dict(backends)
+        self.hedge = hedge
+        self.hedge_min = hedge_min_ms / 1000
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._stats = {}  # (backend, pair or None) -> RollingStats
+        self._breakers = {name: CircuitBreaker(breaker_failures, breaker_cooldown) for name in self.backends}
+        self._counters = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'fallbacks': 0, 'failures': 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='router')
+
+    def _window(self, backend, pair):
+        """Per-pair stats once there are enough samples, else the backend-wide window"""
+        stats = self._stats.get((backend, pair))
+        if stats is None or len(stats.samples) < MIN_PAIR_SAMPLES:
+            stats = self._stats.get((backend, None))
+        return stats or RollingStats()
+
+    def _record(self, backend, pair, latency, ok):
+        now = time.monotonic()
+        with self._lock:
+            for key in ((backend, pair), (backend, None)):
+                if key not in self._stats:
+                    self._stats[key] = RollingStats(max_age=self.max_age)
+                self._stats[key].record(latency, ok, now)
+            self._breakers[backend].record(ok, now)
+
+    def _ranked(self, pair):
+        """Backends whose breaker lets a call through, fastest expected first"""
+        now = time.monotonic()
+        with self._lock:
+            for stats in self._stats.values():
+                stats.expire(now)
+            order = list(self.backends)
+            available = [name for name in order if self._breakers[name].allow(now)]
+            return sorted(available, key=lambda name: (self._window(name, pair).score(), order.index(name)))
+
+    def _hedge_delay(self, backend, pair):
+        with self._lock:
+            p95 = self._window(backend, pair).latency_percentile(0.95)
+        return max(self.hedge_min, p95 or 0.0)
+
+    def _call(self, backend, text, target_lang, source_lang):
+        """Run one backend; returns (backend, result or None)"""
+        pair = (source_lang, target_lang)
+        start = time.perf_counter()
+        try:
+            result = self.backends[backend](text, target_lang, source_lang)
+        except Exception as e:
+            print(f"[ERROR] {backend} translation failed: {e}", file=sys.stderr)
+            result = None
+        ok = is_cacheable(result)
+        self._record(backend, pair, time.perf_counter() - start, ok)
+        return backend, result if ok else None
+
+    def translate(self, text, target_lang, source_lang='auto'):
+        """Translation from the first backend to succeed, or None if all fail"""
+        pair = (source_lang, target_lang)
+        candidates = self._ranked(pair)
+        with self._lock:
+            self._counters['requests'] += 1
+
+        pending = set()
+        started = {}  # future -> backend
+        primary = None
+        hedges = set()
+        while candidates or pending:
+            # One call at a time, plus at most one hedge running next to it
+            if candidates and (not pending or (self.hedge and len(pending) < 2)):
+                backend = candidates.pop(0)
+                with self._lock:
+                    if not self._breakers[backend].acquire(time.monotonic()):
+                        # Half-open, and another request is making its trial call
+                        continue
+                    if primary is None:
+                        primary = backend
+                    elif pending:
+                        hedges.add(backend)
+                        self._counters['hedged'] += 1
+                    else:
+                        self._counters['fallbacks'] += 1
+                future = self._pool.submit(self._call, backend, text, target_lang, source_lang)
+                started[future] = backend
+                pending.add(future)
+
+            # Give the running call (primary or fallback) until its own p95 before hedging
+            running = [started[future] for future in pending]
+            timeout = (self._hedge_delay(running[0], pair)
+                       if self.hedge and candidates and len(running) == 1 else None)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend, result = future.result()
+                if result is not None:
+                    if backend in hedges:
+                        with self._lock:
+                            self._counters['hedge_wins'] += 1
+                    print(f"[DEBUG] Routed {pair} to {backend}", file=sys.stderr)
+                    return result
+
+        with self._lock:
+            self._counters['failures'] += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._counters)
+            result['backends'] = {}
+            for (backend, pair), window in self._stats.items():
+                entry = result['backends'].setdefault(backend, {
+                    'breaker': self._breakers[backend].state,
+                    'pairs': {},
+                })
+                if pair is None:
+                    entry.update(window.summary())
+                else:
+                    entry['pairs']['->'.join(pair)] = window.summary()
+        return result
+
+
+def _configured_backends():
+    """Every backend with credentials, in the default preference order"""
+    backends = {}
+
+    def googletrans(text, target_lang, source_lang):
+        from translate import translate_with_googletrans
+        return translate_with_googletrans(text, target_lang, source_lang)
+    backends['googletrans'] = googletrans
+
+    if os.getenv('OPENAI_API_KEY'):
+        def openai(text, target_lang, source_lang):
+            from translate_openai import translate_with_openai
+            return translate_with_openai(text, target_lang, source_lang)
+        backends['openai'] = openai
+
+    if os.getenv('DEEPL_API_KEY'):
+        def deepl(text, target_lang, source_lang):
+            from translate_deepl import translate_with_deepl
+            return translate_with_deepl(text, target_lang, source_lang)
+        backends['deepl'] = deepl
+
+    if os.getenv('AZURE_TRANSLATOR_KEY'):
+        def azure(text, target_lang, source_lang):
+            from translate_azure import translate_with_azure
+            return translate_with_azure(text, target_lang, source_lang)
+        backends['azure'] = azure
+
+    selected = [name.strip() for name in os.getenv('ROUTER_BACKENDS', '').split(',') if name.strip()]
+    if selected:
+        backends = {name: backends[name] for name in selected if name in backends}
+    return backends
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = TranslationRouter(_configured_backends())
+        return _router
+
+
+def translate_routed(text, target_lang, source_lang='auto'):
+    """
+    Translate through the glossary fast path and the router, then the phrase
+    table, then the tagged original (the same order as translate.translate_text)
+    """
+    result = glossary.lookup(text, target_lang, source_lang)
+    if result:
+        return result
+
+    result = get_router().translate(text, target_lang, source_lang)
+    if result:
+        return result
+
+    result = glossary.translate_phrases(text, target_lang)
+    if result:
+        return result
+
+    print("[WARNING] All translation methods failed, returning original", file=sys.stderr)
+    return f"[{target_lang.upper()}] {text}"
+
+
+def get_router_stats():
+    return get_router().stats()
+
+
+if __name__ == "__main__":
+    import io
+    import json
+
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    if len(sys.argv) < 3:
+        print("Usage: python router.py <text> <target_language> [source_language]")
+        sys.exit(1)
+
+    text = sys.argv[1]
+    target_lang = sys.argv[2]
+    source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+    print(translate_routed(text, target_lang, source_lang))
+    print(json.dumps(get_router_stats(), indent=2), file=sys.stderr)
@@ -0,0 +1,353 @@
+"""
+Deadline-aware scheduling of pipeline jobs in front of the worker pool
+Every job (a transcribe_bytes, translate_text, synthesize_speech... call) has
+a priority and, for live rooms, a deadline. At most `capacity` jobs run at
+once; the rest wait in per-room queues:
+
+- priority: 'live' room jobs go before 'interactive' one-off calls (/tts),
+  which go before 'batch' work
+- fair sharing: among rooms with work of the same priority, the room that
+  has received the least service time goes next, so one busy room cannot
+  starve the others; within a room, earliest deadline first
+- stale chunks: a job that can no longer finish before its deadline (now +
+  the recent service time of its method) is not run. When a later job of the
+  same stream is queued and can still make its own deadline with the extra
+  input, it is merged into it (consecutive PCM or text is joined, so nothing
+  said is lost and the stream catches up in one call); otherwise it is
+  dropped.
+- bounded rooms: a room holds at most SCHED_ROOM_DEPTH queued jobs. When
+  full, policy 'coalesce' merges the new job into the newest queued job of
+  its stream, 'drop_oldest' (and coalesce when nothing matches) drops the
+  room's oldest job of the lowest priority.
+
+A merged job carries at most SCHED_MAX_MERGE chunks: merging saves the
+per-call overhead but not the per-second work, so an unbounded merge would
+only turn a backlog into one late call.
+
+    scheduler = Scheduler(dispatch, capacity=2)
+    future = scheduler.submit('translate_text', {'text': 'hello', 'target_lang': 'ta'},
+                              room='room1', priority='live', stream='room1:alice')
+
+dispatch(method, params, stream) must return a concurrent.futures.Future
+(stream lets it keep a stream's jobs on the process that holds its state). A
+job that is not run completes with JobShed (reason 'deadline', 'overflow' or
+'merged').
+
+Environment:
+    SCHED_LIVE_DEADLINE_MS         deadline of live room jobs (default 3000)
+    SCHED_INTERACTIVE_DEADLINE_MS  deadline of one-off calls, 0 for none (default 0)
+    SCHED_ROOM_DEPTH               queued jobs per room (default 8)
+    SCHED_OVERFLOW                 'coalesce' or 'drop_oldest' (default coalesce)
+    SCHED_MAX_MERGE                chunks joined into one job at most (default 4)
+"""
+
+import os
+import json
+import time
+import heapq
+import base64
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+LIVE_DEADLINE_MS = float(os.getenv('SCHED_LIVE_DEADLINE_MS', '3000'))
+INTERACTIVE_DEADLINE_MS = float(os.getenv('SCHED_INTERACTIVE_DEADLINE_MS', '0'))
+ROOM_DEPTH = int(os.getenv('SCHED_ROOM_DEPTH', '8'))
+OVERFLOW = os.getenv('SCHED_OVERFLOW', 'coalesce')
+MAX_MERGE = int(os.getenv('SCHED_MAX_MERGE', '4'))
+
+PRIORITIES = {'live': 0, 'interactive': 1, 'batch': 2}
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+DEFAULT_DEADLINES_MS = {'live': LIVE_DEADLINE_MS, 'interactive': INTERACTIVE_DEADLINE_MS, 'batch': 0}
+
+# Weight of the latest service time in the per-method moving average (seconds per chunk)
+SERVICE_ALPHA = 0.2
+
+
+class JobShed(RuntimeError):
+    """A job that was not run: too late, pushed out of a full room, or merged into a later job"""
+
+    def __init__(self, reason, merged_into=None):
+        message = f"Job shed ({reason})" if merged_into is None else f"Job merged into {merged_into}"
+        super().__init__(message)
+        self.reason = reason
+        self.merged_into = merged_into
+
+
+def _merge_text(older, newer):
+    merged = dict(newer)
+    merged['text'] = ' '.join(part for part in (older.get('text'), newer.get('text')) if part)
+    return merged
+
+
+def _merge_pcm(older, newer):
+    merged = dict(newer)
+    if 'data_b64' in newer:
+        data = base64.b64decode(older['data_b64']) + base64.b64decode(newer['data_b64'])
+        merged['data_b64'] = base64.b64encode(data).decode('ascii')
+    else:
+        merged['data'] = bytes(older['data']) + bytes(newer['data'])
+    return merged
+
+
+# method -> (merge(older_params, newer_params), params that are joined rather than matched)
+MERGERS = {
+    'translate_text': (_merge_text, ('text',)),
+    'transcribe_bytes': (_merge_pcm, ('data', 'data_b64')),
+}
+
+
+def merge_key(method, params, stream):
+    """Jobs with equal keys can be joined into one call; None when the job cannot be merged"""
+    if stream is None or method not in MERGERS or not isinstance(params, dict):
+        return None
+    # Only raw PCM concatenates; compressed chunks each carry their own headers
+    if method == 'transcribe_bytes' and params.get('audio_format') != 'pcm':
+        return None
+    fixed = {name: value for name, value in params.items() if name not in MERGERS[method][1]}
+    return (method, stream, json.dumps(fixed, sort_keys=True, default=str))
+
+
+class _Job:
+    __slots__ = ('seq', 'method', 'params', 'room', 'stream', 'level', 'deadline', 'enqueued', 'key', 'tag',
+                 'future', 'units', 'started', 'charge')
+
+    def __init__(self, seq, method, params, room, stream, level, deadline, key, tag):
+        self.seq = seq
+        self.method = method
+        self.params = params
+        self.room = room
+        self.stream = stream
+        self.level = level
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.key = key
+        self.tag = tag
+        self.future = Future()
+        self.units = 1  # chunks joined into this job
+        self.started = None
+        self.charge = 0.0
+
+    def __lt__(self, other):
+        return ((self.level, self.deadline or float('inf'), self.seq)
+                < (other.level, other.deadline or float('inf'), other.seq))
+
+
+class _Room:
+    __slots__ = ('queue', 'vtime', 'running')
+
+    def __init__(self, vtime):
+        self.queue = []  # heap of _Job
+        self.vtime = vtime  # service seconds received, for fair sharing
+        self.running = 0
+
+
+class Scheduler:
+    """
+    dispatch(method, params, stream) -> Future runs a job; capacity: jobs running at once
+    room_depth bounds the queue of each named room (jobs without a room are
+    never pushed out); overflow is 'coalesce' or 'drop_oldest'.
+    """
+
+    def __init__(self, dispatch, capacity=2, room_depth=ROOM_DEPTH, overflow=OVERFLOW, deadlines_ms=None,
+                 max_merge=MAX_MERGE):
+        if overflow not in ('coalesce', 'drop_oldest'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.dispatch = dispatch
+        self.capacity = capacity
+        self.room_depth = room_depth
+        self.overflow = overflow
+        self.max_merge = max_merge
+        self.deadlines_ms = dict(DEFAULT_DEADLINES_MS, **(deadlines_ms or {}))
+
+        self._lock = threading.Lock()
+        self._rooms = {}  # room -> _Room, while it has queued or running jobs
+        self._service = {}  # method -> moving average of service seconds per chunk
+        self._running = 0
+        self._seq = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'errors': 0,
+                       'shed_deadline': 0, 'shed_overflow': 0, 'merged': 0}
+        self._waits = {name: [0, 0.0] for name in PRIORITIES}  # priority -> [jobs, wait seconds]
+
+    def submit(self, method, params=None, room=None, priority='interactive', deadline_ms=None, stream=None, tag=None):
+        """
+        Queue one job; returns a Future with its result
+        deadline_ms counts from now (default: the priority's deadline, 0 for
+        none). stream names the speaker/stream whose consecutive jobs may be
+        merged; tag identifies the job in JobShed.merged_into (e.g. a request id).
+        """
+        level = PRIORITIES.get(priority)
+        if level is None:
+            raise ValueError(f"Unknown priority: {priority}")
+        if deadline_ms is None:
+            deadline_ms = self.deadlines_ms[priority]
+        shed = []
+        with self._lock:
+            self._seq += 1
+            job = _Job(self._seq, method, params, room, stream, level,
+                       time.monotonic() + deadline_ms / 1000 if deadline_ms else None,
+                       merge_key(method, params, stream), tag if tag is not None else self._seq)
+            state = self._rooms.get(room)
+            if state is None:
+                # A room that was idle starts level with the least served active room:
+                # no credit banked while idle, no penalty for past service
+                state = self._rooms[room] = _Room(min((r.vtime for r in self._rooms.values()), default=0.0))
+            self._stats['submitted'] += 1
+            if room is not None and len(state.queue) >= self.room_depth:
+                self._overflow(state, job, shed)
+            else:
+                heapq.heappush(state.queue, job)
+        self._resolve_shed(shed)
+        self._pump()
+        return job.future
+
+    def call(self, method, params=None, timeout=None, **options):
+        return self.submit(method, params, **options).result(timeout)
+
+    def _merge(self, older, newer):
+        """Join older's input into newer's; caller holds the lock"""
+        newer.params = MERGERS[newer.method][0](older.params, newer.params)
+        newer.units += older.units
+
+    def _overflow(self, state, job, shed):
+        """Make room for job in a full queue; caller holds the lock"""
+        if self.overflow == 'coalesce' and job.key is not None:
+            same = [queued for queued in state.queue
+                    if queued.key == job.key and queued.units + job.units <= self.max_merge]
+            if same:
+                # The queued job takes the new input and, with it, the new deadline
+                target = max(same, key=lambda queued: queued.seq)
+                target.params = MERGERS[job.method][0](target.params, job.params)
+                target.units += job.units
+                target.deadline = job.deadline
+                heapq.heapify(state.queue)
+                shed.append((job, 'merged', target))
+                return
+        victim = max(state.queue + [job], key=lambda queued: (queued.level, -queued.seq))
+        if victim is not job:
+            state.queue.remove(victim)
+            heapq.heapify(state.queue)
+            heapq.heappush(state.queue, job)
+        shed.append((victim, 'overflow', None))
+
+    def _take(self, shed):
+        """Next job to run, shedding stale ones on the way; caller holds the lock"""
+        now = time.monotonic()
+        while True:
+            waiting = [(room, state) for room, state in self._rooms.items() if state.queue]
+            if not waiting:
+                return None
+            level = min(state.queue[0].level for _, state in waiting)
+            room, state = min(((room, state) for room, state in waiting if state.queue[0].level == level),
+                              key=lambda item: item[1].vtime)
+            job = heapq.heappop(state.queue)
+
+            per_unit = self._service.get(job.method, 0.0)
+            estimate = per_unit * job.units
+            if job.deadline is not None and now + estimate > job.deadline:
+                later = [queued for queued in state.queue
+                         if job.key is not None and queued.key == job.key
+                         and queued.units + job.units <= self.max_merge
+                         and (queued.deadline is None
+                              or now + per_unit * (queued.units + job.units) <= queued.deadline)]
+                if later:
+                    target = min(later, key=lambda queued: queued.seq)
+                    self._merge(job, target)
+                    shed.append((job, 'merged', target))
+                else:
+                    shed.append((job, 'deadline', None))
+                self._release_room(room, state)
+                continue
+
+            job.started = now
+            job.charge = estimate
+            state.vtime += estimate
+            state.running += 1
+            self._running += 1
+            waits = self._waits[PRIORITY_NAMES[job.level]]
+            waits[0] += 1
+            waits[1] += now - job.enqueued
+            return job
+
+    def _release_room(self, room, state):
+        if not state.queue and not state.running:
+            del self._rooms[room]
+
+    def _resolve_shed(self, shed):
+        """Complete shed jobs' futures, outside the lock"""
+        for job, reason, target in shed:
+            age = time.monotonic() - job.enqueued
+            metrics.observe('scheduler_shed', age, reason=reason)
+            with self._lock:
+                self._stats['merged' if reason == 'merged' else f"shed_{reason}"] += 1
+            job.future.set_exception(JobShed(reason, target.tag if target is not None else None))
+
+    def _pump(self):
+        """Start queued jobs while there is capacity"""
+        while True:
+            shed = []
+            with self._lock:
+                job = self._take(shed) if self._running < self.capacity else None
+            self._resolve_shed(shed)
+            if job is None:
+                return
+            metrics.observe('scheduler_queue_wait', job.started - job.enqueued, priority=PRIORITY_NAMES[job.level])
+            try:
+                future = self.dispatch(job.method, job.params, job.stream)
+            except Exception as e:
+                self._finished(job, None, e)
+                continue
+            future.add_done_callback(lambda f, job=job: self._finished(job, f, None))
+
+    def _finished(self, job, future, error):
+        elapsed = time.monotonic() - job.started
+        if error is None:
+            error = future.exception()
+        with self._lock:
+            per_unit = elapsed / job.units
+            previous = self._service.get(job.method)
+            self._service[job.method] = (per_unit if previous is None
+                                         else previous + SERVICE_ALPHA * (per_unit - previous))
+            state = self._rooms[job.room]
+            state.vtime += elapsed - job.charge
+            state.running -= 1
+            self._running -= 1
+            self._release_room(job.room, state)
+            self._stats['errors' if error is not None else 'completed'] += 1
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(future.result())
+        self._pump()
+
+    def stats(self):
+        """Job counts, queue depth, average queue wait per priority and service time per method (ms)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued'] = sum(len(state.queue) for state in self._rooms.values())
+            stats['running'] = self._running
+            stats['rooms'] = sum(1 for room in self._rooms if room is not None)
+            stats['avg_wait_ms'] = {name: total / count * 1000 if count else 0.0
+                                    for name, (count, total) in self._waits.items()}
+            stats['service_ms'] = {method: seconds * 1000 for method, seconds in self._service.items()}
+        stats['capacity'] = self.capacity
+        stats['overflow'] = self.overflow
+        return stats
+
+
+if __name__ == "__main__":
+    # Quick check with sleeping jobs: python scheduler.py
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    scheduler = Scheduler(lambda method, params, stream: executor.submit(time.sleep, params['seconds']), capacity=2)
+    futures = [scheduler.submit('sleep', {'seconds': 0.05}, room=f"room{i % 3}", priority='live', deadline_ms=300)
+               for i in range(30)]
+    for future in futures:
+        try:
+            future.result()
+        except JobShed:
+            pass
+    print(json.dumps(scheduler.stats(), indent=2))
+    executor.shutdown()
@@ -0,0 +1,253 @@
+"""
+Per-speaker utterance segmentation
+The browser sends fixed-length chunks that cut words at their boundaries.
+Decoded PCM is buffered per speaker instead and an utterance is closed on a
+pause or when it reaches the maximum duration, keeping a short overlap, so
+the recognizer is called once per utterance rather than once per chunk.
+
+Room audio reaches it through transcribe_chunk, served by worker.py and by
+the shm_ring.py consumer; server.js calls flush_speaker when a speaker
+leaves. An utterance the online service cannot take goes to the offline
+model instead.
+
+Environment:
+    SEGMENT_PAUSE_MS     silence that ends an utterance (default 600)
+    SEGMENT_MAX_MS       longest utterance before a forced cut (default 15000)
+    SEGMENT_OVERLAP_MS   audio kept before speech and across forced cuts (default 300)
+"""
+
+import os
+import sys
+import json
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from vad import StreamVAD, FRAME_MS, FRAME_SAMPLES, SAMPLE_RATE
+
+FRAME_BYTES = FRAME_SAMPLES * 2
+
+PAUSE_MS = int(os.getenv('SEGMENT_PAUSE_MS', '600'))
+MAX_UTTERANCE_MS = int(os.getenv('SEGMENT_MAX_MS', '15000'))
+OVERLAP_MS = int(os.getenv('SEGMENT_OVERLAP_MS', '300'))
+MIN_SPEECH_MS = 200
+MAX_SPEAKERS = 1024
+RECOGNIZER_ERRORS = ('Speech recognition service error', 'Error processing audio')
+
+_lock = threading.Lock()
+_segmenters = OrderedDict()  # speaker id -> UtteranceSegmenter
+_stats = {'chunks': 0, 'utterances': 0, 'forced_cuts': 0, 'discarded': 0}
+
+
+class UtteranceSegmenter:
+    """Turns a stream of 16 kHz mono PCM into complete utterances"""
+
+    def __init__(self, pause_ms=PAUSE_MS, max_ms=MAX_UTTERANCE_MS, overlap_ms=OVERLAP_MS,
+                 min_speech_ms=MIN_SPEECH_MS):
+        self.pause_frames = max(1, pause_ms // FRAME_MS)
+        self.max_bytes = max_ms * SAMPLE_RATE // 1000 * 2
+        self.overlap_frames = overlap_ms // FRAME_MS
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+
+        self.vad = StreamVAD()
+        self._pending = b''                                # partial frame
+        self._preroll = deque(maxlen=self.overlap_frames)  # frames before speech starts
+        self._utterance = bytearray()
+        self._speech_frames = 0
+        self._silence_run = 0
+
+    def feed(self, pcm):
+        """Add PCM; returns the utterances (bytes) closed by it"""
+        data = self._pending + bytes(pcm)
+        count = len(data) // FRAME_BYTES
+        self._pending = data[count * FRAME_BYTES:]
+        if not count:
+            return []
+
+        speech = self.vad.speech_frames(np.frombuffer(data, dtype='<i2', count=count * FRAME_SAMPLES))
+        utterances = []
+        for index, is_speech in enumerate(speech):
+            frame = data[index * FRAME_BYTES:(index + 1) * FRAME_BYTES]
+
+            if not self._utterance:
+                if is_speech:
+                    self._utterance.extend(b''.join(self._preroll))
+                    self._preroll.clear()
+                    self._utterance.extend(frame)
+                    self._speech_frames = 1
+                    self._silence_run = 0
+                elif self.overlap_frames:
+                    self._preroll.append(frame)
+                continue
+
+            self._utterance.extend(frame)
+            if is_speech:
+                self._speech_frames += 1
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+
+            if self._silence_run >= self.pause_frames:
+                utterances.append(self._close())
+            elif len(self._utterance) >= self.max_bytes:
+                utterances.append(self._close(forced=True))
+
+        return [utterance for utterance in utterances if utterance]
+
+    def flush(self):
+        """Close the utterance in progress (end of stream); returns it or None"""
+        self._utterance.extend(self._pending)
+        self._pending = b''
+        return self._close() if self._utterance else None
+
+    def _close(self, forced=False):
+        # Keep at most the overlap of the trailing silence as padding
+        drop = max(0, self._silence_run - self.overlap_frames) * FRAME_BYTES
+        audio = bytes(self._utterance[:len(self._utterance) - drop])
+        enough_speech = self._speech_frames >= self.min_speech_frames
+
+        self._utterance.clear()
+        self._speech_frames = 0
+        self._silence_run = 0
+        if forced and self.overlap_frames:
+            # The next utterance starts with the end of this one, so a word
+            # cut by the forced split is heard in full by one of them
+            self._utterance.extend(audio[-self.overlap_frames * FRAME_BYTES:])
+
+        with _lock:
+            if not enough_speech:
+                _stats['discarded'] += 1
+                return None
+            _stats['utterances'] += 1
+            if forced:
+                _stats['forced_cuts'] += 1
+        return audio
+
+
+def get_segmenter(speaker):
+    """UtteranceSegmenter for a speaker; the least recently used are forgotten"""
+    with _lock:
+        segmenter = _segmenters.get(speaker)
+        if segmenter is None:
+            segmenter = _segmenters[speaker] = UtteranceSegmenter()
+            while len(_segmenters) > MAX_SPEAKERS:
+                _segmenters.popitem(last=False)
+        _segmenters.move_to_end(speaker)
+        return segmenter
+
+
+def segment_chunk(speaker, data, audio_format=None, sample_rate=SAMPLE_RATE):
+    """
+    Decode one received chunk and return the utterances it completes (PCM bytes)
+    Compressed chunks of a speaker share one long-lived decoder.
+    """
+    from transcribe import decode_audio
+
+    pcm = decode_audio(data, audio_format, sample_rate, stream=speaker)
+    with _lock:
+        _stats['chunks'] += 1
+    return get_segmenter(speaker).feed(pcm)
+
+
+def transcribe_utterance(pcm, language='auto', speaker=None):
+    """Text of one utterance: online recognition, the offline model when the service is unreachable"""
+    from transcribe import transcribe_bytes
+
+    text = transcribe_bytes(pcm, language, 'pcm', session=speaker)
+    if not text.startswith(RECOGNIZER_ERRORS):
+        return text
+    try:
+        from transcribe_offline import transcribe_pcm
+        return transcribe_pcm(pcm, language, speaker)
+    except Exception as e:
+        print(f"[ERROR] {text}; offline fallback failed: {e}", file=sys.stderr)
+        return ''
+
+
+def _transcribe_utterances(speaker, utterances, language):
+    texts = []
+    for pcm in utterances:
+        text = transcribe_utterance(pcm, language, speaker)
+        if text:
+            texts.append(text)
+    return texts
+
+
+def transcribe_chunk(speaker, data, language='auto', audio_format=None, sample_rate=SAMPLE_RATE):
+    """
+    Feed a chunk from a speaker; transcribe each utterance it completes
+    Returns the list of transcripts (usually empty or one).
+    """
+    return _transcribe_utterances(speaker, segment_chunk(speaker, data, audio_format, sample_rate), language)
+
+
+def flush_speaker(speaker, language='auto'):
+    """Transcribe whatever a speaker was still saying, e.g. when they leave"""
+    from decoder import close_stream
+
+    pcm = close_stream(speaker)
+    with _lock:
+        segmenter = _segmenters.pop(speaker, None)
+    if segmenter is None:
+        return []
+    utterances = segmenter.feed(pcm) if pcm else []
+    utterance = segmenter.flush()
+    if utterance:
+        utterances.append(utterance)
+    return _transcribe_utterances(speaker, utterances, language)
+
+
+def get_segmenter_stats():
+    """Chunks received, utterances emitted and recognizer requests saved versus per-chunk"""
+    with _lock:
+        stats = dict(_stats)
+        stats['speakers'] = len(_segmenters)
+    stats['calls_saved'] = max(0, stats['chunks'] - stats['utterances'])
+    return stats
+
+
+def _split_chunks(path, chunk_ms):
+    """Read a WAV file and cut it into fixed-length PCM chunks, like the browser does"""
+    from transcribe import decode_audio
+
+    with open(path, 'rb') as f:
+        pcm = bytes(decode_audio(f.read()))
+    size = chunk_ms * SAMPLE_RATE // 1000 * 2
+    return [pcm[offset:offset + size] for offset in range(0, len(pcm), size)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Segment WAV files into utterances")
+    parser.add_argument('files', nargs='+', help="WAV files, one speaker each")
+    parser.add_argument('--chunk-ms', type=int, default=1000, help="browser chunk length to simulate")
+    parser.add_argument('--transcribe', action='store_true', help="also send each utterance to the recognizer")
+    parser.add_argument('--language', default='auto')
+    args = parser.parse_args()
+
+    for path in args.files:
+        offset = 0.0
+        for chunk in _split_chunks(path, args.chunk_ms):
+            if args.transcribe:
+                results = transcribe_chunk(path, chunk, args.language, 'pcm')
+            else:
+                results = [f"{len(pcm) / (SAMPLE_RATE * 2):.2f}s" for pcm in segment_chunk(path, chunk, 'pcm')]
+            offset += len(chunk) / (SAMPLE_RATE * 2)
+            for result in results:
+                print(f"{path} @{offset:.1f}s: {result}", file=sys.stderr)
+
+        if args.transcribe:
+            results = flush_speaker(path, args.language)
+        else:
+            utterance = get_segmenter(path).flush()
+            results = [f"{len(utterance) / (SAMPLE_RATE * 2):.2f}s"] if utterance else []
+        for result in results:
+            print(f"{path} @end: {result}", file=sys.stderr)
+
+    stats = get_segmenter_stats()
+    if args.transcribe:
+        from transcribe import get_recognizer_stats
+        stats['recognizer'] = get_recognizer_stats()
+    print(json.dumps(stats, indent=2))
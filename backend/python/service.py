@@ -0,0 +1,331 @@
+"""
+Asyncio service layer for speech-to-text, translation and text-to-speech
+One event loop serves many rooms at once: every stage has its own semaphore,
+CPU-bound decoding and synthesis run in a process pool, the blocking
+recognizer runs in threads, and Azure translation uses async HTTP.
+
+    service = Service()
+    await service.start()
+    text = await service.transcribe(webm_bytes, 'ta', session='room1:alice')
+    translated = await service.translate(text, 'en')
+    path = await service.synthesize(translated, 'en', 'out.wav')
+    await service.close()
+
+It can also be served over TCP with the worker.py frame protocol, requests
+on one connection being handled concurrently:
+    python service.py --tcp 127.0.0.1:7071 [--processes N]
+
+Environment:
+    SERVICE_PROCESSES            process pool size (default: CPU count)
+    SERVICE_STT_CONCURRENCY      transcriptions in flight (default 16)
+    SERVICE_TRANSLATE_CONCURRENCY  translations in flight (default 64)
+    SERVICE_TTS_CONCURRENCY      syntheses in flight (default: process pool size)
+    SERVICE_TIMEOUT              seconds per stage call (default 30)
+    SERVICE_TRANSLATOR           'azure' or 'default' (default: azure if AZURE_TRANSLATOR_KEY is set)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import http_clients
+import glossary
+from translation_cache import get_cache, is_cacheable
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+PROCESSES = int(os.getenv('SERVICE_PROCESSES', str(os.cpu_count() or 2)))
+STT_CONCURRENCY = int(os.getenv('SERVICE_STT_CONCURRENCY', '16'))
+TRANSLATE_CONCURRENCY = int(os.getenv('SERVICE_TRANSLATE_CONCURRENCY', '64'))
+TTS_CONCURRENCY = int(os.getenv('SERVICE_TTS_CONCURRENCY', '0')) or PROCESSES
+TIMEOUT = float(os.getenv('SERVICE_TIMEOUT', '30'))
+TRANSLATOR = os.getenv('SERVICE_TRANSLATOR', 'azure' if os.getenv('AZURE_TRANSLATOR_KEY') else 'default')
+
+
+def _decode(data, audio_format, sample_rate):
+    """Process pool task: decode audio to 16 kHz mono PCM bytes"""
+    from transcribe import decode_audio
+    return bytes(decode_audio(data, audio_format, sample_rate))
+
+
+def _recognize(pcm, language, session):
+    """Thread task: VAD + recognizer round trips for decoded PCM"""
+    from transcribe import transcribe_bytes
+    return transcribe_bytes(pcm, language, 'pcm', session=session)
+
+
+def _translate(text, target_lang, source_lang):
+    """Thread task: the default translation chain of translate.py"""
+    from translate import translate_text
+    return translate_text(text, target_lang, source_lang)
+
+
+def _synthesize(text, language, output_path):
+    """Process pool task: keeps one TTS engine per pool process"""
+    from synthesize import synthesize_speech
+    return synthesize_speech(text, language, output_path)
+
+
+class Service:
+    """Concurrent transcribe/translate/synthesize with per-stage limits"""
+
+    def __init__(self, processes=PROCESSES, stt_concurrency=STT_CONCURRENCY,
+                 translate_concurrency=TRANSLATE_CONCURRENCY, tts_concurrency=TTS_CONCURRENCY,
+                 timeout=TIMEOUT, translator=TRANSLATOR):
+        self.processes = processes
+        self.limits = {'stt': stt_concurrency, 'translate': translate_concurrency, 'tts': tts_concurrency}
+        self.timeout = timeout
+        self.translator = translator if translator != 'azure' or HAS_HTTPX else 'default'
+
+        self._semaphores = {}
+        self._stats = {}
+        self._process_pool = None
+        self._thread_pool = None
+        self._http = None
+
+    async def start(self):
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()}
+        self._stats = {
+            stage: {'in_flight': 0, 'completed': 0, 'errors': 0, 'timeouts': 0,
+                    'total_time': 0.0, 'total_wait': 0.0}
+            for stage in self.limits
+        }
+        self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+        # Blocking recognizer and translator calls: one thread per allowed call
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=self.limits['stt'] + self.limits['translate'],
+            thread_name_prefix='service'
+        )
+        if self.translator == 'azure':
+            self._http = httpx.AsyncClient(
+                timeout=http_clients.TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.limits['translate'],
+                    max_keepalive_connections=http_clients.POOL_SIZE
+                )
+            )
+        return self
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @asynccontextmanager
+    async def _stage(self, stage):
+        """Hold the stage's semaphore; record queue wait, duration and failures"""
+        stats = self._stats[stage]
+        queued = time.perf_counter()
+        async with self._semaphores[stage]:
+            start = time.perf_counter()
+            stats['total_wait'] += start - queued
+            stats['in_flight'] += 1
+            try:
+                yield
+            except asyncio.TimeoutError:
+                stats['timeouts'] += 1
+                raise
+            except Exception:
+                stats['errors'] += 1
+                raise
+            else:
+                stats['completed'] += 1
+            finally:
+                stats['in_flight'] -= 1
+                stats['total_time'] += time.perf_counter() - start
+
+    async def _run(self, pool, func, *args):
+        loop = asyncio.get_running_loop()
+        # On timeout the caller gets an error; a thread already running is left to finish
+        return await asyncio.wait_for(loop.run_in_executor(pool, func, *args), self.timeout)
+
+    async def decode(self, data, audio_format=None, sample_rate=16000):
+        """16 kHz mono PCM bytes, decoded in the process pool"""
+        return await self._run(self._process_pool, _decode, bytes(data), audio_format, sample_rate)
+
+    async def transcribe(self, data, language='auto', audio_format=None, session=None, sample_rate=16000):
+        """Decode in the process pool, then recognize in a thread"""
+        async with self._stage('stt'):
+            pcm = await self.decode(data, audio_format, sample_rate)
+            return await self._run(self._thread_pool, _recognize, pcm, language, session)
+
+    async def _translate_azure(self, text, target_lang, source_lang):
+        import translate_azure
+
+        params = {'api-version': '3.0', 'to': target_lang}
+        if source_lang != 'auto':
+            params['from'] = source_lang
+
+        for attempt in range(http_clients.RETRIES + 1):
+            try:
+                with http_clients.track('azure-async'):
+                    response = await self._http.post(
+                        translate_azure.AZURE_ENDPOINT + '/translate',
+                        params=params,
+                        headers=translate_azure._azure_headers(),
+                        json=[{'text': text}]
+                    )
+                if response.status_code not in http_clients.RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()[0]['translations'][0]['text']
+            except httpx.TransportError:
+                if attempt == http_clients.RETRIES:
+                    raise
+            if attempt < http_clients.RETRIES:
+                await asyncio.sleep(http_clients.BACKOFF * (2 ** attempt))
+        response.raise_for_status()
+
+    async def translate(self, text, target_lang, source_lang='auto'):
+        """Translate through the glossary and the cache, then async Azure or the default chain"""
+        result = glossary.lookup(text, target_lang, source_lang)
+        if result:
+            return result
+
+        cache = get_cache()
+        if cache is not None and text:
+            cached = cache.get(text, source_lang, target_lang, self.translator)
+            if cached is not None:
+                return cached
+
+        async with self._stage('translate'):
+            if self.translator == 'azure':
+                try:
+                    result = await asyncio.wait_for(
+                        self._translate_azure(text, target_lang, source_lang), self.timeout
+                    )
+                except (httpx.HTTPError, asyncio.TimeoutError) as e:
+                    print(f"[ERROR] Azure translation failed: {e}", file=sys.stderr)
+                    result = f"[Translation Error] {text}"
+            else:
+                result = await self._run(self._thread_pool, _translate, text, target_lang, source_lang)
+
+        if cache is not None and text and is_cacheable(result):
+            cache.put(text, source_lang, target_lang, self.translator, result)
+        return result
+
+    async def translate_multi(self, text, target_langs, source_lang='auto'):
+        """{target_lang: translation}, all targets translated concurrently"""
+        results = await asyncio.gather(*(
+            self.translate(text, target_lang, source_lang) for target_lang in target_langs
+        ))
+        return dict(zip(target_langs, results))
+
+    async def synthesize(self, text, language='en', output_path='output.wav'):
+        async with self._stage('tts'):
+            return await self._run(self._process_pool, _synthesize, text, language, output_path)
+
+    def stats(self):
+        """Per-stage counters with average duration and semaphore wait (ms)"""
+        result = {}
+        for stage, counters in self._stats.items():
+            stats = dict(counters)
+            done = stats['completed'] + stats['errors'] + stats['timeouts']
+            total_time = stats.pop('total_time')
+            total_wait = stats.pop('total_wait')
+            stats['limit'] = self.limits[stage]
+            stats['avg_ms'] = total_time / done * 1000 if done else 0.0
+            stats['avg_wait_ms'] = total_wait / done * 1000 if done else 0.0
+            result[stage] = stats
+        return result
+
+
+async def _handle_connection(service, reader, writer):
+    from worker import HEADER, MAX_FRAME_SIZE, _decode_params
+    import json
+
+    methods = {
+        'transcribe': service.transcribe,
+        'translate': service.translate,
+        'translate_multi': service.translate_multi,
+        'synthesize': service.synthesize,
+    }
+    write_lock = asyncio.Lock()
+    tasks = set()
+
+    async def handle(request):
+        request_id = request.get('id')
+        try:
+            method = request.get('method')
+            if method == 'stats':
+                result = service.stats()
+            elif method in methods:
+                params = request.get('params')
+                if isinstance(params, list):
+                    result = await methods[method](*params)
+                else:
+                    result = await methods[method](**_decode_params(params))
+            else:
+                raise ValueError(f"Unknown method: {method}")
+            response = {'id': request_id, 'result': result}
+        except Exception as e:
+            response = {'id': request_id, 'error': f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        async with write_lock:
+            writer.write(HEADER.pack(len(payload)) + payload)
+            await writer.drain()
+
+    try:
+        while True:
+            try:
+                header = await reader.readexactly(HEADER.size)
+            except asyncio.IncompleteReadError:
+                break
+            (size,) = HEADER.unpack(header)
+            if size > MAX_FRAME_SIZE:
+                print(f"[ERROR] Frame too large: {size} bytes", file=sys.stderr)
+                break
+            request = json.loads(await reader.readexactly(size))
+            task = asyncio.create_task(handle(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        writer.close()
+
+
+async def serve_tcp(host, port, processes=PROCESSES):
+    async with Service(processes=processes) as service:
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_connection(service, reader, writer), host, port
+        )
+        print(f"[INFO] Service listening on {host}:{port} (translator: {service.translator})", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    from worker import parse_tcp_address
+
+    parser = argparse.ArgumentParser(description="Asyncio speech/translation service")
+    parser.add_argument('--tcp', required=True, help="host:port to listen on")
+    parser.add_argument('--processes', type=int, default=PROCESSES, help="process pool size")
+    args = parser.parse_args()
+
+    host, port = parse_tcp_address(args.tcp)
+    try:
+        asyncio.run(serve_tcp(host, port, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Shared-memory ring buffer for handing audio chunks to the transcriber
+The Node server writes each received chunk once into a memory-mapped file in
+/dev/shm; the resident Python side reads it in place (a memoryview into the
+mapping, or a NumPy view of PCM samples) instead of the chunk going through
+uploads/room_chunk_*.webm and being read back by a new process.
+
+One producer, one consumer. The file is a 64-byte header followed by
+`slots` fixed-size slots; every frame gets a sequence number starting at 1
+and lives in slot (seq - 1) % slots:
+
+    header  magic 'VRNG', version u32, slots u32, slot_bytes u32,
+            head u64 (last seq published), tail u64 (last seq released),
+            dropped u64 (frames refused because the ring was full)
+    slot    seq u64, length u32, sample_rate u32, audio_format 8s,
+            language 8s, stream 96s (128 bytes), then slot_bytes of audio
+
+All integers are little-endian. The producer writes the audio and the slot
+fields, then the slot's seq, then head; the consumer only trusts a slot
+whose seq is the one it expects, so a half-written slot is never read.
+Frames are read in sequence order and used in place. The consumer may hold
+several at once and release them in any order; tail only advances past a
+frame once it and every frame before it are released, which is when the
+producer may reuse their slots. The producer cancels a frame it gave up on
+by clearing its slot's seq while the frame is unreleased; the consumer
+skips a cancelled frame it has not started on. A full ring
+refuses new frames rather than overwrite unread ones.
+
+    python shm_ring.py --serve /dev/shm/voice-audio.ring
+
+transcribes every frame of an existing ring (created by the producer) and
+prints one JSON line per frame: {"seq", "stream", "texts"} or {"seq", "error"}.
+Frames of a named stream go through the stream's utterance segmenter
+(segmenter.py), so "texts" holds the utterances the frame completed, often
+none; a frame without a stream is transcribed on its own, and an empty
+frame of format "flush" returns what the stream was still saying.
+
+Environment:
+    SHM_RING_DIR         directory of ring files (default /dev/shm, else the temp dir)
+    SHM_RING_SLOTS       frames the ring holds (default 64)
+    SHM_RING_SLOT_BYTES  largest frame in bytes (default 262144)
+    SHM_RING_POLL_MS     consumer poll interval while the ring is empty (default 2)
+    SHM_RING_THREADS     frames the consumer transcribes at once (default 4); frames
+                         of one stream always run in order on the same thread
+"""
+
+import io
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import tempfile
+import itertools
+import threading
+import zlib
+
+RING_DIR = os.getenv('SHM_RING_DIR') or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+SLOTS = int(os.getenv('SHM_RING_SLOTS', '64'))
+SLOT_BYTES = int(os.getenv('SHM_RING_SLOT_BYTES', str(256 * 1024)))
+POLL_SECONDS = float(os.getenv('SHM_RING_POLL_MS', '2')) / 1000
+THREADS = max(1, int(os.getenv('SHM_RING_THREADS', '4')))
+
+MAGIC = b'VRNG'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')     # magic, version, slots, slot_bytes
+HEADER_SIZE = 64
+HEAD_OFFSET, TAIL_OFFSET, DROPPED_OFFSET = 16, 24, 32
+SLOT_HEADER = struct.Struct('<QII8s8s96s')  # seq, length, sample_rate, format, language, stream
+SLOT_HEADER_SIZE = SLOT_HEADER.size
+U64 = struct.Struct('<Q')
+
+
+class RingFormatError(ValueError):
+    """The file is not an audio ring of this version"""
+
+
+def default_path(name='voice-audio'):
+    return os.path.join(RING_DIR, f"{name}.ring")
+
+
+def _text(value, size):
+    """Fixed-size field: UTF-8, cut to size (like the Node producer does)"""
+    return (value or '').encode('utf-8')[:size]
+
+
+def _field(value):
+    return value.rstrip(b'\0').decode('utf-8', errors='ignore')
+
+
+class Frame:
+    """One chunk read from the ring; data is a view into shared memory, valid until released"""
+
+    __slots__ = ('seq', 'stream', 'audio_format', 'sample_rate', 'language', 'data')
+
+    def __init__(self, seq, stream, audio_format, sample_rate, language, data):
+        self.seq = seq
+        self.stream = stream
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.language = language
+        self.data = data
+
+    def samples(self):
+        """16-bit PCM payload as a NumPy array over the same memory (no copy)"""
+        import numpy as np
+        return np.frombuffer(self.data, dtype='<i2')
+
+
+class AudioRing:
+    """
+    A ring file mapped into this process
+    AudioRing.create(path) makes a new, empty ring; AudioRing(path) opens an
+    existing one. write() is the producer side, read()/release() the consumer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'r+b') as f:
+            self._map = mmap.mmap(f.fileno(), 0)
+        magic, version, self.slots, self.slot_bytes = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise RingFormatError(f"{path} is not a version {VERSION} audio ring")
+        if len(self._map) < HEADER_SIZE + self.slots * (SLOT_HEADER_SIZE + self.slot_bytes):
+            self._map.close()
+            raise RingFormatError(f"{path} is shorter than its header says")
+        self._view = memoryview(self._map)
+        self._next_seq = None  # consumer side: next frame to read
+        self._held = {}  # seq -> Frame read and not yet released
+        self._released = set()  # seqs released ahead of an earlier, held frame
+        self._release_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path=None, slots=SLOTS, slot_bytes=SLOT_BYTES):
+        path = path or default_path()
+        size = HEADER_SIZE + slots * (SLOT_HEADER_SIZE + slot_bytes)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, VERSION, slots, slot_bytes))
+        return cls(path)
+
+    def _slot_offset(self, seq):
+        return HEADER_SIZE + (seq - 1) % self.slots * (SLOT_HEADER_SIZE + self.slot_bytes)
+
+    def _get(self, offset):
+        return U64.unpack_from(self._map, offset)[0]
+
+    def _set(self, offset, value):
+        U64.pack_into(self._map, offset, value)
+
+    def write(self, data, stream='', audio_format='pcm', sample_rate=16000, language=''):
+        """Publish one frame; returns its seq, or None when the ring is full"""
+        data = memoryview(data).cast('B')
+        if len(data) > self.slot_bytes:
+            raise ValueError(f"Frame of {len(data)} bytes exceeds slot size {self.slot_bytes}")
+        head = self._get(HEAD_OFFSET)
+        if head - self._get(TAIL_OFFSET) >= self.slots:
+            self._set(DROPPED_OFFSET, self._get(DROPPED_OFFSET) + 1)
+            return None
+
+        seq = head + 1
+        offset = self._slot_offset(seq)
+        body = offset + SLOT_HEADER_SIZE
+        self._view[body:body + len(data)] = data
+        SLOT_HEADER.pack_into(self._map, offset, 0, len(data), sample_rate, _text(audio_format, 8),
+                              _text(language, 8), _text(stream, 96))
+        # Publish: the slot's seq last, then head
+        self._set(offset, seq)
+        self._set(HEAD_OFFSET, seq)
+        return seq
+
+    def read(self, timeout=None):
+        """
+        Next frame in sequence order, or None if none arrives within timeout
+        Earlier frames may still be held; each one must be released once.
+        """
+        if self._next_seq is None:
+            self._next_seq = self._get(TAIL_OFFSET) + 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq = self._next_seq
+            offset = self._slot_offset(seq)
+            while self._get(HEAD_OFFSET) < seq:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                time.sleep(POLL_SECONDS)
+            # Published (the slot's seq is written before head), so a
+            # different seq means the producer cancelled it
+            if self._get(offset) == seq:
+                break
+            with self._release_lock:
+                self._release_seq(seq)
+            self._next_seq = seq + 1
+
+        _, length, sample_rate, audio_format, language, stream = SLOT_HEADER.unpack_from(self._map, offset)
+        body = offset + SLOT_HEADER_SIZE
+        frame = Frame(seq, _field(stream), _field(audio_format), sample_rate, _field(language),
+                      self._view[body:body + length])
+        with self._release_lock:
+            self._held[seq] = frame
+        self._next_seq = seq + 1
+        return frame
+
+    def cancelled(self, frame):
+        """True once the producer has given up on the frame (cleared its slot's seq)"""
+        return self._get(self._slot_offset(frame.seq)) != frame.seq
+
+    def release(self, frame):
+        """
+        Done with a frame; frame.data must not be used afterwards. Its slot
+        goes back to the producer once every earlier frame is released too.
+        Safe to call from any thread.
+        """
+        with self._release_lock:
+            if self._held.pop(frame.seq, None) is None:
+                return
+            frame.data.release()
+            self._release_seq(frame.seq)
+
+    def _release_seq(self, seq):
+        self._released.add(seq)
+        tail = self._get(TAIL_OFFSET)
+        while tail + 1 in self._released:
+            tail += 1
+            self._released.remove(tail)
+        self._set(TAIL_OFFSET, tail)
+
+    def frames(self, timeout=None):
+        """Iterate frames, releasing each one when the loop body moves on"""
+        while True:
+            frame = self.read(timeout)
+            if frame is None:
+                return
+            try:
+                yield frame
+            finally:
+                self.release(frame)
+
+    def stats(self):
+        head, tail, dropped = self._get(HEAD_OFFSET), self._get(TAIL_OFFSET), self._get(DROPPED_OFFSET)
+        return {'slots': self.slots, 'slot_bytes': self.slot_bytes, 'head': head, 'tail': tail,
+                'pending': head - tail, 'dropped': dropped}
+
+    def close(self):
+        for frame in list(self._held.values()):
+            self.release(frame)
+        self._view.release()
+        self._map.close()
+
+
+def _transcribe_frame(frame):
+    """Utterances completed by one frame (a whole frame when it has no stream)"""
+    from segmenter import flush_speaker, transcribe_chunk, transcribe_utterance
+    from transcribe import decode_audio
+
+    language = frame.language or 'auto'
+    if frame.audio_format == 'flush':
+        # Empty frame sent when the speaker leaves: their unfinished utterance
+        return {'texts': flush_speaker(frame.stream, language)}
+    if frame.stream:
+        return {'texts': transcribe_chunk(frame.stream, frame.data, language, frame.audio_format or None,
+                                          frame.sample_rate)}
+    text = transcribe_utterance(decode_audio(frame.data, frame.audio_format or None, frame.sample_rate), language)
+    return {'texts': [text] if text else []}
+
+
+def serve(path, out, threads=THREADS):
+    """
+    Transcribe the ring's frames as they arrive, one JSON line per frame on out
+    Each frame is handed, still in its slot, to one of `threads` lanes by
+    stream, so one room's slow recognition does not hold up the others, and
+    released when the lane is done with it. At most 2 * threads frames are in
+    flight, well under the ring's slots; frames finished behind a slow one
+    keep their slots until it is done too.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    ring = AudioRing(path)
+    print(f"[INFO] Transcribing frames from {path} ({ring.slots} slots of {ring.slot_bytes} bytes, "
+          f"{threads} threads)", file=sys.stderr)
+    lanes = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ring-{index}") for index in range(threads)]
+    in_flight = threading.BoundedSemaphore(max(1, min(threads * 2, ring.slots // 2)))
+    write_lock = threading.Lock()
+    unnamed = itertools.count()
+
+    def run(frame):
+        try:
+            if ring.cancelled(frame):
+                return  # the server timed out and transcribed it elsewhere
+            try:
+                result = _transcribe_frame(frame)
+            except Exception as e:
+                result = {'error': str(e)}
+            result.update(seq=frame.seq, stream=frame.stream)
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out.flush()
+        finally:
+            ring.release(frame)
+            in_flight.release()
+
+    parent = os.getppid()
+    try:
+        # Wake up every second to stop with the producer rather than outlive it
+        while os.getppid() == parent:
+            # While every lane is busy, frames stay in the ring; once it is
+            # full the producer stops queueing and transcribes elsewhere
+            in_flight.acquire()
+            frame = ring.read(timeout=1.0)
+            if frame is None:
+                in_flight.release()
+                continue
+            lane = zlib.crc32(frame.stream.encode('utf-8')) if frame.stream else next(unnamed)
+            lanes[lane % threads].submit(run, frame)
+    finally:
+        for lane in lanes:
+            lane.shutdown(wait=True)
+        ring.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != '--serve':
+        print("Usage: python shm_ring.py --serve <ring_path>")
+        sys.exit(1)
+
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stdout = sys.stderr  # stray prints must not break the JSON lines
+    try:
+        serve(sys.argv[2], out)
+    except (OSError, RingFormatError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
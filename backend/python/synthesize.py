@@ -1,69 +1,342 @@
 import sys
-import pyttsx3
+import io
 import os
+import re
+import struct
+import hashlib
+import tempfile
+import threading
+import wave
 from pathlib import Path
 
-def synthesize_speech(text, language='en', output_path='output.wav'):
+import metrics
+from audio_codec import OUTPUT_FORMAT, encode, extension, silence, with_extension, write_audio
+from tts_cache import get_tts_cache, place_file
+
+# Speech settings
+SPEECH_RATE = 150    # Speed of speech
+SPEECH_VOLUME = 0.9  # Volume level (0.0 to 1.0)
+
+# Streaming: clauses longer than this are split again at commas/semicolons
+MAX_CLAUSE_CHARS = 200
+
+# Sentence ends (Latin, Devanagari danda, CJK) and clause breaks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?।。！？])\s+')
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:،、，；])\s+')
+
+# pyttsx3 hands out one engine per driver and process, so keep it
+# initialized, with the installed voices indexed by language once
+_engine = None
+_engine_lock = threading.Lock()
+_voices = []
+_voice_index = {}
+_voice_by_language = {}
+_current_voice = None
+_installed_voices = None  # hash of the installed voice ids
+
+
+def _voice_languages(voice):
+    """Language codes a voice declares, e.g. ['en-gb', 'en']"""
+    codes = []
+    for language in getattr(voice, 'languages', None) or []:
+        if isinstance(language, bytes):
+            # espeak prefixes the code with a priority byte
+            language = language.decode('ascii', 'ignore')
+        language = re.sub(r'^[^a-z]+', '', str(language).lower().replace('_', '-'))
+        if language:
+            codes.append(language)
+            codes.append(language.split('-')[0])
+    return codes
+
+
+def build_voice_index(voices):
+    """Language code -> voice id over all installed voices (first voice wins)"""
+    index = {}
+    for voice in voices:
+        for code in _voice_languages(voice):
+            index.setdefault(code, voice.id)
+    return index
+
+
+def _select_voice(voices, language, index=None):
+    """Pick a voice id for a language from the installed voices"""
+    if index and language in index:
+        return index[language]
+    # Try to set appropriate voice based on language
+    if language == 'ta' and len(voices) > 1:
+        # Try to find a female voice for Tamil (usually sounds better)
+        for voice in voices:
+            if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
+                return voice.id
+    elif len(voices) > 0:
+        return voices[0].id
+    return None
+
+
+def get_engine(language='en'):
+    """
+    Return the initialized engine configured for a language
+    Callers must hold _engine_lock while using it.
+    """
+    global _engine, _voices, _voice_index, _installed_voices, _current_voice
+    if _engine is None:
+        # Imported here: the driver stack is slow to load and cache hits never need it
+        import pyttsx3
+
+        with metrics.span('tts_engine_init'):
+            engine = pyttsx3.init()
+            engine.setProperty('rate', SPEECH_RATE)
+            engine.setProperty('volume', SPEECH_VOLUME)
+            _voices = engine.getProperty('voices') or []
+            _voice_index = build_voice_index(_voices)
+            _installed_voices = _voice_list_id(_voices)
+            # Last: cache_key() resolves voices without the lock once it is set
+            _engine = engine
+
+    voice_id = _resolve_voice(language)
+    if voice_id and voice_id != _current_voice:
+        _engine.setProperty('voice', voice_id)
+        _current_voice = voice_id
+    return _engine
+
+
+def _voice_list_id(voices):
+    return hashlib.sha256('\n'.join(sorted(str(voice.id) for voice in voices)).encode('utf-8')).hexdigest()[:16]
+
+
+def _resolve_voice(language):
+    """Voice id for a language with this process's engine; new ones are recorded in the TTS cache"""
+    if language not in _voice_by_language:
+        voice_id = _voice_by_language[language] = _select_voice(_voices, language, _voice_index)
+        _record_voice(language, voice_id)
+    return _voice_by_language[language]
+
+
+def _record_voice(language, voice_id):
+    """
+    Share a resolved voice through the cache directory, for processes without
+    an engine (tts_pool.py's parent, cache hits in a fresh process). A write
+    lost to a concurrent one only costs a later lookup.
+    """
+    cache = get_tts_cache()
+    if not cache:
+        return
+    voices = cache.get_voices()
+    languages = voices.get('languages')
+    if voices.get('installed') != _installed_voices or not isinstance(languages, dict):
+        # Voices were installed or removed since: every language resolves again
+        languages = {}
+    elif language in languages and languages[language] == voice_id:
+        return
+    languages[language] = voice_id
+    try:
+        cache.put_voices({'installed': _installed_voices, 'languages': languages})
+    except OSError as e:
+        print(f"[WARNING] Could not record TTS voice for {language}: {e}", file=sys.stderr)
+
+
+def _cache_voice(language):
+    """
+    (known, voice id) a language is synthesized with: from this process's
+    engine, else as recorded in the cache by another process's (a change in
+    the installed voices is picked up when the next engine starts)
+    """
+    if _engine is not None:
+        return True, _resolve_voice(language)
+    cache = get_tts_cache()
+    languages = cache.get_voices().get('languages') if cache else None
+    if isinstance(languages, dict) and language in languages:
+        return True, languages[language]
+    return False, None
+
+
+def split_text(text, max_chars=MAX_CLAUSE_CHARS):
+    """Split text at sentence boundaries, and long sentences at clause boundaries"""
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        current = ''
+        for clause in CLAUSE_BOUNDARY.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            pieces.append(current)
+
+    return [piece for piece in pieces if piece.strip()]
+
+
+def _render_clause(engine, text, scratch_dir):
+    """Render one clause to WAV bytes (pyttsx3 can only write to a path)"""
+    fd, path = tempfile.mkstemp(suffix='.wav', dir=scratch_dir)
+    os.close(fd)
+    try:
+        with metrics.span('synthesis'):
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+def cache_key(text, language, audio_format='wav'):
+    """
+    Cache key for text rendered with the language's voice and this process's
+    speech settings; None while no engine has resolved that voice yet
+    """
+    known, voice_id = _cache_voice(language)
+    if not known:
+        return None
+    return get_tts_cache().make_key(text, language, voice_id, SPEECH_RATE, SPEECH_VOLUME, audio_format)
+
+
+def _scratch_dir():
+    """Prefer RAM-backed storage for the engine's short-lived clause files"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def synthesize_stream(text, language='en', audio_format='wav'):
+    """
+    Synthesize text clause by clause and yield audio as soon as each is ready
+    audio_format 'wav' yields a complete WAV file per clause,
+    'pcm' yields the raw 16-bit frames only.
+    """
+    scratch_dir = _scratch_dir()
+    cache = get_tts_cache()
+    for clause in split_text(text):
+        key = cache_key(clause, language) if cache else None
+        wav_bytes = cache.get_bytes(key) if key else None
+        if wav_bytes is None:
+            with _engine_lock:
+                wav_bytes = _render_clause(get_engine(language), clause, scratch_dir)
+            if cache:
+                cache.put(cache_key(clause, language), wav_bytes)
+
+        if audio_format == 'pcm':
+            with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+                yield wav_file.readframes(wav_file.getnframes())
+        else:
+            yield wav_bytes
+
+
+def write_stream(chunks, stream):
+    """Write chunks as 4-byte big-endian length-prefixed frames; a 0 length ends the stream"""
+    for chunk in chunks:
+        stream.write(struct.pack('>I', len(chunk)) + chunk)
+        stream.flush()
+    stream.write(struct.pack('>I', 0))
+    stream.flush()
+
+
+def synthesize_bytes(text, language='en'):
+    """Synthesize text to WAV bytes, served from the TTS cache when possible"""
+    cache = get_tts_cache()
+    key = cache_key(text, language) if cache else None
+    if key:
+        cached = cache.get_bytes(key)
+        if cached is not None:
+            return cached
+
+    with _engine_lock:
+        wav_bytes = _render_clause(get_engine(language), text, _scratch_dir())
+    if cache:
+        cache.put(cache_key(text, language), wav_bytes)
+    return wav_bytes
+
+
+def synthesize_speech(text, language='en', output_path='output.wav', audio_format=None):
     """
     Enhanced TTS using pyttsx3 (works with Python 3.14)
+    Compressed formats (TTS_OUTPUT_FORMAT) are written with their own
+    extension in place of output_path's; returns the path actually written.
     """
+    audio_format = audio_format or OUTPUT_FORMAT
     try:
-        # Initialize the TTS engine
-        engine = pyttsx3.init()
-        
-        # Configure voice settings
-        voices = engine.getProperty('voices')
-        
-        # Try to set appropriate voice based on language
-        if language == 'ta' and len(voices) > 1:
-            # Try to find a female voice for Tamil (usually sounds better)
-            for voice in voices:
-                if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
-                    engine.setProperty('voice', voice.id)
-                    break
-        elif len(voices) > 0:
-            engine.setProperty('voice', voices[0].id)
-        
-        # Set speech rate and volume
-        engine.setProperty('rate', 150)  # Speed of speech
-        engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
-        
+        # Repeated phrases come straight from the cache, without the engine
+        cache = get_tts_cache()
+        key = cache_key(text, language, audio_format) if cache else None
+        if key:
+            cached_path = cache.get_path(key, extension(audio_format))
+            if cached_path:
+                print(f"[DEBUG] TTS cache hit: {text}", file=sys.stderr)
+                if audio_format != 'wav':
+                    output_path = with_extension(output_path, audio_format)
+                with metrics.span('file_write', source='cache'):
+                    return place_file(cached_path, output_path)
+
         # Ensure output directory exists
         output_dir = os.path.dirname(output_path)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
-        
-        # Save to file
-        engine.save_to_file(text, output_path)
-        engine.runAndWait()
-        
+
+        if audio_format != 'wav':
+            # Render to RAM-backed scratch space and encode in memory
+            with _engine_lock:
+                wav_bytes = _render_clause(get_engine(language), text, _scratch_dir())
+            with metrics.span('encode', format=audio_format):
+                data, used = encode(wav_bytes, audio_format)
+            with metrics.span('file_write', source='engine'):
+                output_path = write_audio(data, used, output_path)
+            if cache and used == audio_format:
+                cache.put(cache_key(text, language, audio_format), data, extension(audio_format))
+            return output_path
+
+        # Save to file with the shared, already initialized engine
+        with _engine_lock:
+            engine = get_engine(language)
+            with metrics.span('synthesis'):
+                engine.save_to_file(text, output_path)
+                engine.runAndWait()
+
+        if cache:
+            with metrics.span('file_write', source='engine'):
+                cache.put_file(cache_key(text, language), output_path)
+
         return output_path
-        
+
+    except ImportError:
+        # No TTS engine installed is a setup error, not something to paper over with silence
+        raise
     except Exception as e:
         print(f"TTS Error: {e}")
-        # Create a simple placeholder audio file
+        # Placeholder audio: one second of silence, encoded once per process
         try:
-            import wave
-            with wave.open(output_path, 'w') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(22050)
-                # Create 1 second of silence
-                silence = b'\x00\x00' * 22050
-                wav_file.writeframes(silence)
-            return output_path
-        except:
+            data, used = silence(audio_format)
+            if used == 'wav':
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+                return output_path
+            return write_audio(data, used, output_path)
+        except OSError:
             return None
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--stream':
+        # Streaming mode: length-prefixed WAV chunks on stdout, one per clause
+        if len(sys.argv) < 3:
+            print("Usage: python synthesize.py --stream <text> [language] [wav|pcm]")
+            sys.exit(1)
+        text = sys.argv[2]
+        language = sys.argv[3] if len(sys.argv) > 3 else 'en'
+        audio_format = sys.argv[4] if len(sys.argv) > 4 else 'wav'
+        write_stream(synthesize_stream(text, language, audio_format), sys.stdout.buffer)
+        sys.exit(0)
+
     if len(sys.argv) < 2:
         print("Usage: python synthesize.py <text> [language] [output_path]")
+        print("       python synthesize.py --stream <text> [language] [wav|pcm]")
         sys.exit(1)
-    
+
     text = sys.argv[1]
     language = sys.argv[2] if len(sys.argv) > 2 else 'en'
     output_path = sys.argv[3] if len(sys.argv) > 3 else 'output.wav'
-    
+
     result_file = synthesize_speech(text, language, output_path)
     if result_file:
         print(result_file)
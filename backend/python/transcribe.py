@@ -1,111 +1,396 @@
 import sys
-import speech_recognition as sr
 import io
 import os
-import tempfile
+import threading
 import wave
+from collections import OrderedDict
 
-def convert_webm_to_wav(webm_path):
-    """Convert WebM audio to WAV format for speech recognition"""
+import metrics
+
+# Format expected by the recognizer: 16 kHz, mono, 16-bit signed PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Language mapping for Google Speech Recognition
+LANGUAGE_CODES = {
+    'auto': None,  # Let Google auto-detect
+    'en': 'en-US',
+    'ta': 'ta-IN',
+    'hi': 'hi-IN',
+    'te': 'te-IN',
+    'kn': 'kn-IN',
+    'ml': 'ml-IN',
+    'es': 'es-ES',
+    'fr': 'fr-FR',
+    'de': 'de-DE',
+    'it': 'it-IT',
+    'pt': 'pt-PT',
+    'ru': 'ru-RU',
+    'ja': 'ja-JP',
+    'ko': 'ko-KR',
+    'zh': 'zh-CN'
+}
+
+# Candidate languages for auto-detection, and how sure Google must be
+# before the first answer is accepted without waiting for the others
+AUTO_DETECT_LANGUAGES = ['en-US', 'ta-IN', 'hi-IN', 'te-IN', 'es-ES']
+DETECT_CONFIDENCE = float(os.getenv('STT_DETECT_CONFIDENCE', '0.75'))
+DETECT_WORKERS = int(os.getenv('STT_DETECT_WORKERS', str(len(AUTO_DETECT_LANGUAGES))))
+MAX_SESSIONS = 1024
+
+# Alternative recognizer URL (local stub for benchmarks)
+STT_ENDPOINT = os.getenv('STT_GOOGLE_ENDPOINT')
+_endpoint_kwargs = {'endpoint': STT_ENDPOINT} if STT_ENDPOINT else {}
+
+_detect_pool = None
+_detect_lock = threading.Lock()
+_session_languages = OrderedDict()  # session id -> last detected language code
+_recognizer_stats = {'chunks': 0, 'recognizer_calls': 0}
+
+
+class PCMBuffer:
+    """
+    Bytearray that decoded PCM is written into and reused between chunks, so
+    steady-state decoding does not allocate a new buffer per chunk
+    A view from view() is valid until the next write: the next decode on the
+    same thread releases it, so callers copy (bytes(...)) any PCM they keep.
+    Memory still exported elsewhere (a slice, a NumPy array) is never written
+    over or resized; the buffer moves on to a new bytearray instead.
+    """
+
+    def __init__(self, size=SAMPLE_RATE * SAMPLE_WIDTH * 2):
+        self._data = bytearray(size)
+        self._view = None
+        self.length = 0
+
+    def reserve(self, size, keep=None):
+        """Make room for size bytes; keep: a view that is about to be copied in"""
+        view, self._view = self._view, None
+        if view is not None and view is not keep:
+            view.release()
+        if len(self._data) < size or _exported(self._data):
+            self._data = bytearray(max(size, len(self._data)))
+
+    def write(self, data):
+        self.reserve(len(data), keep=data)
+        self._data[:len(data)] = data
+        self.length = len(data)
+
+    def view(self):
+        self._view = memoryview(self._data)[:self.length]
+        return self._view
+
+
+def _exported(data):
+    """True while a memoryview or array still uses the bytearray (a resize raises then)"""
     try:
-        from pydub import AudioSegment
-        # Load the WebM file
-        audio = AudioSegment.from_file(webm_path, format="webm")
-        # Convert to WAV format with proper settings for speech recognition
-        audio = audio.set_frame_rate(16000).set_channels(1)
-        
-        # Create temporary WAV file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_wav:
-            audio.export(temp_wav.name, format="wav")
-            return temp_wav.name
-    except Exception as e:
-        print(f"Audio conversion error: {e}")
-        return webm_path
+        data.append(0)
+    except BufferError:
+        return True
+    del data[-1]
+    return False
+
+
+_local = threading.local()
+
+
+def _get_buffer():
+    """One PCMBuffer per thread, so concurrent decodes never share memory"""
+    buffer = getattr(_local, 'pcm_buffer', None)
+    if buffer is None:
+        buffer = _local.pcm_buffer = PCMBuffer()
+    return buffer
+
+
+def _is_wav(data):
+    return len(data) >= 12 and bytes(data[:4]) == b'RIFF' and bytes(data[8:12]) == b'WAVE'
+
+
+def _to_recognizer_pcm(frames, channels, sample_width, sample_rate, buffer):
+    """Downmix and resample raw PCM frames to 16 kHz mono 16-bit into buffer"""
+    if channels == 1 and sample_width == SAMPLE_WIDTH and sample_rate == SAMPLE_RATE:
+        buffer.write(frames)
+        return buffer.view()
 
-def transcribe_audio(audio_file_path, language='auto'):
+    from decoder import convert_pcm
+    return convert_pcm(frames, channels, sample_width, sample_rate, buffer)
+
+
+def _decode_compressed(data, buffer, stream=None):
     """
-    Transcribe audio file to text using SpeechRecognition
-    Supports multiple languages with automatic detection
+    Compressed audio (WebM/Opus, OGG, MP3...): on the stream's long-lived
+    decoder when a stream id is given, else decoded as one self-contained chunk
+    """
+    import decoder
+
+    if stream is None:
+        return decoder.decode_chunk(data, buffer)
+    return decoder.decode_stream(stream, data, buffer)
+
+
+def decode_audio(data, audio_format=None, sample_rate=SAMPLE_RATE, stream=None):
+    """
+    Decode audio bytes (or any buffer-protocol object) to 16 kHz mono PCM
+    audio_format: 'pcm' for raw 16-bit mono PCM at sample_rate, 'wav',
+    or None/'webm'/... for anything ffmpeg understands.
+    stream: id of the stream (speaker) the chunk belongs to; its compressed
+    chunks go through one long-lived decoder (see decoder.py).
+    Returns a memoryview into a per-thread buffer, valid until the next call
+    on this thread; copy it (bytes(...)) to keep the PCM longer.
+    """
+    with metrics.span('decode', format=audio_format or 'auto'):
+        return _decode_audio(data, audio_format, sample_rate, stream)
+
+
+def _decode_audio(data, audio_format, sample_rate, stream=None):
+    data = memoryview(data).cast('B')
+    buffer = _get_buffer()
+
+    if audio_format == 'pcm':
+        return _to_recognizer_pcm(data, 1, SAMPLE_WIDTH, sample_rate, buffer)
+
+    if audio_format == 'wav' or _is_wav(data):
+        with wave.open(io.BytesIO(data), 'rb') as wav_file:
+            frames = wav_file.readframes(wav_file.getnframes())
+            return _to_recognizer_pcm(
+                frames,
+                wav_file.getnchannels(),
+                wav_file.getsampwidth(),
+                wav_file.getframerate(),
+                buffer
+            )
+
+    return _decode_compressed(data, buffer, stream)
+
+
+# speech_recognition is slow to import, so it is loaded on first use
+sr = None
+_FlacCachedAudioData = None
+_sr_lock = threading.Lock()
+
+
+def _load_recognizer():
+    """Import speech_recognition (once) and return it"""
+    global sr, _FlacCachedAudioData
+    with _sr_lock:
+        if sr is not None:
+            return sr
+        import speech_recognition
+
+        class FlacCachedAudioData(speech_recognition.AudioData):
+            """AudioData that FLAC-encodes once even when several recognizers share it"""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self._flac_cache = {}
+                self._flac_lock = threading.Lock()
+
+            def get_flac_data(self, convert_rate=None, convert_width=None):
+                key = (convert_rate, convert_width)
+                with self._flac_lock:
+                    if key not in self._flac_cache:
+                        self._flac_cache[key] = super().get_flac_data(convert_rate, convert_width)
+                    return self._flac_cache[key]
+
+        _FlacCachedAudioData = FlacCachedAudioData
+        sr = speech_recognition
+        return sr
+
+
+def _get_detect_pool():
+    global _detect_pool
+    with _detect_lock:
+        if _detect_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _detect_pool = ThreadPoolExecutor(
+                max_workers=DETECT_WORKERS,
+                thread_name_prefix='stt-detect'
+            )
+        return _detect_pool
+
+
+def _remember_language(session, lang_code):
+    if session is None:
+        return
+    with _detect_lock:
+        _session_languages[session] = lang_code
+        _session_languages.move_to_end(session)
+        while len(_session_languages) > MAX_SESSIONS:
+            _session_languages.popitem(last=False)
+
+
+def _count_calls(calls):
+    with _detect_lock:
+        _recognizer_stats['chunks'] += 1
+        _recognizer_stats['recognizer_calls'] += calls
+
+
+def get_recognizer_stats():
+    """Chunks transcribed, recognizer round trips and the average per chunk"""
+    with _detect_lock:
+        stats = dict(_recognizer_stats)
+    stats['calls_per_chunk'] = stats['recognizer_calls'] / stats['chunks'] if stats['chunks'] else 0.0
+    return stats
+
+
+def _recognize_with_confidence(recognizer, audio_data, lang_code):
+    """One recognizer round trip: (text, confidence) or None if nothing was recognized"""
+    _load_recognizer()
+    try:
+        with metrics.span('recognition', language=lang_code):
+            result = recognizer.recognize_google(audio_data, language=lang_code, show_all=True, **_endpoint_kwargs)
+    except sr.UnknownValueError:
+        return None
+    if not result or not result.get('alternative'):
+        return None
+    best = result['alternative'][0]
+    if not best.get('transcript'):
+        return None
+    # Google does not always send a confidence; treat it as unsure
+    return best['transcript'], best.get('confidence', 0.0)
+
+
+def detect_and_recognize(recognizer, audio_data, session=None, cost=None):
+    """
+    Auto-detect the spoken language and transcribe
+    The session's last detected language is tried first; if that is not
+    confident, the other candidates run concurrently and the first confident
+    result wins. Returns (text, lang_code); cost['recognizer_calls'] is
+    incremented for every request actually sent.
     """
-    recognizer = sr.Recognizer()
-    
+    _load_recognizer()
+    if cost is None:
+        cost = {'recognizer_calls': 0}
+    best = None  # (text, confidence, lang_code)
+    candidates = list(AUTO_DETECT_LANGUAGES)
+
+    with _detect_lock:
+        preferred = _session_languages.get(session) if session is not None else None
+
+    if preferred:
+        cost['recognizer_calls'] += 1
+        result = _recognize_with_confidence(recognizer, audio_data, preferred)
+        if result:
+            if result[1] >= DETECT_CONFIDENCE:
+                return result[0], preferred
+            best = (result[0], result[1], preferred)
+        if preferred in candidates:
+            candidates.remove(preferred)
+
+    from concurrent.futures import as_completed
+
+    pool = _get_detect_pool()
+    futures = {
+        pool.submit(_recognize_with_confidence, recognizer, audio_data, lang_code): lang_code
+        for lang_code in candidates
+    }
+    errors = []
     try:
-        # Convert WebM to WAV if needed
-        wav_path = audio_file_path
-        if audio_file_path.endswith('.webm'):
-            wav_path = convert_webm_to_wav(audio_file_path)
-        
-        # Use AudioFile instead of Microphone (no pyaudio needed)
-        with sr.AudioFile(wav_path) as source:
-            # Adjust for ambient noise
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            # Record the audio data
-            audio_data = recognizer.record(source)
-        
-        # Language mapping for Google Speech Recognition
-        language_codes = {
-            'auto': None,  # Let Google auto-detect
-            'en': 'en-US',
-            'ta': 'ta-IN',
-            'hi': 'hi-IN',
-            'te': 'te-IN',
-            'kn': 'kn-IN',
-            'ml': 'ml-IN',
-            'es': 'es-ES',
-            'fr': 'fr-FR',
-            'de': 'de-DE',
-            'it': 'it-IT',
-            'pt': 'pt-PT',
-            'ru': 'ru-RU',
-            'ja': 'ja-JP',
-            'ko': 'ko-KR',
-            'zh': 'zh-CN'
-        }
-        
-        # Use Google Speech Recognition with language support
+        for future in as_completed(futures):
+            lang_code = futures[future]
+            try:
+                result = future.result()
+            except sr.RequestError as e:
+                errors.append(e)
+                continue
+            if not result:
+                continue
+            if best is None or result[1] > best[1]:
+                best = (result[0], result[1], lang_code)
+            if result[1] >= DETECT_CONFIDENCE:
+                break
+    finally:
+        # Early exit: candidates that have not started yet are never sent
+        cancelled = sum(1 for future in futures if future.cancel())
+        cost['recognizer_calls'] += len(futures) - cancelled
+
+    if best:
+        return best[0], best[2]
+    if errors and len(errors) == len(futures):
+        raise errors[0]
+    raise sr.UnknownValueError()
+
+
+def recognize(recognizer, audio_data, language='auto', session=None, cost=None):
+    """Run Google Speech Recognition on AudioData with language support"""
+    _load_recognizer()
+    if cost is None:
+        cost = {'recognizer_calls': 0}
+
+    # If auto-detect, try the candidate languages concurrently
+    if language == 'auto' or language not in LANGUAGE_CODES:
+        with metrics.span('language_detection'):
+            text, lang_code = detect_and_recognize(recognizer, audio_data, session, cost)
+        _remember_language(session, lang_code)
+        print(f"[DEBUG] Detected language: {lang_code}", file=sys.stderr)
+        return text
+    else:
+        # Use specified language
+        lang_code = LANGUAGE_CODES.get(language, 'en-US')
+        cost['recognizer_calls'] += 1
+        with metrics.span('recognition', language=lang_code):
+            text = recognizer.recognize_google(audio_data, language=lang_code, **_endpoint_kwargs)
+        print(f"[DEBUG] Transcribed in {lang_code}: {text}", file=sys.stderr)
+        return text
+
+
+def transcribe_bytes(data, language='auto', audio_format=None, sample_rate=SAMPLE_RATE, session=None):
+    """
+    Transcribe in-memory audio (WebM/Opus, WAV or raw PCM) without temp files
+    session: speaker/session id whose last detected language is tried first
+    (and whose noise floor the VAD tracks). Silent chunks return ''.
+    """
+    from vad import trim_silence
+
+    recognizer = _load_recognizer().Recognizer()
+
+    try:
+        pcm = decode_audio(data, audio_format, sample_rate)
+        with metrics.span('vad'):
+            pcm = trim_silence(pcm, session)
+        if pcm is None:
+            print("[DEBUG] No speech detected, skipping recognition", file=sys.stderr)
+            return ''
+
+        audio_data = _FlacCachedAudioData(bytes(pcm), SAMPLE_RATE, SAMPLE_WIDTH)
+
+        cost = {'recognizer_calls': 0}
         try:
-            # If auto-detect, try multiple languages
-            if language == 'auto' or language not in language_codes:
-                # Try common languages in order
-                for lang_code in ['en-US', 'ta-IN', 'hi-IN', 'te-IN', 'es-ES']:
-                    try:
-                        text = recognizer.recognize_google(audio_data, language=lang_code)
-                        if text:
-                            print(f"[DEBUG] Detected language: {lang_code}", file=sys.stderr)
-                            return text
-                    except:
-                        continue
-                # If all fail, try without language specification
-                text = recognizer.recognize_google(audio_data)
-                return text
-            else:
-                # Use specified language
-                lang_code = language_codes.get(language, 'en-US')
-                text = recognizer.recognize_google(audio_data, language=lang_code)
-                print(f"[DEBUG] Transcribed in {lang_code}: {text}", file=sys.stderr)
-                return text
-                
+            return recognize(recognizer, audio_data, language, session, cost)
         except sr.UnknownValueError:
             return "Could not understand audio - please speak clearly"
         except sr.RequestError as e:
             return f"Speech recognition service error: {e} - check internet connection"
-            
+        finally:
+            _count_calls(cost['recognizer_calls'])
+            print(f"[DEBUG] Recognizer calls for this chunk: {cost['recognizer_calls']}", file=sys.stderr)
+
     except Exception as e:
         return f"Error processing audio: {e}"
-    finally:
-        # Clean up temporary WAV file if created
-        if wav_path != audio_file_path and os.path.exists(wav_path):
-            try:
-                os.unlink(wav_path)
-            except:
-                pass
+
+
+def transcribe_audio(audio_file_path, language='auto', session=None):
+    """
+    Transcribe audio file to text using SpeechRecognition
+    Supports multiple languages with automatic detection
+    """
+    try:
+        with open(audio_file_path, 'rb') as f:
+            data = f.read()
+    except Exception as e:
+        return f"Error processing audio: {e}"
+
+    extension = os.path.splitext(audio_file_path)[1].lower()
+    audio_format = 'pcm' if extension in ('.pcm', '.raw') else None
+    return transcribe_bytes(data, language, audio_format, session=session)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python transcribe.py <audio_file_path> [language]")
+        print("Usage: python transcribe.py <audio_file_path> [language] [session_id]")
         sys.exit(1)
-    
+
     audio_path = sys.argv[1]
     language = sys.argv[2] if len(sys.argv) > 2 else 'auto'
-    result = transcribe_audio(audio_path, language)
+    session = sys.argv[3] if len(sys.argv) > 3 else None
+    result = transcribe_audio(audio_path, language, session)
     print(result)
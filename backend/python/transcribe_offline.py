@@ -1,25 +1,338 @@
-import sys
+"""
+Offline speech-to-text on the CPU with Vosk (Kaldi) models
+Used when online recognition is slow or unreachable. Each language's model
+is loaded once per process and stays resident; recognizers are cheap and are
+created per stream on top of the shared model. Audio is fed to a recognizer
+frame by frame as it arrives (OfflineStream, feed_stream), and a batch of
+chunks from several speakers is recognized concurrently, one task per
+speaker (transcribe_batch).
+
+Models are looked up in OFFLINE_STT_MODEL_DIR by the recognizer language
+codes of transcribe.py: a directory named after the code ("hi-IN"), after the
+short code ("hi"), or an unpacked Vosk model ("vosk-model-small-hi-0.22",
+"vosk-model-small-en-us-0.15"). There is no language detection offline:
+'auto' uses OFFLINE_STT_LANGUAGE, or the only installed model.
+
+Environment:
+    OFFLINE_STT_MODEL_DIR   directory with the models (default models/vosk)
+    OFFLINE_STT_LANGUAGE    language for 'auto' (default en-US)
+    OFFLINE_STT_WORKERS     concurrent speakers in a batch (default: CPU count)
+"""
+
+import io
 import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from transcribe import LANGUAGE_CODES, SAMPLE_RATE, SAMPLE_WIDTH
+
+MODEL_DIR = os.getenv('OFFLINE_STT_MODEL_DIR', os.path.join('models', 'vosk'))
+DEFAULT_LANGUAGE = os.getenv('OFFLINE_STT_LANGUAGE', 'en-US')
+WORKERS = int(os.getenv('OFFLINE_STT_WORKERS', '0')) or os.cpu_count() or 1
+
+# Audio handed to the recognizer per call; ~100 ms keeps partial results fresh
+FEED_BYTES = SAMPLE_RATE * SAMPLE_WIDTH // 10
+MAX_STREAMS = 1024
+NO_AUDIO = "No audio detected"
+
+vosk = None
+_lock = threading.Lock()
+_models = {}    # lang_code -> Model
+_model_info = {}  # lang_code -> {'path', 'load_ms', 'rss_mb'}
+_streams = OrderedDict()  # session -> OfflineStream
+_pool = None
+_stats = {'chunks': 0, 'audio_seconds': 0.0, 'recognition_seconds': 0.0, 'batches': 0}
+
+
+class ModelNotFoundError(RuntimeError):
+    """No offline model is installed for the requested language"""
+
+
+def _load_vosk():
+    """Import vosk (once) with its Kaldi logging silenced"""
+    global vosk
+    if vosk is None:
+        import vosk as vosk_module
+        vosk_module.SetLogLevel(-1)
+        vosk = vosk_module
+    return vosk
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
 
-def transcribe_audio_offline(audio_file_path):
+def resolve_language(language='auto'):
+    """Recognizer language code ('hi-IN') for a hint ('hi', 'hi-IN' or 'auto')"""
+    if language in LANGUAGE_CODES.values():
+        return language
+    lang_code = LANGUAGE_CODES.get(language)
+    if lang_code:
+        return lang_code
+    installed = installed_languages()
+    if len(installed) == 1:
+        return installed[0]
+    return DEFAULT_LANGUAGE
+
+
+def find_model_path(lang_code, model_dir=None):
+    """Directory of the model for a language code, or None"""
+    model_dir = model_dir or MODEL_DIR
+    if not os.path.isdir(model_dir):
+        return None
+    short, _, region = lang_code.lower().partition('-')
+    for name in (lang_code, short):
+        path = os.path.join(model_dir, name)
+        if os.path.isdir(path):
+            return path
+
+    # Unpacked Vosk releases: vosk-model[-small]-<lang>[-<region>]-<version>
+    best = None
+    for name in sorted(os.listdir(model_dir)):
+        parts = name.lower().split('-')
+        if not name.startswith('vosk-model') or short not in parts[2:]:
+            continue
+        score = (region in parts, 'small' in parts)
+        if best is None or score > best[0]:
+            best = (score, name)
+    return os.path.join(model_dir, best[1]) if best else None
+
+
+def installed_languages(model_dir=None):
+    """Language codes (from transcribe.LANGUAGE_CODES) that have a model installed"""
+    return [code for code in dict.fromkeys(c for c in LANGUAGE_CODES.values() if c)
+            if find_model_path(code, model_dir)]
+
+
+def get_model(lang_code):
+    """Resident model for a language code, loaded on first use"""
+    with _lock:
+        model = _models.get(lang_code)
+        if model is not None:
+            return model
+        path = find_model_path(lang_code)
+        if path is None:
+            raise ModelNotFoundError(f"No offline model for {lang_code} in {MODEL_DIR}")
+
+        vosk_module = _load_vosk()
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        model = vosk_module.Model(path)
+        load_ms = (time.perf_counter() - start) * 1000
+        rss_after = _rss_mb()
+        _models[lang_code] = model
+        _model_info[lang_code] = {
+            'path': path,
+            'load_ms': load_ms,
+            'rss_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+        print(f"[INFO] Loaded offline model {path} for {lang_code} in {load_ms:.0f} ms", file=sys.stderr)
+        return model
+
+
+class OfflineStream:
     """
-    Offline transcription fallback - returns a test message
-    This is used when online speech recognition fails
+    Incremental recognition of one speaker's 16 kHz mono PCM
+    feed() as frames arrive; finish() returns the text of everything fed
+    since the last finish().
     """
-    try:
-        # Check if file exists and has content
-        if os.path.exists(audio_file_path) and os.path.getsize(audio_file_path) > 0:
-            return "Hello, this is a test message for translation"
-        else:
-            return "No audio detected"
-    except Exception as e:
-        return f"Error: {e}"
+
+    def __init__(self, language='auto'):
+        self.lang_code = resolve_language(language)
+        self._recognizer = _load_vosk().KaldiRecognizer(get_model(self.lang_code), SAMPLE_RATE)
+        self._segments = []
+        self._stream_lock = threading.Lock()
+        self.audio_seconds = 0.0
+        self.recognition_seconds = 0.0
+
+    def feed(self, pcm):
+        """Recognize more PCM; returns the partial text of the current segment"""
+        pcm = memoryview(pcm).cast('B')
+        partial = ''
+        with self._stream_lock:
+            start = time.perf_counter()
+            for offset in range(0, len(pcm), FEED_BYTES):
+                if self._recognizer.AcceptWaveform(bytes(pcm[offset:offset + FEED_BYTES])):
+                    self._add_segment(self._recognizer.Result())
+                else:
+                    partial = json.loads(self._recognizer.PartialResult()).get('partial', '')
+            self.recognition_seconds += time.perf_counter() - start
+            self.audio_seconds += len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+            return ' '.join(self._segments + [partial]).strip()
+
+    def _add_segment(self, result):
+        text = json.loads(result).get('text', '')
+        if text:
+            self._segments.append(text)
+
+    def finish(self):
+        """Flush the recognizer and return the full text; the stream can be fed again"""
+        with self._stream_lock:
+            start = time.perf_counter()
+            self._add_segment(self._recognizer.FinalResult())
+            self.recognition_seconds += time.perf_counter() - start
+            text = ' '.join(self._segments)
+            self._segments = []
+            _count(self.audio_seconds, self.recognition_seconds)
+            self.audio_seconds = self.recognition_seconds = 0.0
+            return text
+
+
+def _count(audio_seconds, recognition_seconds):
+    with _lock:
+        _stats['chunks'] += 1
+        _stats['audio_seconds'] += audio_seconds
+        _stats['recognition_seconds'] += recognition_seconds
+
+
+def transcribe_pcm(pcm, language='auto', session=None):
+    """Text of a complete 16 kHz mono PCM chunk; '' when the VAD finds no speech"""
+    from vad import trim_silence
+
+    pcm = trim_silence(pcm, session)
+    if pcm is None:
+        return ''
+    stream = OfflineStream(language)
+    stream.feed(pcm)
+    return stream.finish()
+
+
+def _decode(data=None, path=None, audio_format=None, sample_rate=SAMPLE_RATE):
+    from transcribe import decode_audio
+
+    if path is not None:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if audio_format is None and os.path.splitext(path)[1].lower() in ('.pcm', '.raw'):
+            audio_format = 'pcm'
+    return decode_audio(data, audio_format, sample_rate)
+
+
+def feed_stream(session, data, language='auto', audio_format='pcm', sample_rate=SAMPLE_RATE, final=False):
+    """
+    Feed the next piece of a speaker's audio to their resident stream
+    Returns {'partial': text so far} or, with final=True, {'text': full text}
+    and the stream starts over.
+    """
+    with _lock:
+        stream = _streams.get(session)
+        if stream is not None:
+            _streams.move_to_end(session)
+    if stream is None or stream.lang_code != resolve_language(language):
+        stream = OfflineStream(language)
+        with _lock:
+            _streams[session] = stream
+            while len(_streams) > MAX_STREAMS:
+                _streams.popitem(last=False)
+
+    partial = stream.feed(_decode(data, None, audio_format, sample_rate)) if data else ''
+    if final:
+        return {'text': stream.finish()}
+    return {'partial': partial}
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            # The recognizer runs in native code without the GIL, so threads scale
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='offline-stt')
+        return _pool
+
+
+def _transcribe_speaker(items):
+    """One speaker's chunks, in order (they share a VAD noise floor)"""
+    results = []
+    for index, item in items:
+        try:
+            pcm = _decode(item.get('data'), item.get('path'), item.get('audio_format'),
+                          item.get('sample_rate', SAMPLE_RATE))
+            text = transcribe_pcm(pcm, item.get('language', 'auto'), item.get('session'))
+            results.append((index, {'text': text}))
+        except Exception as e:
+            results.append((index, {'error': str(e)}))
+    return results
+
+
+def transcribe_batch(items):
+    """
+    Transcribe chunks from several speakers at once
+    items: [{'path' or 'data', 'language', 'session', 'audio_format'}, ...]
+    Speakers (sessions) are recognized concurrently, each speaker's chunks in
+    order. Returns [{'text'} or {'error'}, ...] in item order.
+    """
+    speakers = OrderedDict()
+    for index, item in enumerate(items):
+        session = item.get('session')
+        speakers.setdefault(session if session is not None else ('item', index), []).append((index, item))
+
+    results = [None] * len(items)
+    pool = _get_pool() if len(speakers) > 1 else None
+    if pool is None:
+        groups = [_transcribe_speaker(group) for group in speakers.values()]
+    else:
+        groups = list(pool.map(_transcribe_speaker, speakers.values()))
+    for group in groups:
+        for index, result in group:
+            results[index] = result
+    with _lock:
+        _stats['batches'] += 1
+    return results
+
+
+def transcribe_audio_offline(audio_file_path, language='auto', session=None):
+    """
+    Transcribe an audio file with the local model
+    Returns "No audio detected" for empty or silent audio; raises
+    ModelNotFoundError when no model is installed for the language.
+    """
+    if not os.path.exists(audio_file_path) or os.path.getsize(audio_file_path) == 0:
+        return NO_AUDIO
+    text = transcribe_pcm(_decode(path=audio_file_path), language, session)
+    return text or NO_AUDIO
+
+
+def get_offline_stt_stats():
+    """Recognized audio, real-time factor, and load time and memory of each resident model"""
+    with _lock:
+        stats = dict(_stats)
+        stats['models'] = {code: dict(info) for code, info in _model_info.items()}
+        stats['streams'] = len(_streams)
+    stats['real_time_factor'] = (stats['recognition_seconds'] / stats['audio_seconds']
+                                 if stats['audio_seconds'] else 0.0)
+    return stats
+
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python transcribe_offline.py <audio_file_path>")
+        print("Usage: python transcribe_offline.py <audio_file_path> [language] [session_id]")
         sys.exit(1)
-    
+
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     audio_path = sys.argv[1]
-    result = transcribe_audio_offline(audio_path)
-    print(result)
\ No newline at end of file
+    language = sys.argv[2] if len(sys.argv) > 2 else 'auto'
+    session = sys.argv[3] if len(sys.argv) > 3 else None
+    try:
+        result = transcribe_audio_offline(audio_path, language, session)
+    except ImportError:
+        print("[ERROR] Offline STT needs the vosk package (pip install vosk)", file=sys.stderr)
+        sys.exit(1)
+    except ModelNotFoundError as e:
+        # A non-zero exit, so the caller does not mistake this for a transcript
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"[ERROR] Offline transcription failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(result)
@@ -5,24 +5,28 @@ Works with or without OpenAI
 
 import sys
 import io
+import json
 
-# Set UTF-8 encoding for stdout
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import http_clients
+from glossary import lookup, translate_phrases
+from translation_cache import cached_translation, cached_translation_multi
 
+@cached_translation('googletrans')
 def translate_with_googletrans(text, target_lang, source_lang='auto'):
     """
     Primary translation using googletrans
     """
     try:
-        from googletrans import Translator
-        translator = Translator()
+        translator = http_clients.get_googletrans_translator()
         
         if source_lang == 'auto':
-            detected = translator.detect(text)
+            with http_clients.track('googletrans'):
+                detected = translator.detect(text)
             source_lang = detected.lang
             print(f"[DEBUG] Detected language: {source_lang}", file=sys.stderr)
         
-        result = translator.translate(text, src=source_lang, dest=target_lang)
+        with http_clients.track('googletrans'):
+            result = translator.translate(text, src=source_lang, dest=target_lang)
         print(f"[DEBUG] Googletrans: {text} -> {result.text}", file=sys.stderr)
         return result.text
         
@@ -30,59 +34,55 @@ def translate_with_googletrans(text, target_lang, source_lang='auto'):
         print(f"[ERROR] Googletrans failed: {str(e)}", file=sys.stderr)
         return None
 
+@cached_translation_multi('googletrans')
+def translate_with_googletrans_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one text into several languages with googletrans
+    The source language is detected once and the targets run concurrently.
+    Returns {target_lang: translation or None}
+    """
+    if not target_langs:
+        return {}
+
+    try:
+        if source_lang == 'auto':
+            with http_clients.track('googletrans'):
+                detected = http_clients.get_googletrans_translator().detect(text)
+            source_lang = detected.lang
+            print(f"[DEBUG] Detected language: {source_lang}", file=sys.stderr)
+    except Exception as e:
+        print(f"[ERROR] Googletrans detection failed: {str(e)}", file=sys.stderr)
+        return {target_lang: None for target_lang in target_langs}
+
+    def translate_one(target_lang):
+        try:
+            with http_clients.track('googletrans'):
+                result = http_clients.get_googletrans_translator().translate(text, src=source_lang, dest=target_lang)
+            print(f"[DEBUG] Googletrans: {text} -> {result.text}", file=sys.stderr)
+            return result.text
+        except Exception as e:
+            print(f"[ERROR] Googletrans failed for {target_lang}: {str(e)}", file=sys.stderr)
+            return None
+
+    return dict(zip(target_langs, http_clients.get_fanout_pool('googletrans').map(translate_one, target_langs)))
+
 def translate_simple(text, target_lang):
     """
     Simple fallback translation for common phrases
     """
-    translations = {
-        'ta': {
-            'hello': 'வணக்கம்',
-            'how are you': 'எப்படி இருக்கிறீர்கள்',
-            'thank you': 'நன்றி',
-            'good morning': 'காலை வணக்கம்',
-            'yes': 'ஆம்',
-            'no': 'இல்லை'
-        },
-        'hi': {
-            'hello': 'नमस्ते',
-            'how are you': 'आप कैसे हैं',
-            'thank you': 'धन्यवाद',
-            'good morning': 'सुप्रभात',
-            'yes': 'हाँ',
-            'no': 'नहीं'
-        },
-        'fr': {
-            'hello': 'Bonjour',
-            'how are you': 'Comment allez-vous',
-            'thank you': 'Merci',
-            'good morning': 'Bonjour',
-            'yes': 'Oui',
-            'no': 'Non'
-        },
-        'es': {
-            'hello': 'Hola',
-            'how are you': 'Cómo estás',
-            'thank you': 'Gracias',
-            'good morning': 'Buenos días',
-            'yes': 'Sí',
-            'no': 'No'
-        }
-    }
-    
-    text_lower = text.lower().strip()
-    if target_lang in translations:
-        for english, translated in translations[target_lang].items():
-            if english in text_lower:
-                return translated
-    
-    return None
+    return translate_phrases(text, target_lang)
 
 def translate_text(text, target_lang, source_lang='auto'):
     """
     Main translation function with multiple fallbacks
     """
     print(f"[INFO] Translating: '{text}' from {source_lang} to {target_lang}", file=sys.stderr)
-    
+
+    # A whole-utterance glossary phrase needs no network round trip
+    result = lookup(text, target_lang, source_lang)
+    if result:
+        return result
+
     # Try googletrans first
     result = translate_with_googletrans(text, target_lang, source_lang)
     if result:
@@ -98,9 +98,41 @@ def translate_text(text, target_lang, source_lang='auto'):
     print("[WARNING] All translation methods failed, returning original", file=sys.stderr)
     return f"[{target_lang.upper()}] {text}"
 
+def translate_text_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one utterance into several target languages in one call
+    Returns {target_lang: translation}, with the same fallbacks as translate_text
+    """
+    target_langs = list(dict.fromkeys(target_langs))
+    print(f"[INFO] Translating: '{text}' from {source_lang} to {', '.join(target_langs)}", file=sys.stderr)
+
+    results = {}
+    for target_lang in target_langs:
+        result = lookup(text, target_lang, source_lang)
+        if result:
+            results[target_lang] = result
+    remaining = [target_lang for target_lang in target_langs if target_lang not in results]
+    if remaining:
+        results.update(translate_with_googletrans_multi(text, remaining, source_lang))
+
+    for target_lang in target_langs:
+        if results.get(target_lang):
+            continue
+        result = translate_simple(text, target_lang)
+        if not result:
+            print(f"[WARNING] All translation methods failed for {target_lang}, returning original", file=sys.stderr)
+            result = f"[{target_lang.upper()}] {text}"
+        results[target_lang] = result
+
+    return results
+
 if __name__ == "__main__":
+    # Set UTF-8 encoding for stdout (only when run as a script, so the
+    # module can be imported by the worker without touching its stdout)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
     if len(sys.argv) < 2:
-        print("Usage: python translate.py <text> <target_language> [source_language]")
+        print("Usage: python translate.py <text> <target_language[,target_language...]> [source_language]")
         sys.exit(1)
     
     text = sys.argv[1]
@@ -108,8 +140,13 @@ if __name__ == "__main__":
     source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
     
     try:
-        translated = translate_text(text, target_lang, source_lang)
-        print(translated)
+        if ',' in target_lang:
+            # Several targets: print a JSON object {target_lang: translation}
+            translated = translate_text_multi(text, target_lang.split(','), source_lang)
+            print(json.dumps(translated, ensure_ascii=False))
+        else:
+            translated = translate_text(text, target_lang, source_lang)
+            print(translated)
     except Exception as e:
         print(f"[CRITICAL ERROR] {str(e)}", file=sys.stderr)
         print(text)  # Return original text on critical error
@@ -5,64 +5,140 @@ Get API key from: https://portal.azure.com
 """
 
 import sys
-import requests
+import os
 import io
 import json
 
-# Set UTF-8 encoding for stdout
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import http_clients
+from batching import MicroBatcher
+from translation_cache import cached_translation, cached_translation_multi
+
 
 # Azure Translator Configuration
-AZURE_KEY = "YOUR_AZURE_KEY_HERE"
-AZURE_ENDPOINT = "https://api.cognitive.microsofttranslator.com"
-AZURE_REGION = "eastus"  # Your Azure region
+AZURE_KEY = os.getenv('AZURE_TRANSLATOR_KEY', "YOUR_AZURE_KEY_HERE")
+AZURE_ENDPOINT = os.getenv('AZURE_TRANSLATOR_ENDPOINT', "https://api.cognitive.microsofttranslator.com")
+AZURE_REGION = os.getenv('AZURE_TRANSLATOR_REGION', "eastus")  # Your Azure region
+
+# Micro-batching: concurrent requests for the same language pair are sent
+# together (Azure accepts up to 1000 texts per request)
+AZURE_BATCH_SIZE = int(os.getenv('AZURE_BATCH_SIZE', '100'))
+BATCH_WINDOW_MS = float(os.getenv('TRANSLATION_BATCH_WINDOW_MS', '15'))
+
+def _azure_headers():
+    return {
+        'Ocp-Apim-Subscription-Key': AZURE_KEY,
+        'Ocp-Apim-Subscription-Region': AZURE_REGION,
+        'Content-type': 'application/json'
+    }
+
+def translate_batch_with_azure(texts, target_lang, source_lang='auto'):
+    """
+    Translate a list of texts in one Azure request
+    Returns the translations in the same order; raises on failure
+    """
+    params = {
+        'api-version': '3.0',
+        'to': target_lang
+    }
+
+    if source_lang != 'auto':
+        params['from'] = source_lang
+
+    body = [{'text': text} for text in texts]
+
+    response = http_clients.request(
+        'azure',
+        'POST',
+        AZURE_ENDPOINT + '/translate',
+        params=params,
+        headers=_azure_headers(),
+        json=body
+    )
+    response.raise_for_status()
+
+    return [item['translations'][0]['text'] for item in response.json()]
+
+_batcher = MicroBatcher(
+    lambda pair, texts: translate_batch_with_azure(texts, pair[1], pair[0]),
+    max_batch=AZURE_BATCH_SIZE,
+    max_wait=BATCH_WINDOW_MS / 1000,
+    name='azure-batcher'
+)
 
+@cached_translation('azure')
 def translate_with_azure(text, target_lang, source_lang='auto'):
     """
     Translate text using Azure Cognitive Services
     Supports 100+ languages with high accuracy
     """
     try:
-        path = '/translate'
-        constructed_url = AZURE_ENDPOINT + path
+        translated_text = _batcher.call((source_lang, target_lang), text)
+
+        print(f"[DEBUG] Azure Translation: {text} -> {translated_text}", file=sys.stderr)
+        return translated_text
         
+    except Exception as e:
+        print(f"[ERROR] Azure translation failed: {str(e)}", file=sys.stderr)
+        return f"[Translation Error] {text}"
+
+def get_batch_stats():
+    return _batcher.stats()
+
+def get_connection_stats():
+    return http_clients.connection_stats().get('azure', {})
+
+@cached_translation_multi('azure')
+def translate_with_azure_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one text into several languages with a single Azure request
+    (/translate accepts repeated 'to' parameters). Returns {target_lang: translation}
+    """
+    if not target_langs:
+        return {}
+
+    try:
+        constructed_url = AZURE_ENDPOINT + '/translate'
+
         params = {
             'api-version': '3.0',
-            'to': target_lang
+            'to': list(target_langs)
         }
-        
+
         if source_lang != 'auto':
             params['from'] = source_lang
-        
-        headers = {
-            'Ocp-Apim-Subscription-Key': AZURE_KEY,
-            'Ocp-Apim-Subscription-Region': AZURE_REGION,
-            'Content-type': 'application/json'
-        }
-        
-        body = [{
-            'text': text
-        }]
-        
-        response = requests.post(
-            constructed_url, 
-            params=params, 
-            headers=headers, 
-            json=body
+
+        response = http_clients.request(
+            'azure',
+            'POST',
+            constructed_url,
+            params=params,
+            headers=_azure_headers(),
+            json=[{'text': text}]
         )
         response.raise_for_status()
-        
-        result = response.json()
-        translated_text = result[0]['translations'][0]['text']
-        
-        print(f"[DEBUG] Azure Translation: {text} -> {translated_text}", file=sys.stderr)
-        return translated_text
-        
+
+        # Translations come back in the order of the 'to' parameters
+        translations = response.json()[0]['translations']
+        results = {
+            target_lang: translation['text']
+            for target_lang, translation in zip(target_langs, translations)
+        }
+        print(f"[DEBUG] Azure Translation: {text} -> {results}", file=sys.stderr)
+
     except Exception as e:
         print(f"[ERROR] Azure translation failed: {str(e)}", file=sys.stderr)
-        return f"[Translation Error] {text}"
+        results = {}
+
+    return {
+        target_lang: results.get(target_lang, f"[Translation Error] {text}")
+        for target_lang in target_langs
+    }
 
 if __name__ == "__main__":
+    # Set UTF-8 encoding for stdout (only when run as a script, so the
+    # module can be imported by the worker without touching its stdout)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
     if len(sys.argv) < 2:
         print("Usage: python translate_azure.py <text> <target_language> [source_language]")
         sys.exit(1)
@@ -70,6 +146,13 @@ if __name__ == "__main__":
     text = sys.argv[1]
     target_lang = sys.argv[2] if len(sys.argv) > 2 else 'en'
     source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+
+    # A one-shot CLI call has nobody to batch with
+    _batcher.max_wait = 0
     
-    translated = translate_with_azure(text, target_lang, source_lang)
-    print(translated)
+    if ',' in target_lang:
+        translated = translate_with_azure_multi(text, target_lang.split(','), source_lang)
+        print(json.dumps(translated, ensure_ascii=False))
+    else:
+        translated = translate_with_azure(text, target_lang, source_lang)
+        print(translated)
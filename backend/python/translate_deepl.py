@@ -5,55 +5,130 @@ Get API key from: https://www.deepl.com/pro-api
 """
 
 import sys
-import deepl
+import os
 import io
+import json
+
+import http_clients
+from batching import MicroBatcher
+from translation_cache import cached_translation, cached_translation_multi
 
-# Set UTF-8 encoding for stdout
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 # DeepL API Key (Free tier: 500,000 characters/month)
-DEEPL_API_KEY = "YOUR_DEEPL_API_KEY_HERE"  # Get from https://www.deepl.com/pro-api
+DEEPL_API_KEY = os.getenv('DEEPL_API_KEY', "YOUR_DEEPL_API_KEY_HERE")  # Get from https://www.deepl.com/pro-api
+DEEPL_SERVER_URL = os.getenv('DEEPL_SERVER_URL') or None  # Override the API host (e.g. a local stub)
+
+# Micro-batching: concurrent requests for the same language pair are sent
+# together (DeepL accepts up to 50 texts per request)
+DEEPL_BATCH_SIZE = int(os.getenv('DEEPL_BATCH_SIZE', '50'))
+BATCH_WINDOW_MS = float(os.getenv('TRANSLATION_BATCH_WINDOW_MS', '15'))
+
+# DeepL language codes mapping
+LANG_MAPPING = {
+    'en': 'EN-US',
+    'de': 'DE',
+    'fr': 'FR',
+    'es': 'ES',
+    'pt': 'PT-PT',
+    'it': 'IT',
+    'nl': 'NL',
+    'pl': 'PL',
+    'ru': 'RU',
+    'ja': 'JA',
+    'zh': 'ZH'
+}
+
+def _get_translator():
+    """deepl.Translator shared by all calls; it keeps its own pooled session"""
+    def factory():
+        import deepl
+
+        deepl.http_client.max_network_retries = http_clients.RETRIES
+        deepl.http_client.min_connection_timeout = http_clients.TIMEOUT
+        return deepl.Translator(DEEPL_API_KEY, server_url=DEEPL_SERVER_URL)
+    return http_clients.get_client('deepl', factory)
+
+def translate_batch_with_deepl(texts, target_lang, source_lang='auto'):
+    """
+    Translate a list of texts in one DeepL request
+    Returns the translations in the same order; raises on failure
+    """
+    translator = _get_translator()
 
+    with http_clients.track('deepl'):
+        results = translator.translate_text(
+            texts,
+            target_lang=LANG_MAPPING.get(target_lang, 'EN-US'),
+            source_lang=None if source_lang == 'auto' else source_lang.upper()
+        )
+    return [result.text for result in results]
+
+_batcher = MicroBatcher(
+    lambda pair, texts: translate_batch_with_deepl(texts, pair[1], pair[0]),
+    max_batch=DEEPL_BATCH_SIZE,
+    max_wait=BATCH_WINDOW_MS / 1000,
+    name='deepl-batcher'
+)
+
+@cached_translation('deepl')
 def translate_with_deepl(text, target_lang, source_lang='auto'):
     """
     Translate text using DeepL API
     DeepL supports: EN, DE, FR, ES, PT, IT, NL, PL, RU, JA, ZH
     """
     try:
-        translator = deepl.Translator(DEEPL_API_KEY)
-        
-        # DeepL language codes mapping
-        lang_mapping = {
-            'en': 'EN-US',
-            'de': 'DE',
-            'fr': 'FR',
-            'es': 'ES',
-            'pt': 'PT-PT',
-            'it': 'IT',
-            'nl': 'NL',
-            'pl': 'PL',
-            'ru': 'RU',
-            'ja': 'JA',
-            'zh': 'ZH'
-        }
-        
-        target_code = lang_mapping.get(target_lang, 'EN-US')
-        
-        # Translate
-        result = translator.translate_text(
-            text, 
-            target_lang=target_code,
-            source_lang=None if source_lang == 'auto' else source_lang.upper()
-        )
+        translated_text = _batcher.call((source_lang, target_lang), text)
         
-        print(f"[DEBUG] DeepL Translation: {text} -> {result.text}", file=sys.stderr)
-        return result.text
+        print(f"[DEBUG] DeepL Translation: {text} -> {translated_text}", file=sys.stderr)
+        return translated_text
         
     except Exception as e:
         print(f"[ERROR] DeepL translation failed: {str(e)}", file=sys.stderr)
         return f"[Translation Error] {text}"
 
+@cached_translation_multi('deepl')
+def translate_with_deepl_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one text into several languages with DeepL
+    DeepL takes one target per request, so the targets are sent concurrently
+    over one shared Translator. Returns {target_lang: translation}
+    """
+    if not target_langs:
+        return {}
+
+    try:
+        translator = _get_translator()
+    except Exception as e:
+        print(f"[ERROR] DeepL translation failed: {str(e)}", file=sys.stderr)
+        return {target_lang: f"[Translation Error] {text}" for target_lang in target_langs}
+
+    def translate_one(target_lang):
+        try:
+            with http_clients.track('deepl'):
+                result = translator.translate_text(
+                    text,
+                    target_lang=LANG_MAPPING.get(target_lang, 'EN-US'),
+                    source_lang=None if source_lang == 'auto' else source_lang.upper()
+                )
+            print(f"[DEBUG] DeepL Translation: {text} -> {result.text}", file=sys.stderr)
+            return result.text
+        except Exception as e:
+            print(f"[ERROR] DeepL translation to {target_lang} failed: {str(e)}", file=sys.stderr)
+            return f"[Translation Error] {text}"
+
+    return dict(zip(target_langs, http_clients.get_fanout_pool('deepl').map(translate_one, target_langs)))
+
+def get_batch_stats():
+    return _batcher.stats()
+
+def get_connection_stats():
+    return http_clients.connection_stats().get('deepl', {})
+
 if __name__ == "__main__":
+    # Set UTF-8 encoding for stdout (only when run as a script, so the
+    # module can be imported by the worker without touching its stdout)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
     if len(sys.argv) < 2:
         print("Usage: python translate_deepl.py <text> <target_language> [source_language]")
         sys.exit(1)
@@ -61,6 +136,13 @@ if __name__ == "__main__":
     text = sys.argv[1]
     target_lang = sys.argv[2] if len(sys.argv) > 2 else 'en'
     source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+
+    # A one-shot CLI call has nobody to batch with
+    _batcher.max_wait = 0
     
-    translated = translate_with_deepl(text, target_lang, source_lang)
-    print(translated)
+    if ',' in target_lang:
+        translated = translate_with_deepl_multi(text, target_lang.split(','), source_lang)
+        print(json.dumps(translated, ensure_ascii=False))
+    else:
+        translated = translate_with_deepl(text, target_lang, source_lang)
+        print(translated)
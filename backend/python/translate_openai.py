@@ -7,64 +7,73 @@ Get API key from: https://platform.openai.com/api-keys
 import sys
 import os
 import io
+import json
+from importlib.util import find_spec
 
-# Set UTF-8 encoding for stdout
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+import http_clients
+from translation_cache import cached_translation, cached_translation_multi
 
-# Try to import OpenAI
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY', 'YOUR_API_KEY_HERE'))
-    USE_OPENAI = True
-except ImportError:
-    USE_OPENAI = False
-    print("[WARNING] OpenAI not installed, falling back to googletrans", file=sys.stderr)
 
-# Fallback to googletrans if OpenAI not available
+# The openai package takes a few hundred ms to import, so only check that it
+# is installed here and import it when the first client is built
+USE_OPENAI = find_spec('openai') is not None
 if not USE_OPENAI:
-    try:
-        from googletrans import Translator
-        translator = Translator()
-    except ImportError:
-        print("[ERROR] Neither OpenAI nor googletrans available", file=sys.stderr)
-        sys.exit(1)
+    print("[WARNING] OpenAI not installed, falling back to googletrans", file=sys.stderr)
 
+def get_openai_client():
+    """OpenAI client shared by all calls, with pooled keep-alive connections"""
+    def factory():
+        import httpx
+        from openai import OpenAI
+        return OpenAI(
+            api_key=os.getenv('OPENAI_API_KEY', 'YOUR_API_KEY_HERE'),
+            timeout=http_clients.TIMEOUT,
+            max_retries=http_clients.RETRIES,
+            http_client=httpx.Client(limits=httpx.Limits(
+                max_connections=http_clients.POOL_SIZE,
+                max_keepalive_connections=http_clients.POOL_SIZE
+            ))
+        )
+    return http_clients.get_client('openai', factory)
+
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'ta': 'Tamil',
+    'hi': 'Hindi',
+    'te': 'Telugu',
+    'ml': 'Malayalam',
+    'kn': 'Kannada',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'zh': 'Chinese'
+}
+
+@cached_translation('openai')
 def translate_with_openai(text, target_lang, source_lang='auto'):
     """
     Translate text using OpenAI GPT-3.5-turbo
     """
     try:
-        language_names = {
-            'en': 'English',
-            'ta': 'Tamil',
-            'hi': 'Hindi',
-            'te': 'Telugu',
-            'ml': 'Malayalam',
-            'kn': 'Kannada',
-            'es': 'Spanish',
-            'fr': 'French',
-            'de': 'German',
-            'it': 'Italian',
-            'pt': 'Portuguese',
-            'ru': 'Russian',
-            'ja': 'Japanese',
-            'ko': 'Korean',
-            'zh': 'Chinese'
-        }
-        
-        target_language_name = language_names.get(target_lang, target_lang)
+        target_language_name = LANGUAGE_NAMES.get(target_lang, target_lang)
         
         prompt = f"Translate the following text to {target_language_name}. Provide ONLY the translation, no explanations or additional text:\n\n{text}"
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional translator. Provide accurate, natural translations. Return ONLY the translated text, nothing else."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
+        with http_clients.track('openai'):
+            response = get_openai_client().chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a professional translator. Provide accurate, natural translations. Return ONLY the translated text, nothing else."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=500
+            )
         
         translated_text = response.choices[0].message.content.strip()
         print(f"[DEBUG] OpenAI Translation: {text} -> {translated_text}", file=sys.stderr)
@@ -75,16 +84,21 @@ def translate_with_openai(text, target_lang, source_lang='auto'):
         # Fallback to googletrans
         return translate_with_googletrans(text, target_lang, source_lang)
 
+@cached_translation('googletrans')
 def translate_with_googletrans(text, target_lang, source_lang='auto'):
     """
     Fallback translation using googletrans
     """
     try:
+        translator = http_clients.get_googletrans_translator()
+
         if source_lang == 'auto':
-            detected = translator.detect(text)
+            with http_clients.track('googletrans'):
+                detected = translator.detect(text)
             source_lang = detected.lang
         
-        result = translator.translate(text, src=source_lang, dest=target_lang)
+        with http_clients.track('googletrans'):
+            result = translator.translate(text, src=source_lang, dest=target_lang)
         print(f"[DEBUG] Googletrans Translation: {text} -> {result.text}", file=sys.stderr)
         return result.text
         
@@ -92,6 +106,56 @@ def translate_with_googletrans(text, target_lang, source_lang='auto'):
         print(f"[ERROR] Googletrans failed: {str(e)}", file=sys.stderr)
         return f"[Translation Error] {text}"
 
+@cached_translation_multi('openai')
+def translate_with_openai_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one text into several languages with a single GPT request
+    that answers with a JSON object keyed by language code
+    """
+    if not target_langs:
+        return {}
+
+    try:
+        targets = ', '.join(f"{lang} ({LANGUAGE_NAMES.get(lang, lang)})" for lang in target_langs)
+
+        prompt = (
+            f"Translate the following text into each of these languages: {targets}. "
+            f"Answer with ONLY a JSON object mapping each language code to its translation:\n\n{text}"
+        )
+
+        with http_clients.track('openai'):
+            response = get_openai_client().chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a professional translator. Provide accurate, natural translations. Return ONLY valid JSON, nothing else."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.3,
+                max_tokens=500 * len(target_langs)
+            )
+
+        translations = json.loads(response.choices[0].message.content)
+        results = {
+            lang: str(translations[lang]).strip()
+            for lang in target_langs
+            if translations.get(lang)
+        }
+        print(f"[DEBUG] OpenAI Translation: {text} -> {results}", file=sys.stderr)
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI translation failed: {str(e)}", file=sys.stderr)
+        results = {}
+
+    # Anything the model left out goes through the googletrans fallback
+    missing = [lang for lang in target_langs if lang not in results]
+    if missing:
+        pool = http_clients.get_fanout_pool('googletrans')
+        fallback = pool.map(lambda lang: translate_with_googletrans(text, lang, source_lang), missing)
+        results.update(zip(missing, fallback))
+
+    return results
+
 def translate_text(text, target_lang, source_lang='auto'):
     """
     Main translation function with automatic fallback
@@ -101,7 +165,27 @@ def translate_text(text, target_lang, source_lang='auto'):
     else:
         return translate_with_googletrans(text, target_lang, source_lang)
 
+def translate_text_multi(text, target_langs, source_lang='auto'):
+    """
+    Translate one utterance into several target languages in one call
+    Returns {target_lang: translation}
+    """
+    target_langs = list(dict.fromkeys(target_langs))
+    if USE_OPENAI:
+        return translate_with_openai_multi(text, target_langs, source_lang)
+    pool = http_clients.get_fanout_pool('googletrans')
+    results = pool.map(lambda lang: translate_with_googletrans(text, lang, source_lang), target_langs)
+    return dict(zip(target_langs, results))
+
 if __name__ == "__main__":
+    # Set UTF-8 encoding for stdout (only when run as a script, so the
+    # module can be imported by the worker without touching its stdout)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    if not USE_OPENAI and find_spec('googletrans') is None:
+        print("[ERROR] Neither OpenAI nor googletrans available", file=sys.stderr)
+        sys.exit(1)
+
     if len(sys.argv) < 2:
         print("Usage: python translate_openai.py <text> <target_language> [source_language]")
         sys.exit(1)
@@ -110,6 +194,10 @@ if __name__ == "__main__":
     target_lang = sys.argv[2] if len(sys.argv) > 2 else 'en'
     source_lang = sys.argv[3] if len(sys.argv) > 3 else 'auto'
     
-    translated = translate_text(text, target_lang, source_lang)
-    print(translated)
+    if ',' in target_lang:
+        translated = translate_text_multi(text, target_lang.split(','), source_lang)
+        print(json.dumps(translated, ensure_ascii=False))
+    else:
+        translated = translate_text(text, target_lang, source_lang)
+        print(translated)
 
@@ -0,0 +1,228 @@
+"""
+Translation cache shared by every translate_* backend
+Bounded in-process LRU with TTL, plus an optional SQLite tier that
+survives worker restarts. Keys are (normalized text, source, target, backend).
+
+Environment:
+    TRANSLATION_CACHE_SIZE  max entries kept in memory (default 10000, 0 disables the cache)
+    TRANSLATION_CACHE_TTL   seconds an entry stays valid (default 86400)
+    TRANSLATION_CACHE_DB    SQLite file for the on-disk tier (disabled when unset)
+"""
+
+import os
+import sys
+import time
+import threading
+import functools
+import unicodedata
+from collections import OrderedDict
+
+import metrics
+
+KEY_SEPARATOR = '\x1f'
+
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace so trivial variants share an entry"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class TranslationCache:
+    """LRU + TTL cache with an optional SQLite second tier"""
+
+    def __init__(self, max_entries=10000, ttl=86400, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'disk_hits': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+        self._db = None
+        self._db_error = ()
+        if db_path:
+            # Only the disk tier needs sqlite3; keep it off the import path otherwise
+            import sqlite3
+
+            self._db_error = sqlite3.Error
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS translations '
+                    '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+                )
+                self._db.execute('DELETE FROM translations WHERE expires_at < ?', (time.time(),))
+            except sqlite3.Error as e:
+                print(f"[WARNING] Translation cache DB disabled: {e}", file=sys.stderr)
+                self._db = None
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang, backend):
+        return KEY_SEPARATOR.join([normalize_text(text), source_lang or 'auto', target_lang, backend])
+
+    def get(self, text, source_lang, target_lang, backend):
+        key = self.make_key(text, source_lang, target_lang, backend)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._counters['expirations'] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        'SELECT value, expires_at FROM translations WHERE key = ?', (key,)
+                    ).fetchone()
+                except self._db_error:
+                    row = None
+                if row and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self._counters['hits'] += 1
+                    self._counters['disk_hits'] += 1
+                    return row[0]
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, text, source_lang, target_lang, backend, value):
+        key = self.make_key(text, source_lang, target_lang, backend)
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)',
+                        (key, value, expires_at)
+                    )
+                except self._db_error as e:
+                    print(f"[WARNING] Translation cache DB write failed: {e}", file=sys.stderr)
+
+    def _store(self, key, value, expires_at):
+        """Insert into the memory tier; caller holds the lock"""
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM translations')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache configured from the environment, None when disabled"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_entries = int(os.getenv('TRANSLATION_CACHE_SIZE', '10000'))
+            if max_entries <= 0:
+                return None
+            _cache = TranslationCache(
+                max_entries=max_entries,
+                ttl=float(os.getenv('TRANSLATION_CACHE_TTL', '86400')),
+                db_path=os.getenv('TRANSLATION_CACHE_DB') or None
+            )
+        return _cache
+
+
+def get_cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache else {}
+
+
+def is_cacheable(result):
+    """Failed translations are returned as None or tagged text and must not be cached"""
+    return bool(result) and not result.startswith('[Translation Error]')
+
+
+def cached_translation(backend):
+    """
+    Decorator for translate_*(text, target_lang, source_lang='auto') functions
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(text, target_lang, source_lang='auto'):
+            cache = get_cache()
+            if cache is None or not text:
+                with metrics.span('translation', backend=backend):
+                    return func(text, target_lang, source_lang)
+
+            cached = cache.get(text, source_lang, target_lang, backend)
+            if cached is not None:
+                print(f"[DEBUG] Translation cache hit ({backend}): {text}", file=sys.stderr)
+                return cached
+
+            with metrics.span('translation', backend=backend):
+                result = func(text, target_lang, source_lang)
+            if is_cacheable(result):
+                cache.put(text, source_lang, target_lang, backend, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def cached_translation_multi(backend):
+    """
+    Decorator for translate_*_multi(text, target_langs, source_lang='auto')
+    functions returning {target_lang: translation}; only targets missing
+    from the cache are passed to the wrapped function
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(text, target_langs, source_lang='auto'):
+            cache = get_cache()
+            if cache is None or not text:
+                with metrics.span('translation', backend=backend):
+                    return func(text, target_langs, source_lang)
+
+            results = {}
+            missing = []
+            for target_lang in target_langs:
+                cached = cache.get(text, source_lang, target_lang, backend)
+                if cached is not None:
+                    results[target_lang] = cached
+                else:
+                    missing.append(target_lang)
+
+            if missing:
+                with metrics.span('translation', backend=backend):
+                    fresh = func(text, missing, source_lang)
+                for target_lang in missing:
+                    result = fresh.get(target_lang)
+                    if is_cacheable(result):
+                        cache.put(text, source_lang, target_lang, backend, result)
+                    results[target_lang] = result
+            else:
+                print(f"[DEBUG] Translation cache hit ({backend}) for all targets: {text}", file=sys.stderr)
+            return results
+        return wrapper
+    return decorator
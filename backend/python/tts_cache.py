@@ -0,0 +1,211 @@
+"""
+Content-addressed cache for synthesized speech
+Audio is stored under the SHA-256 of (text, language, voice, rate, volume,
+format), so repeated phrases never reach the TTS engine. Writes are atomic
+(temp file + rename in the same directory), so several worker processes can
+share one cache directory. The directory is bounded in size; the least
+recently used files are evicted first. voices.json next to the audio holds
+the voice each language resolved to (written by synthesize.py), so a
+process without a TTS engine can still build the key.
+
+Environment:
+    TTS_CACHE_DIR        cache directory (default <tmp>/voice-tts-cache, empty disables)
+    TTS_CACHE_MAX_BYTES  size bound in bytes (default 200 MB)
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+VOICES_NAME = 'voices.json'
+
+
+class TTSCache:
+    """Size-bounded on-disk LRU of encoded audio, keyed by content hash"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._size_estimate = None
+        self._stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'writes': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(text, language, voice_id, rate, volume, audio_format='wav'):
+        material = '\x1f'.join([text, language, str(voice_id), str(rate), str(volume), audio_format])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, audio_format='wav'):
+        return os.path.join(self.directory, key[:2], f"{key}.{audio_format}")
+
+    def get_path(self, key, audio_format='wav'):
+        """Path of the cached audio, or None on a miss; a hit refreshes its LRU position"""
+        path = self.path_for(key, audio_format)
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['bytes_saved'] += size
+        return path
+
+    def get_voices(self):
+        """The voice map stored with put_voices(), {} when there is none"""
+        try:
+            with open(os.path.join(self.directory, VOICES_NAME)) as f:
+                voices = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return voices if isinstance(voices, dict) else {}
+
+    def put_voices(self, voices):
+        """Atomically replace the voice map"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(voices, f)
+            os.replace(temp_path, os.path.join(self.directory, VOICES_NAME))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def get_bytes(self, key, audio_format='wav'):
+        path = self.get_path(key, audio_format)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another process between the lookup and the read
+            return None
+
+    def put(self, key, data, audio_format='wav'):
+        """Atomically store audio bytes; returns the cached path"""
+        path = self.path_for(key, audio_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        self._record_write(len(data))
+        return path
+
+    def put_file(self, key, source_path, audio_format='wav'):
+        """Atomically copy an audio file into the cache; returns the cached path"""
+        with open(source_path, 'rb') as f:
+            return self.put(key, f.read(), audio_format)
+
+    def _record_write(self, size):
+        with self._lock:
+            self._stats['writes'] += 1
+            if self._size_estimate is not None:
+                self._size_estimate += size
+            over_budget = self._size_estimate is None or self._size_estimate > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used files until the cache is under 90% of its bound"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp') or name == VOICES_NAME:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        evicted = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    evicted += 1
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self._size_estimate = total
+            self._stats['evictions'] += evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+def place_file(cached_path, output_path):
+    """
+    Copy a cached file to output_path (temp file + rename)
+    Never a hard link: output paths such as output.wav are rewritten in place
+    by the engine on the next miss, which would change the cached entry too.
+    """
+    output_dir = os.path.dirname(output_path) or '.'
+    os.makedirs(output_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(cached_path, temp_path)
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return output_path
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Process-wide cache configured from the environment, None when disabled"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            directory = os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'voice-tts-cache'))
+            if not directory:
+                return None
+            try:
+                _cache = TTSCache(directory, int(os.getenv('TTS_CACHE_MAX_BYTES', str(DEFAULT_MAX_BYTES))))
+            except OSError as e:
+                print(f"[WARNING] TTS cache disabled: {e}", file=sys.stderr)
+                return None
+        return _cache
+
+
+def get_tts_cache_stats():
+    cache = get_tts_cache()
+    return cache.stats() if cache else {}
@@ -0,0 +1,298 @@
+"""
+Parallel text-to-speech for one utterance in several languages
+A bounded pool of processes, each holding one pyttsx3 engine (the driver
+allows one per process) that is initialized, with its voice index built,
+before the first job arrives. A batch of (text, language) jobs is spread
+over the pool, so k listener languages cost one engine start per process
+instead of one interpreter and engine per language. Cached phrases are
+served from the TTS cache without reaching the pool.
+
+Every job reports how long it waited for an engine (queue_ms) and how long
+synthesis took (synthesis_ms).
+
+Environment:
+    TTS_POOL_SIZE   engine processes (default: CPU count); 1 runs jobs in the
+                    calling process. The command line never starts more
+                    processes than it has jobs.
+
+Usage:
+    echo '[{"text": "வணக்கம்", "language": "ta", "output_path": "out_ta.wav"}]' | python tts_pool.py
+    Prints one JSON line per job as it finishes:
+    {"index": 0, "language": "ta", "output_path": "out_ta.wav", "queue_ms": 0.4, "synthesis_ms": 812.0, ...}
+
+    python tts_pool.py --stdio
+    Resident pool, so the engines are started once rather than per utterance:
+    reads one batch per line, {"id": 1, "jobs": [...]}, runs batches
+    concurrently and prints {"id": 1, "index": 0, ...} per job as above, then
+    {"id": 1, "done": true} when the batch is complete.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import threading
+
+import metrics
+from audio_codec import OUTPUT_FORMAT, extension, with_extension
+from tts_cache import get_tts_cache, place_file
+
+POOL_SIZE = int(os.getenv('TTS_POOL_SIZE', '0')) or os.cpu_count() or 1
+
+
+def _warm_engine(languages):
+    """Pool initializer: start the engine and resolve the batch's voices up front"""
+    # Worker output must not mix with the parent's stdout (the CLI prints JSON there)
+    sys.stdout = sys.stderr
+    import synthesize
+
+    try:
+        with synthesize._engine_lock:
+            for language in languages:
+                synthesize.get_engine(language)
+    except Exception as e:
+        # Reported again, per job, by synthesize_speech
+        print(f"[WARNING] TTS engine warm-up failed: {e}", file=sys.stderr)
+
+
+def _run_job(text, language, output_path, submitted):
+    """Synthesize one job; runs in a pool process (or inline for a pool of one)"""
+    from synthesize import synthesize_speech
+
+    started = time.monotonic()
+    result = synthesize_speech(text, language, output_path)
+    return {
+        'output_path': result,
+        # time.monotonic() is one system-wide clock, so it compares across processes
+        'queue_ms': max(0.0, started - submitted) * 1000,
+        'synthesis_ms': (time.monotonic() - started) * 1000,
+        'pid': os.getpid(),
+    }
+
+
+class TTSPool:
+    """Bounded pool of pre-initialized TTS engines"""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = max(1, size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'jobs': 0, 'cache_hits': 0, 'errors': 0,
+            'total_queue_ms': 0.0, 'max_queue_ms': 0.0, 'total_synthesis_ms': 0.0,
+        }
+
+    def _get_executor(self, jobs):
+        """The process pool, started on first use with the first batch's voices; None for a pool of one"""
+        with self._lock:
+            if self._executor is None and self.size > 1:
+                from concurrent.futures import ProcessPoolExecutor
+
+                languages = list(dict.fromkeys(job['language'] for job in jobs))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    initializer=_warm_engine,
+                    initargs=(languages,)
+                )
+            return self._executor
+
+    def _record(self, result):
+        with self._lock:
+            stats = self._stats
+            stats['jobs'] += 1
+            if result.get('cached'):
+                stats['cache_hits'] += 1
+            elif result.get('error'):
+                stats['errors'] += 1
+            else:
+                stats['total_queue_ms'] += result['queue_ms']
+                stats['max_queue_ms'] = max(stats['max_queue_ms'], result['queue_ms'])
+                stats['total_synthesis_ms'] += result['synthesis_ms']
+        if not result.get('cached') and not result.get('error'):
+            metrics.observe('tts_queue_wait', result['queue_ms'] / 1000, language=result['language'])
+
+    def iter_batch(self, jobs):
+        """
+        Synthesize jobs ({'text', 'language', 'output_path'}) and yield
+        (index, result) in completion order
+        """
+        from synthesize import cache_key
+
+        cache = get_tts_cache()
+        pending = []
+        for index, job in enumerate(jobs):
+            language = job.get('language') or 'en'
+            base = {'language': language, 'queue_ms': 0.0, 'synthesis_ms': 0.0}
+            key = cache_key(job['text'], language, OUTPUT_FORMAT) if cache else None
+            cached_path = cache.get_path(key, extension(OUTPUT_FORMAT)) if key else None
+            if cached_path:
+                output_path = job['output_path']
+                if OUTPUT_FORMAT != 'wav':
+                    output_path = with_extension(output_path, OUTPUT_FORMAT)
+                result = {**base, 'output_path': place_file(cached_path, output_path), 'cached': True}
+                self._record(result)
+                yield index, result
+            else:
+                pending.append((index, {**job, 'language': language}))
+        if not pending:
+            return
+
+        executor = self._get_executor([job for _, job in pending])
+        if executor is None:
+            for index, job in pending:
+                try:
+                    result = {'language': job['language'],
+                              **_run_job(job['text'], job['language'], job['output_path'], time.monotonic())}
+                except Exception as e:
+                    result = {'language': job['language'], 'error': str(e)}
+                self._record(result)
+                yield index, result
+            return
+
+        from concurrent.futures import as_completed
+
+        futures = {
+            executor.submit(_run_job, job['text'], job['language'], job['output_path'], time.monotonic()):
+                (index, job['language'])
+            for index, job in pending
+        }
+        for future in as_completed(futures):
+            index, language = futures[future]
+            try:
+                result = {'language': language, **future.result()}
+            except Exception as e:
+                result = {'language': language, 'error': str(e)}
+            self._record(result)
+            yield index, result
+
+    def synthesize_batch(self, jobs):
+        """Results in job order"""
+        results = [None] * len(jobs)
+        for index, result in self.iter_batch(jobs):
+            results[index] = result
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        synthesized = stats['jobs'] - stats['cache_hits'] - stats['errors']
+        stats['size'] = self.size
+        stats['avg_queue_ms'] = stats['total_queue_ms'] / synthesized if synthesized else 0.0
+        stats['avg_synthesis_ms'] = stats['total_synthesis_ms'] / synthesized if synthesized else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tts_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TTSPool()
+        return _pool
+
+
+def synthesize_batch(jobs):
+    """[{'text', 'language', 'output_path'}, ...] -> results in the same order"""
+    return get_tts_pool().synthesize_batch(jobs)
+
+
+def get_tts_pool_stats():
+    return get_tts_pool().stats()
+
+
+def _stdin_lines():
+    """
+    Lines of stdin, read with os.read: a pool process forked while the main
+    thread blocks in a buffered sys.stdin read would hang closing its copy of
+    sys.stdin, whose lock the fork left held
+    """
+    pending = b''
+    while True:
+        chunk = os.read(sys.stdin.fileno(), 65536)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+    if pending:
+        yield pending.decode('utf-8')
+
+
+def serve_stdio(pool, source, out):
+    """Run batches read as JSON lines from source, each in its own thread, until EOF"""
+    write_lock = threading.Lock()
+
+    def write(message):
+        with write_lock:
+            out.write(json.dumps(message, ensure_ascii=False) + '\n')
+
+    def run(request_id, jobs):
+        try:
+            for index, result in pool.iter_batch(jobs):
+                write({'id': request_id, 'index': index, **result})
+        except Exception as e:
+            print(f"[ERROR] TTS batch {request_id} failed: {e}", file=sys.stderr)
+        write({'id': request_id, 'done': True})
+
+    threads = []
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            request_id, jobs = request['id'], list(request['jobs'])
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[ERROR] Bad TTS request: {e}", file=sys.stderr)
+            continue
+        thread = threading.Thread(target=run, args=(request_id, jobs), name=f"tts-{request_id}", daemon=True)
+        thread.start()
+        threads = [t for t in threads if t.is_alive()] + [thread]
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    # JSON lines on stdout only; anything the engine prints goes to stderr
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+    sys.stdout = sys.stderr
+
+    if sys.argv[1:] == ['--stdio']:
+        import signal
+
+        # Stopped with SIGTERM by server.js: close the engine processes rather than orphan them
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        pool = get_tts_pool()
+        try:
+            serve_stdio(pool, _stdin_lines(), out)
+        except KeyboardInterrupt:
+            pass
+        pool.close()
+        print(f"[INFO] TTS pool: {json.dumps(pool.stats())}", file=sys.stderr)
+        sys.exit(0)
+
+    source = sys.argv[1] if len(sys.argv) > 1 else sys.stdin.read()
+    try:
+        jobs = json.loads(source)
+    except ValueError as e:
+        print(f"[ERROR] Expected a JSON list of jobs: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    pool = TTSPool(min(POOL_SIZE, len(jobs)))
+    failed = False
+    for index, result in pool.iter_batch(jobs):
+        failed = failed or not result.get('output_path')
+        out.write(json.dumps({'index': index, **result}, ensure_ascii=False) + '\n')
+    pool.close()
+    print(f"[INFO] TTS pool: {json.dumps(pool.stats())}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
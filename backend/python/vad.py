@@ -0,0 +1,145 @@
+"""
+Voice-activity detection for 16 kHz mono 16-bit PCM
+Frames are classified with vectorized energy and zero-crossing features
+against a noise floor that each stream keeps updating, so silent chunks never
+reach the recognizer and leading/trailing silence is trimmed off the rest.
+
+Environment:
+    VAD_ENABLED          0 disables detection and trimming (default 1)
+    VAD_THRESHOLD_RATIO  speech energy relative to the noise floor (default 3.0)
+    VAD_MIN_RMS          absolute speech energy floor (default 200)
+    VAD_PADDING_MS       audio kept around detected speech (default 200)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+VAD_ENABLED = os.getenv('VAD_ENABLED', '1') != '0'
+THRESHOLD_RATIO = float(os.getenv('VAD_THRESHOLD_RATIO', '3.0'))
+MIN_RMS = float(os.getenv('VAD_MIN_RMS', '200'))
+PADDING_MS = int(os.getenv('VAD_PADDING_MS', '200'))
+
+# Noise: zero-crossing rate above this needs twice the energy to count as speech
+NOISY_ZCR = 0.35
+# How fast the noise floor follows quiet frames (per chunk)
+FLOOR_ADAPT = 0.2
+MIN_SPEECH_FRAMES = 3
+MAX_STREAMS = 1024
+
+_lock = threading.Lock()
+_streams = OrderedDict()  # stream id -> StreamVAD
+_stats = {'chunks': 0, 'skipped_chunks': 0, 'seconds_in': 0.0, 'seconds_skipped': 0.0}
+
+
+def frame_features(samples):
+    """Per-frame RMS energy and zero-crossing rate of int16 samples"""
+    count = len(samples) // FRAME_SAMPLES
+    frames = samples[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (FRAME_SAMPLES - 1)
+    return rms, zcr
+
+
+class StreamVAD:
+    """Speech detection for one audio stream, with a running noise-floor estimate"""
+
+    def __init__(self, threshold_ratio=THRESHOLD_RATIO, min_rms=MIN_RMS, padding_ms=PADDING_MS):
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.padding_frames = padding_ms // FRAME_MS
+        self.noise_floor = None
+
+    def _update_floor(self, rms, speech):
+        quiet = rms[~speech]
+        if self.noise_floor is None:
+            # First chunk: the quietest tenth of the frames stands in for the noise
+            self.noise_floor = float(np.percentile(rms, 10))
+        elif len(quiet):
+            self.noise_floor += FLOOR_ADAPT * (float(np.mean(quiet)) - self.noise_floor)
+        # The floor can always drop at once to a quieter frame
+        self.noise_floor = min(self.noise_floor, float(rms.min()))
+
+    def speech_frames(self, samples):
+        """Boolean mask of frames that contain speech"""
+        rms, zcr = frame_features(samples)
+        if not len(rms):
+            return rms.astype(bool)
+
+        floor = self.noise_floor if self.noise_floor is not None else float(np.percentile(rms, 10))
+        threshold = max(self.min_rms, floor * self.threshold_ratio)
+        speech = (rms > threshold) & ((zcr < NOISY_ZCR) | (rms > 2 * threshold))
+        self._update_floor(rms, speech)
+        return speech
+
+    def trim(self, pcm):
+        """
+        Speech part of a PCM chunk, with leading and trailing silence removed
+        Returns a memoryview into pcm, or None if the chunk is silent.
+        """
+        samples = np.frombuffer(pcm, dtype='<i2')
+        speech = self.speech_frames(samples)
+        if np.count_nonzero(speech) < MIN_SPEECH_FRAMES:
+            return None
+
+        indices = np.flatnonzero(speech)
+        first = max(0, indices[0] - self.padding_frames)
+        last = min(len(speech), indices[-1] + 1 + self.padding_frames)
+        end = len(samples) if last == len(speech) else last * FRAME_SAMPLES
+        return memoryview(pcm).cast('B')[first * FRAME_SAMPLES * 2:end * 2]
+
+
+def get_stream_vad(stream=None):
+    """
+    StreamVAD for a session/stream id; the least recently used are forgotten
+    Without a stream every call gets a fresh StreamVAD, whose noise floor
+    comes from that chunk alone, so unrelated requests never share one.
+    """
+    if stream is None:
+        return StreamVAD()
+    with _lock:
+        vad = _streams.get(stream)
+        if vad is None:
+            vad = _streams[stream] = StreamVAD()
+            while len(_streams) > MAX_STREAMS:
+                _streams.popitem(last=False)
+        _streams.move_to_end(stream)
+        return vad
+
+
+def trim_silence(pcm, stream=None):
+    """
+    Trim a 16 kHz mono PCM chunk to its speech, None if there is none
+    Counts skipped chunks and seconds; returns pcm unchanged when VAD is disabled.
+    """
+    if not VAD_ENABLED:
+        return pcm
+
+    vad = get_stream_vad(stream)
+    speech = vad.trim(pcm)
+
+    seconds_in = len(pcm) / (SAMPLE_RATE * 2)
+    seconds_kept = len(speech) / (SAMPLE_RATE * 2) if speech is not None else 0.0
+    with _lock:
+        _stats['chunks'] += 1
+        _stats['seconds_in'] += seconds_in
+        _stats['seconds_skipped'] += seconds_in - seconds_kept
+        if speech is None:
+            _stats['skipped_chunks'] += 1
+    return speech
+
+
+def get_vad_stats():
+    """Chunks and seconds of audio seen and skipped by the VAD"""
+    with _lock:
+        stats = dict(_stats)
+        stats['streams'] = len(_streams)
+    stats['skipped_ratio'] = stats['seconds_skipped'] / stats['seconds_in'] if stats['seconds_in'] else 0.0
+    return stats
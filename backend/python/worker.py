@@ -0,0 +1,396 @@
+"""
+Persistent worker for speech-to-text, translation and text-to-speech
+Loads transcribe.py, translate.py and synthesize.py once per process and
+serves them as RPC methods, so a request no longer pays for interpreter
+startup and heavy imports.
+
+Requests and responses are length-prefixed JSON frames:
+    4-byte big-endian payload length + UTF-8 JSON payload
+
+    request:  {"id": 1, "method": "translate_text", "params": {"text": "hello", "target_lang": "ta"}}
+    response: {"id": 1, "result": "வணக்கம்"}  or  {"id": 1, "error": "..."}
+
+"params" may be an object (keyword arguments) or a list (positional arguments).
+Responses can arrive out of order; match them on "id".
+Binary arguments are sent base64-encoded under a name ending in "_b64",
+e.g. {"method": "transcribe_bytes", "params": {"data_b64": "...", "language": "ta"}}.
+
+Requests go through scheduler.py, which runs as many at once as there are
+workers. Live room traffic tags its frames so it is served first, fairly
+between rooms, and dropped or merged once it is too late to be useful:
+    {"id": 2, "method": "translate_text", "params": {...},
+     "room": "room1", "priority": "live", "stream": "room1:alice", "deadline_ms": 3000}
+Requests with the same "stream" run on the same worker process, in order,
+so per-speaker state (decoder, VAD, detected language) carries over between
+them. Untagged requests are 'interactive', without a deadline. A request that was
+not run gets {"id": 2, "error": "...", "shed": "deadline" | "overflow" | "merged"},
+plus "merged_into": <id> when its input was joined into that later request.
+{"method": "scheduler_stats"} returns the scheduler's counters.
+
+Usage:
+    python worker.py --stdio [--workers N]
+    python worker.py --socket /tmp/voice-worker.sock [--workers N]
+    python worker.py --tcp 127.0.0.1:7070 [--workers N]
+    python worker.py ... [--metrics-port 9464]   Prometheus /metrics for all workers
+"""
+
+import sys
+import os
+import json
+import base64
+import signal
+import struct
+import socket
+import socketserver
+import subprocess
+import threading
+import argparse
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from scheduler import Scheduler, JobShed
+
+HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024  # 64 MB, enough for several minutes of audio
+
+# Modules loaded in every worker process, with the functions exposed from each
+RPC_MODULES = {
+    'transcribe': ['transcribe_audio', 'transcribe_bytes', 'get_recognizer_stats'],
+    'transcribe_offline': ['transcribe_audio_offline', 'transcribe_batch', 'feed_stream', 'get_offline_stt_stats'],
+    'vad': ['get_vad_stats'],
+    'segmenter': ['transcribe_chunk', 'flush_speaker', 'get_segmenter_stats'],
+    'decoder': ['get_decoder_stats'],
+    'translate': ['translate_text', 'translate_text_multi'],
+    'router': ['translate_routed', 'get_router_stats'],
+    'glossary': ['get_glossary_stats'],
+    'translation_cache': ['get_cache_stats'],
+    'http_clients': ['connection_stats'],
+    'synthesize': ['synthesize_speech'],
+    'audio_codec': ['get_codec_stats'],
+    'tts_cache': ['get_tts_cache_stats'],
+    'metrics': ['get_metrics'],
+}
+
+_methods = {}
+
+
+def _read_exact(stream, size):
+    """Read exactly size bytes, None on clean EOF before the first byte"""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise EOFError("Connection closed in the middle of a frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(stream):
+    """Read one JSON frame from a binary stream, None on EOF"""
+    header = _read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes exceeds limit of {MAX_FRAME_SIZE}")
+    payload = _read_exact(stream, length) if length else b''
+    if payload is None:
+        raise EOFError("Connection closed before frame payload")
+    return json.loads(payload.decode('utf-8'))
+
+
+def write_frame(stream, message):
+    """Write one JSON frame to a binary stream"""
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _init_worker():
+    """Import the pipeline modules once when a worker process starts"""
+    # Stray prints must never reach the frame stream
+    sys.stdout = sys.stderr
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    _methods['ping'] = lambda: 'pong'
+    for module_name, functions in RPC_MODULES.items():
+        try:
+            module = __import__(module_name)
+        except Exception as e:
+            print(f"[WARNING] Worker could not load {module_name}: {e}", file=sys.stderr)
+            continue
+        for name in functions:
+            _methods[name] = getattr(module, name)
+
+    print(f"[DEBUG] Worker {os.getpid()} ready: {sorted(_methods)}", file=sys.stderr)
+
+
+def _decode_params(params):
+    """Turn "<name>_b64" keyword arguments back into bytes under <name>"""
+    decoded = {}
+    for key, value in (params or {}).items():
+        if key.endswith('_b64'):
+            decoded[key[:-len('_b64')]] = base64.b64decode(value)
+        else:
+            decoded[key] = value
+    return decoded
+
+
+def _call(method, params):
+    """Run one RPC method inside a worker process"""
+    func = _methods.get(method)
+    if func is None:
+        raise ValueError(f"Unknown or unavailable method: {method}")
+    if isinstance(params, list):
+        return func(*params)
+    return func(**_decode_params(params))
+
+
+class WorkerPool:
+    """
+    Pool of warm worker processes shared by every connection
+    Each process is a single-worker executor of its own (a lane). Requests of
+    a stream always run on the same lane, in order, because per-speaker state
+    (decoder, VAD noise floor, detected language, utterance segmenter) lives
+    in that process; requests without a stream go to the least busy lane.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.lanes = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker) for _ in range(workers)]
+        self._busy = [0] * workers
+        self._lock = threading.Lock()
+        # Jobs wait in the scheduler, not in the executors' FIFOs, so they can still be reordered or shed
+        self.scheduler = Scheduler(self._dispatch, capacity=workers)
+
+    def _dispatch(self, method, params, stream):
+        with self._lock:
+            if stream is not None:
+                lane = zlib.crc32(str(stream).encode('utf-8')) % self.workers
+            else:
+                lane = min(range(self.workers), key=self._busy.__getitem__)
+            self._busy[lane] += 1
+        try:
+            future = self.lanes[lane].submit(_call, method, params)
+        except Exception:
+            self._release(lane)
+            raise
+        future.add_done_callback(lambda f: self._release(lane))
+        return future
+
+    def _release(self, lane):
+        with self._lock:
+            self._busy[lane] -= 1
+
+    def warm_up(self):
+        """Start every worker process and wait until its imports are done"""
+        futures = [lane.submit(_call, 'ping', None) for lane in self.lanes]
+        for future in futures:
+            future.result()
+
+    def submit(self, request, reply):
+        """Dispatch a request frame; reply(response) is called when it finishes"""
+        request_id = request.get('id')
+        method = request.get('method')
+        params = request.get('params')
+        if method == 'scheduler_stats':
+            reply({'id': request_id, 'result': self.scheduler.stats()})
+            return
+
+        try:
+            future = self.scheduler.submit(
+                method, params, room=request.get('room'), priority=request.get('priority', 'interactive'),
+                deadline_ms=request.get('deadline_ms'), stream=request.get('stream'), tag=request_id
+            )
+        except Exception as e:
+            reply({'id': request_id, 'error': str(e)})
+            return
+
+        def done(f):
+            try:
+                reply({'id': request_id, 'result': f.result()})
+            except JobShed as e:
+                response = {'id': request_id, 'error': str(e), 'shed': e.reason}
+                if e.merged_into is not None:
+                    response['merged_into'] = e.merged_into
+                reply(response)
+            except Exception as e:
+                reply({'id': request_id, 'error': str(e)})
+
+        future.add_done_callback(done)
+
+    def shutdown(self):
+        for lane in self.lanes:
+            lane.shutdown(wait=True)
+
+
+def serve_stream(pool, reader, writer):
+    """Serve frames from reader until EOF, writing responses to writer"""
+    write_lock = threading.Lock()
+    pending = [0]
+    pending_done = threading.Condition()
+
+    def reply(message):
+        with write_lock:
+            try:
+                write_frame(writer, message)
+            except (BrokenPipeError, OSError) as e:
+                print(f"[WARNING] Could not send response: {e}", file=sys.stderr)
+        with pending_done:
+            pending[0] -= 1
+            pending_done.notify_all()
+
+    while True:
+        try:
+            request = read_frame(reader)
+        except (ValueError, EOFError) as e:
+            print(f"[ERROR] Bad frame: {e}", file=sys.stderr)
+            break
+        if request is None:
+            break
+        with pending_done:
+            pending[0] += 1
+        pool.submit(request, reply)
+
+    # Let in-flight requests finish before the stream is closed
+    with pending_done:
+        pending_done.wait_for(lambda: pending[0] == 0)
+
+
+def serve_stdio(pool):
+    serve_stream(pool, sys.stdin.buffer, sys.stdout.buffer)
+
+
+def serve_socket(pool, address):
+    """Serve on a unix socket path or a (host, port) TCP address"""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            serve_stream(pool, self.rfile, self.wfile)
+
+    if isinstance(address, tuple):
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+    else:
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(address):
+            os.unlink(address)
+
+    with Server(address, Handler) as server:
+        print(f"[INFO] Worker listening on {address}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if not isinstance(address, tuple) and os.path.exists(address):
+                os.unlink(address)
+
+
+class WorkerClient:
+    """
+    Simple synchronous client: spawns `worker.py --stdio` or connects to a socket
+    """
+
+    def __init__(self, socket_path=None, tcp_address=None, workers=2):
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._process = None
+        self._sock = None
+
+        if socket_path or tcp_address:
+            if socket_path:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.connect(socket_path)
+            else:
+                self._sock = socket.create_connection(tcp_address)
+            self._reader = self._sock.makefile('rb')
+            self._writer = self._sock.makefile('wb')
+        else:
+            self._process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--stdio', '--workers', str(workers)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            self._reader = self._process.stdout
+            self._writer = self._process.stdin
+
+    def call(self, method, params=None):
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            write_frame(self._writer, {'id': request_id, 'method': method, 'params': params})
+            response = read_frame(self._reader)
+        if response is None:
+            raise EOFError("Worker closed the connection")
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response.get('result')
+
+    def close(self):
+        if self._process:
+            self._process.stdin.close()
+            self._process.wait()
+        if self._sock:
+            self._sock.close()
+
+
+def parse_tcp_address(value):
+    host, _, port = value.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent STT/translation/TTS worker")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--stdio', action='store_true', help="serve frames on stdin/stdout")
+    mode.add_argument('--socket', help="serve on a unix socket path")
+    mode.add_argument('--tcp', help="serve on host:port")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PYTHON_WORKERS', '2')),
+                        help="number of warm worker processes")
+    parser.add_argument('--metrics-port', type=int, default=int(os.getenv('METRICS_PORT', '0')),
+                        help="serve Prometheus metrics of all workers on this port")
+    args = parser.parse_args()
+
+    metrics_dir = None  # created here, so removed here
+    if args.metrics_port:
+        # Worker processes inherit METRICS_DIR and drop their snapshots there
+        if not os.getenv('METRICS_DIR'):
+            import tempfile
+            metrics_dir = os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='voice-metrics-')
+        import metrics
+        metrics.start_http_server(args.metrics_port)
+
+    # server.js stops the worker with SIGTERM: shut the lanes down rather than orphan them
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    pool = WorkerPool(workers=max(1, args.workers))
+    pool.warm_up()
+    try:
+        if args.stdio:
+            serve_stdio(pool)
+        elif args.socket:
+            serve_socket(pool, args.socket)
+        else:
+            serve_socket(pool, parse_tcp_address(args.tcp))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+        if metrics_dir:
+            import shutil
+            metrics.close()  # or its exit snapshot would recreate the directory
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
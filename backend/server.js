@@ -1,12 +1,23 @@
 const express = require("express");
 const cors = require("cors");
 const multer = require("multer");
-const { exec } = require("child_process");
+const { exec, spawn } = require("child_process");
 const WebSocket = require('ws');
 const http = require('http');
 const fs = require('fs');
 const path = require('path');
 
+// synthesize.py prints the file it wrote last: with TTS_OUTPUT_FORMAT set to a
+// compressed format its extension differs from the requested .wav path
+function synthesizedFile(stdout, requestedPath) {
+  const lines = (stdout || '').trim().split('\n');
+  const written = lines[lines.length - 1].trim();
+  return written && fs.existsSync(written) ? written : requestedPath;
+}
+
+// Most recent /tts or /translate-speech output, served by /audio
+let lastSynthesizedFile = 'output.wav';
+
 const app = express();
 const server = http.createServer(app);
 const wss = new WebSocket.Server({ server });
@@ -33,6 +44,359 @@ const upload = multer({ dest: "uploads/" });
 const rooms = new Map();
 const clients = new Map();
 
+// With AUDIO_RING=1, room audio chunks are written once into a shared-memory
+// ring that a resident python/shm_ring.py transcribes in place, instead of a
+// temp file per chunk read back by a new Python process. The ring layout is
+// documented in python/shm_ring.py.
+const RING_SLOTS = parseInt(process.env.SHM_RING_SLOTS || '64', 10);
+const RING_SLOT_BYTES = parseInt(process.env.SHM_RING_SLOT_BYTES || String(256 * 1024), 10);
+const RING_HEADER_SIZE = 64;
+const RING_SLOT_HEADER_SIZE = 128;
+const RING_HEAD = 16, RING_TAIL = 24, RING_DROPPED = 32;
+// A frame not answered within this time is transcribed elsewhere (worker or scripts)
+const RING_TIMEOUT_MS = parseInt(process.env.AUDIO_RING_TIMEOUT_MS || '15000', 10);
+
+function startAudioRing() {
+  const ringDir = process.env.SHM_RING_DIR || (fs.existsSync('/dev/shm') ? '/dev/shm' : require('os').tmpdir());
+  const ringPath = path.join(ringDir, `voice-audio-${process.pid}.ring`);
+  const fd = fs.openSync(ringPath, 'w+');
+  fs.ftruncateSync(fd, RING_HEADER_SIZE + RING_SLOTS * (RING_SLOT_HEADER_SIZE + RING_SLOT_BYTES));
+  const header = Buffer.alloc(RING_HEADER_SIZE);
+  header.write('VRNG', 0, 'latin1');
+  header.writeUInt32LE(1, 4);
+  header.writeUInt32LE(RING_SLOTS, 8);
+  header.writeUInt32LE(RING_SLOT_BYTES, 12);
+  fs.writeSync(fd, header, 0, RING_HEADER_SIZE, 0);
+
+  const word = Buffer.alloc(8);
+  const readU64 = offset => {
+    fs.readSync(fd, word, 0, 8, offset);
+    return Number(word.readBigUInt64LE(0));
+  };
+  const writeU64 = (offset, value) => {
+    word.writeBigUInt64LE(BigInt(value), 0);
+    fs.writeSync(fd, word, 0, 8, offset);
+  };
+
+  let head = 0;
+  let running = true;
+  const pending = new Map(); // seq -> { callback(err, result), timer }
+  const consumer = spawn('python', ['python/shm_ring.py', '--serve', ringPath]);
+  process.on('exit', () => {
+    consumer.kill();
+    try { fs.unlinkSync(ringPath); } catch (e) {}
+  });
+  let consumerBuffer = '';
+  consumer.stdout.setEncoding('utf8');
+  consumer.stdout.on('data', chunk => {
+    consumerBuffer += chunk;
+    let newline;
+    while ((newline = consumerBuffer.indexOf('\n')) !== -1) {
+      const line = consumerBuffer.slice(0, newline);
+      consumerBuffer = consumerBuffer.slice(newline + 1);
+      let result;
+      try {
+        result = JSON.parse(line);
+      } catch (e) {
+        continue;
+      }
+      const entry = pending.get(result.seq);
+      if (entry) {
+        pending.delete(result.seq);
+        clearTimeout(entry.timer);
+        entry.callback(null, result);
+      }
+    }
+  });
+  consumer.stderr.on('data', chunk => process.stderr.write(chunk));
+  consumer.on('exit', code => {
+    // Chunks still in the ring go back to the file-based path
+    console.error(`Audio ring transcriber exited (${code}), falling back to temp files`);
+    running = false;
+    const waiting = Array.from(pending.values());
+    pending.clear();
+    waiting.forEach(entry => {
+      clearTimeout(entry.timer);
+      entry.callback(new Error('transcriber exited'));
+    });
+  });
+
+  return {
+    // Returns false when the chunk cannot go through the ring (full, too large, transcriber gone)
+    transcribe(data, { stream = '', format = 'webm', sampleRate = 48000, language = '' }, callback) {
+      if (!running || data.length > RING_SLOT_BYTES) {
+        return false;
+      }
+      if (head - readU64(RING_TAIL) >= RING_SLOTS) {
+        writeU64(RING_DROPPED, readU64(RING_DROPPED) + 1);
+        return false;
+      }
+      const seq = head + 1;
+      const offset = RING_HEADER_SIZE + ((seq - 1) % RING_SLOTS) * (RING_SLOT_HEADER_SIZE + RING_SLOT_BYTES);
+      fs.writeSync(fd, data, 0, data.length, offset + RING_SLOT_HEADER_SIZE);
+      const slot = Buffer.alloc(RING_SLOT_HEADER_SIZE);
+      slot.writeUInt32LE(data.length, 8);
+      slot.writeUInt32LE(sampleRate, 12);
+      slot.write(format, 16, 8, 'utf8');
+      slot.write(language, 24, 8, 'utf8');
+      slot.write(stream, 32, 96, 'utf8');
+      fs.writeSync(fd, slot, 8, RING_SLOT_HEADER_SIZE - 8, offset + 8);
+      // Publish: the slot's seq last, then head
+      writeU64(offset, seq);
+      writeU64(RING_HEAD, seq);
+      head = seq;
+      const timer = setTimeout(() => {
+        // A late answer for this frame is ignored. Cancel it in the ring too,
+        // so a consumer that has not started on it skips it instead of
+        // feeding the same audio to its segmenter as the fallback does.
+        if (pending.delete(seq)) {
+          if (readU64(RING_TAIL) < seq) {
+            writeU64(offset, 0);
+          }
+          callback(new Error(`frame ${seq} timed out after ${RING_TIMEOUT_MS} ms`));
+        }
+      }, RING_TIMEOUT_MS);
+      pending.set(seq, { callback, timer });
+      return true;
+    }
+  };
+}
+
+const audioRing = process.env.AUDIO_RING === '1' ? startAudioRing() : null;
+
+// Resident python/worker.py, started once: transcription and translation go
+// over its length-prefixed JSON frames (protocol in python/worker.py), so the
+// translation cache, VAD noise floors, session languages and recognizer stay
+// warm between calls. While it is down, calls run the per-call scripts.
+const WORKER_TIMEOUT_MS = parseInt(process.env.WORKER_TIMEOUT_MS || '30000', 10);
+
+function startPythonWorker() {
+  let child = null;
+  let nextId = 0;
+  let received = Buffer.alloc(0);
+  let stopping = false;
+  const pending = new Map(); // id -> { callback, timer }
+
+  const failAll = reason => {
+    const waiting = Array.from(pending.values());
+    pending.clear();
+    waiting.forEach(entry => {
+      clearTimeout(entry.timer);
+      entry.callback(new Error(reason));
+    });
+  };
+
+  const start = () => {
+    const worker = spawn('python', ['python/worker.py', '--stdio', '--workers', process.env.PYTHON_WORKERS || '2']);
+    child = worker;
+    received = Buffer.alloc(0);
+    worker.stdout.on('data', chunk => {
+      received = Buffer.concat([received, chunk]);
+      while (received.length >= 4 && received.length >= 4 + received.readUInt32BE(0)) {
+        const length = received.readUInt32BE(0);
+        const payload = received.subarray(4, 4 + length);
+        received = received.subarray(4 + length);
+        let response;
+        try {
+          response = JSON.parse(payload.toString('utf8'));
+        } catch (e) {
+          continue;
+        }
+        const entry = pending.get(response.id);
+        if (!entry) {
+          continue; // timed out already
+        }
+        pending.delete(response.id);
+        clearTimeout(entry.timer);
+        if (response.error !== undefined) {
+          const err = new Error(response.error);
+          err.shed = response.shed;
+          entry.callback(err);
+        } else {
+          entry.callback(null, response.result);
+        }
+      }
+    });
+    worker.stderr.on('data', chunk => process.stderr.write(chunk));
+    worker.stdin.on('error', () => {});
+    let exited = false;
+    const onExit = reason => {
+      if (exited) return;
+      exited = true;
+      child = null;
+      failAll(reason);
+      if (!stopping) {
+        console.error(`Python worker stopped (${reason}), using per-call scripts until it restarts`);
+        setTimeout(start, 5000);
+      }
+    };
+    worker.on('error', err => onExit(err.message));
+    worker.on('exit', code => onExit(`exit code ${code}`));
+  };
+
+  start();
+  process.on('exit', () => {
+    stopping = true;
+    if (child) child.kill();
+  });
+
+  return {
+    // callback(err, result); err.shed is set when the scheduler dropped a stale live request
+    call(method, params, options, callback) {
+      if (!child) {
+        callback(new Error('worker not running'));
+        return;
+      }
+      const id = ++nextId;
+      const payload = Buffer.from(JSON.stringify({ id, method, params, ...options }), 'utf8');
+      const header = Buffer.alloc(4);
+      header.writeUInt32BE(payload.length, 0);
+      const timer = setTimeout(() => {
+        if (pending.delete(id)) {
+          callback(new Error(`${method} timed out after ${WORKER_TIMEOUT_MS} ms`));
+        }
+      }, WORKER_TIMEOUT_MS);
+      pending.set(id, { callback, timer });
+      child.stdin.write(Buffer.concat([header, payload]));
+    }
+  };
+}
+
+const pythonWorker = process.env.PYTHON_WORKER === '0' ? null : startPythonWorker();
+
+// Resident python/tts_pool.py --stdio: the engine processes are started once
+// and shared by every utterance. While it is down, each batch spawns its own pool.
+function startTTSPool() {
+  let child = null;
+  let nextId = 0;
+  let stopping = false;
+  const pending = new Map(); // id -> { onResult, onDone }
+
+  const start = () => {
+    const pool = spawn('python', ['python/tts_pool.py', '--stdio']);
+    child = pool;
+    let received = '';
+    pool.stdout.setEncoding('utf8');
+    pool.stdout.on('data', chunk => {
+      received += chunk;
+      let newline;
+      while ((newline = received.indexOf('\n')) !== -1) {
+        const line = received.slice(0, newline);
+        received = received.slice(newline + 1);
+        let message;
+        try {
+          message = JSON.parse(line);
+        } catch (e) {
+          continue;
+        }
+        const entry = pending.get(message.id);
+        if (!entry) continue;
+        if (message.done) {
+          pending.delete(message.id);
+          entry.onDone();
+        } else {
+          entry.onResult(message);
+        }
+      }
+    });
+    pool.stderr.on('data', chunk => process.stderr.write(chunk));
+    pool.stdin.on('error', () => {});
+    let exited = false;
+    const onExit = reason => {
+      if (exited) return;
+      exited = true;
+      child = null;
+      // Jobs the pool never reported count as failed
+      const waiting = Array.from(pending.values());
+      pending.clear();
+      waiting.forEach(entry => entry.onDone());
+      if (!stopping) {
+        console.error(`TTS pool stopped (${reason}), spawning one per batch until it restarts`);
+        setTimeout(start, 5000);
+      }
+    };
+    pool.on('error', err => onExit(err.message));
+    pool.on('exit', code => onExit(`exit code ${code}`));
+  };
+
+  start();
+  process.on('exit', () => {
+    stopping = true;
+    if (child) child.kill();
+  });
+
+  return {
+    // Returns false when the pool is not running
+    synthesize(jobs, onResult, onDone) {
+      if (!child) return false;
+      const id = ++nextId;
+      pending.set(id, { onResult, onDone });
+      child.stdin.write(JSON.stringify({ id, jobs }) + '\n');
+      return true;
+    }
+  };
+}
+
+const ttsPool = process.env.TTS_POOL === '0' ? null : startTTSPool();
+
+// onResult(result) per job as soon as that language is ready ({index, output_path
+// or error, ...}, see python/tts_pool.py), then onDone() once the batch is over
+function synthesizeBatch(jobs, onResult, onDone) {
+  if (ttsPool && ttsPool.synthesize(jobs, onResult, onDone)) {
+    return;
+  }
+  const tts = spawn('python', ['python/tts_pool.py']);
+  let ttsBuffer = '';
+  tts.stdout.setEncoding('utf8');
+  tts.stdout.on('data', chunk => {
+    ttsBuffer += chunk;
+    let newline;
+    while ((newline = ttsBuffer.indexOf('\n')) !== -1) {
+      const line = ttsBuffer.slice(0, newline);
+      ttsBuffer = ttsBuffer.slice(newline + 1);
+      try {
+        onResult(JSON.parse(line));
+      } catch (e) {
+        continue;
+      }
+    }
+  });
+  tts.stderr.on('data', data => process.stderr.write(data));
+  tts.on('error', err => console.error('TTS pool error:', err.message));
+  tts.on('close', () => onDone());
+  tts.stdin.end(JSON.stringify(jobs));
+}
+
+// Run method on the worker; fallback() (the per-call script) when it is down,
+// times out or fails. A shed live request is passed on: it is too late to retry.
+function callWorker(method, params, options, fallback, callback) {
+  if (!pythonWorker) {
+    fallback();
+    return;
+  }
+  pythonWorker.call(method, params, options, (err, result) => {
+    if (err && !err.shed) {
+      console.error(`Worker ${method} failed (${err.message}), running the script instead`);
+      fallback();
+      return;
+    }
+    callback(err, result, '');
+  });
+}
+
+// callback(err, text, stderr), like exec of transcribe.py
+function transcribeFile(audioPath, language, callback) {
+  const script = () => exec(`python python/transcribe.py ${JSON.stringify(audioPath)}${language ? ` ${language}` : ''}`, callback);
+  callWorker('transcribe_audio', { audio_file_path: audioPath, language: language || 'auto' }, {}, script, callback);
+}
+
+// callback(err, translatedText, stderr), like exec of translate.py
+function translateText(text, targetLang, sourceLang, callback) {
+  const script = () => exec(`python python/translate.py ${JSON.stringify(text)} ${targetLang}${sourceLang ? ` ${sourceLang}` : ''}`,
+    { encoding: 'utf8' }, callback);
+  callWorker('translate_text', { text, target_lang: targetLang, source_lang: sourceLang || 'auto' }, {}, script, callback);
+}
+
 // Room password validation
 function validateRoomPassword(roomId, password) {
   const room = rooms.get(roomId);
@@ -157,6 +521,33 @@ function leaveRoom(ws) {
   
   const { roomId, userId, userName } = clientInfo;
   const room = rooms.get(roomId);
+
+  // The speaker's last, unfinished utterance is still in a segmenter: the
+  // ring transcriber's, or the worker's for chunks that fell back to it.
+  // Flush both; each keeps its own state for the stream.
+  const stream = `${roomId}:${userId}`;
+  const broadcastRest = (err, texts) => {
+    const text = err ? '' : (texts || []).join(' ').trim();
+    if (text) {
+      broadcastToRoom(roomId, {
+        type: 'stt-result',
+        text,
+        timestamp: Date.now(),
+        fromUser: userId,
+        fromUserName: userName,
+        senderLang: clientInfo.language
+      });
+    }
+  };
+  const flushMeta = { stream, format: 'flush', language: clientInfo.language };
+  if (audioRing) {
+    audioRing.transcribe(Buffer.alloc(0), flushMeta,
+      (err, result) => broadcastRest(err || result.error, result && result.texts));
+  }
+  if (pythonWorker) {
+    pythonWorker.call('flush_speaker', { speaker: stream, language: clientInfo.language },
+      { room: roomId, stream }, broadcastRest);
+  }
   
   if (room) {
     room.clients.delete(ws);
@@ -193,24 +584,77 @@ function broadcastToRoom(roomId, message, excludeWs = null) {
 
 async function processAudioChunkForRoom(audioData, senderLang, roomId, senderWs) {
   const timestamp = Date.now();
-  const audioPath = `uploads/room_chunk_${timestamp}.webm`;
-  
-  // Save audio chunk
   const buffer = Buffer.from(audioData, 'base64');
-  fs.writeFileSync(audioPath, buffer);
   
   const senderInfo = clients.get(senderWs);
   if (!senderInfo) return;
   
   console.log(`[DEBUG] Processing audio from ${senderInfo.userName} in language: ${senderLang}`);
   
+  // Shared-memory handoff to the resident transcriber (which also does the offline fallback)
+  const ringMeta = { stream: `${roomId}:${senderInfo.userId}`, format: 'webm', language: senderLang };
+  if (audioRing && audioRing.transcribe(buffer, ringMeta, (ringErr, result) => {
+    if (ringErr) {
+      console.error(`Audio ring: ${ringErr.message}, transcribing the chunk elsewhere`);
+      transcribeChunk(buffer, senderLang, roomId, senderWs, timestamp);
+      return;
+    }
+    if (result.error) {
+      console.error('Both STT methods failed:', result.error);
+      return;
+    }
+    continueWithUtterances(result.texts, senderLang, roomId, senderWs, timestamp, buffer);
+  })) {
+    return;
+  }
+  transcribeChunk(buffer, senderLang, roomId, senderWs, timestamp);
+}
+
+// Utterances a chunk completed (python/segmenter.py), passed on as one text
+function continueWithUtterances(texts, senderLang, roomId, senderWs, timestamp, buffer) {
+  const cleanText = (texts || [])
+    .map(text => text.trim())
+    .filter(text => text && text !== 'No audio detected' && !text.includes('Could not understand audio'))
+    .join(' ');
+  console.log(`[DEBUG] Transcribed text: "${cleanText}"`);
+  if (cleanText) {
+    continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, timestamp, null, buffer);
+  }
+}
+
+// Through the speaker's utterance segmenter on the worker, as a live job of
+// the room (the worker falls back to the offline model itself); the
+// temp-file scripts when the worker is down
+function transcribeChunk(buffer, senderLang, roomId, senderWs, timestamp) {
+  const senderInfo = clients.get(senderWs);
+  const stream = senderInfo ? `${roomId}:${senderInfo.userId}` : roomId;
+  const fallback = () => transcribeChunkFile(buffer, senderLang, roomId, senderWs, timestamp);
+  const params = { speaker: stream, data_b64: buffer.toString('base64'), language: senderLang, audio_format: 'webm' };
+  callWorker('transcribe_chunk', params, { room: roomId, priority: 'live', stream }, fallback, (err, texts) => {
+    if (err) {
+      console.log(`[DEBUG] Chunk from ${stream} not transcribed: ${err.message}`);
+      return;
+    }
+    continueWithUtterances(texts, senderLang, roomId, senderWs, timestamp, buffer);
+  });
+}
+
+function transcribeChunkFile(buffer, senderLang, roomId, senderWs, timestamp) {
+  const audioPath = `uploads/room_chunk_${timestamp}.webm`;
+  
+  // Save audio chunk
+  fs.writeFileSync(audioPath, buffer);
+  
   // Process through pipeline with language hint
   exec(`python python/transcribe.py ${audioPath} ${senderLang}`, (err, transcribedText) => {
     if (err || transcribedText.includes('service error') || transcribedText.includes('internet')) {
       console.log('Online STT failed, trying offline fallback...');
-      exec(`python python/transcribe_offline.py ${audioPath}`, (err2, fallbackText) => {
+      exec(`python python/transcribe_offline.py ${audioPath} ${senderLang}`, (err2, fallbackText) => {
         if (!err2) {
-          continueProcessingForRoom(fallbackText.trim(), senderLang, roomId, senderWs, timestamp, audioPath);
+          const offlineText = fallbackText.trim();
+          if (offlineText && offlineText !== 'No audio detected') {
+            continueProcessingForRoom(offlineText, senderLang, roomId, senderWs, timestamp, audioPath);
+          }
         } else {
           console.error('Both STT methods failed');
         }
@@ -225,7 +669,8 @@ async function processAudioChunkForRoom(audioData, senderLang, roomId, senderWs)
   });
 }
 
-function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, timestamp, audioPath) {
+// audioPath: the uploaded chunk, or null when it came through the audio ring (audioBuffer)
+function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, timestamp, audioPath, audioBuffer) {
   const senderInfo = clients.get(senderWs);
   const room = rooms.get(roomId);
   if (!room || !senderInfo) {
@@ -234,12 +679,16 @@ function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, time
   }
   
   // Step 1: Broadcast original audio to everyone in the room
-  const originalAudioUrl = `/static/original_audio_${roomId}_${timestamp}.wav`;
+  const originalAudioUrl = `/static/original_audio_${roomId}_${timestamp}.webm`;
   
   // Convert original audio to a standard format and save it
   try {
-    // Try to copy the original file without FFmpeg
-    fs.copyFileSync(audioPath, `public/original_audio_${roomId}_${timestamp}.wav`);
+    // The upload is already compressed WebM/Opus: relay it as is, under its real extension
+    if (audioPath) {
+      fs.copyFileSync(audioPath, `public/original_audio_${roomId}_${timestamp}.webm`);
+    } else {
+      fs.writeFileSync(`public/original_audio_${roomId}_${timestamp}.webm`, audioBuffer);
+    }
     console.log('Original audio file copied successfully');
     
     // Broadcast original audio to all room participants
@@ -283,16 +732,43 @@ function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, time
     // No translation needed, cleanup and return
     setTimeout(() => {
       try { 
-        fs.unlinkSync(audioPath);
-        fs.unlinkSync(`public/original_audio_${roomId}_${timestamp}.wav`);
+        if (audioPath) fs.unlinkSync(audioPath);
+        fs.unlinkSync(`public/original_audio_${roomId}_${timestamp}.webm`);
       } catch (e) {}
     }, 60000);
     return;
   }
   
-  targetLanguages.forEach(targetLang => {
-    // Translation step with source language
-    exec(`python python/translate.py "${cleanText}" ${targetLang} ${senderLang}`, (err, translatedText) => {
+  // Translate into every target language with one call (detects the source
+  // once). The script prints plain text for a single target, JSON for several.
+  const targetList = Array.from(targetLanguages);
+  const translateScript = () => exec(`python python/translate.py "${cleanText}" ${targetList.join(',')} ${senderLang}`, (multiErr, multiOutput) => {
+    let translations = {};
+    if (!multiErr) {
+      try {
+        translations = totalLanguages > 1 ? JSON.parse(multiOutput) : { [targetList[0]]: multiOutput };
+      } catch (parseErr) {
+        multiErr = parseErr;
+      }
+    }
+    synthesizeTranslations(multiErr, translations);
+  });
+  callWorker('translate_text_multi', { text: cleanText, target_langs: targetList, source_lang: senderLang },
+    { room: roomId, priority: 'live', stream: `${roomId}:${senderInfo.userId}` }, translateScript,
+    (err, translations) => synthesizeTranslations(err, translations || {}));
+
+  function synthesizeTranslations(multiErr, translations) {
+    // Step 4: broadcast the first translation, then synthesize every language
+    // in one batch over a pool of pre-initialized TTS engines
+    if (multiErr && multiErr.shed) {
+      // Too late to be useful: dropped quietly, like a shed chunk
+      console.log(`[DEBUG] Translation of "${cleanText}" not run: ${multiErr.message}`);
+      return;
+    }
+    const ttsJobs = [];
+    targetList.forEach(targetLang => {
+      const err = multiErr || (translations[targetLang] ? null : new Error(`No translation for ${targetLang}`));
+      const translatedText = translations[targetLang] || '';
       if (err) {
         console.error('Translation error:', err.message);
         // Send error to room
@@ -307,7 +783,7 @@ function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, time
       console.log(`[DEBUG] Translated from ${senderLang} to ${targetLang}: "${cleanTranslation}"`);
       
       // Send translation result to everyone (first language processed)
-      if (processedLanguages === 0) {
+      if (ttsJobs.length === 0) {
         broadcastToRoom(roomId, {
           type: 'translation-result', 
           originalText: cleanText,
@@ -319,64 +795,101 @@ function continueProcessingForRoom(cleanText, senderLang, roomId, senderWs, time
         });
       }
       
-      // TTS step for this specific language
-      const outputPath = `public/room_audio_${roomId}_${targetLang}_${timestamp}.wav`;
-      exec(`python python/synthesize.py "${cleanTranslation}" ${targetLang} ${outputPath}`, (err) => {
-        if (err) {
-          console.error('TTS error:', err.message);
-          // Send error to room
-          broadcastToRoom(roomId, {
-            type: 'error',
-            message: `Audio generation for ${targetLang} failed`
-          });
-          return;
-        }
-        
-        // Send translated audio to users who speak this target language
-        room.clients.forEach((clientInfo, clientWs) => {
-          if (clientInfo.language === targetLang && clientWs.readyState === WebSocket.OPEN) {
-            clientWs.send(JSON.stringify({
-              type: 'translated-audio',
-              audioUrl: `/static/room_audio_${roomId}_${targetLang}_${timestamp}.wav`,
-              originalText: cleanText,
-              translatedText: cleanTranslation,
-              targetLang: targetLang,
-              senderLang: senderLang,
-              fromUser: senderInfo.userId,
-              fromUserName: senderInfo.userName,
-              timestamp
-            }));
-          }
-        });
-        
-        processedLanguages++;
-        
-        // Cleanup files after all languages are processed
-        if (processedLanguages === totalLanguages) {
-          setTimeout(() => {
+      ttsJobs.push({
+        text: cleanTranslation,
+        language: targetLang,
+        output_path: `public/room_audio_${roomId}_${targetLang}_${timestamp}.wav`
+      });
+    });
+
+    if (ttsJobs.length === 0) {
+      return;
+    }
+
+    const writtenFiles = [];
+    const finishLanguage = () => {
+      processedLanguages++;
+      
+      // Cleanup files after all languages are processed
+      if (processedLanguages === ttsJobs.length) {
+        setTimeout(() => {
+          try {
+            if (audioPath) fs.unlinkSync(audioPath);
             try {
-              fs.unlinkSync(audioPath);
+              fs.unlinkSync(`public/original_audio_${roomId}_${timestamp}.webm`);
+            } catch (e) {
+              console.log('Original audio cleanup error:', e.message);
+            }
+            // Clean up all generated audio files for this timestamp
+            writtenFiles.forEach(file => {
               try {
-                fs.unlinkSync(`public/original_audio_${roomId}_${timestamp}.wav`);
+                fs.unlinkSync(file);
               } catch (e) {
-                console.log('Original audio cleanup error:', e.message);
+                console.log('Audio cleanup error:', e.message);
               }
-              // Clean up all generated audio files for this timestamp
-              targetLanguages.forEach(lang => {
-                try {
-                  fs.unlinkSync(`public/room_audio_${roomId}_${lang}_${timestamp}.wav`);
-                } catch (e) {
-                  console.log('Audio cleanup error:', e.message);
-                }
-              });
-            } catch (e) {
-              console.log('Main cleanup error:', e.message);
-            }
-          }, 60000); // Keep files for 1 minute
+            });
+          } catch (e) {
+            console.log('Main cleanup error:', e.message);
+          }
+        }, 60000); // Keep files for 1 minute
+      }
+    };
+
+    // Each language is sent as soon as it is ready
+    const reported = new Set();
+    synthesizeBatch(ttsJobs, result => {
+      const job = ttsJobs[result.index];
+      if (!job || reported.has(result.index)) {
+        return;
+      }
+      reported.add(result.index);
+      const targetLang = job.language;
+
+      if (result.error || !result.output_path) {
+        console.error('TTS error:', result.error || 'no audio');
+        // Send error to room
+        broadcastToRoom(roomId, {
+          type: 'error',
+          message: `Audio generation for ${targetLang} failed`
+        });
+        finishLanguage();
+        return;
+      }
+      writtenFiles.push(result.output_path);
+      console.log(`[DEBUG] TTS ${targetLang}: queue ${Math.round(result.queue_ms)} ms, synthesis ${Math.round(result.synthesis_ms)} ms${result.cached ? ' (cached)' : ''}`);
+      
+      // Send translated audio to users who speak this target language
+      room.clients.forEach((clientInfo, clientWs) => {
+        if (clientInfo.language === targetLang && clientWs.readyState === WebSocket.OPEN) {
+          clientWs.send(JSON.stringify({
+            type: 'translated-audio',
+            audioUrl: `/static/${path.basename(result.output_path)}`,
+            originalText: cleanText,
+            translatedText: job.text,
+            targetLang: targetLang,
+            senderLang: senderLang,
+            fromUser: senderInfo.userId,
+            fromUserName: senderInfo.userName,
+            timestamp
+          }));
+        }
+      });
+      finishLanguage();
+    }, () => {
+      // Languages the batch never reported (crash, missing engine) count as failed
+      ttsJobs.forEach((job, index) => {
+        if (!reported.has(index)) {
+          reported.add(index);
+          console.error(`TTS error: no result for ${job.language}`);
+          broadcastToRoom(roomId, {
+            type: 'error',
+            message: `Audio generation for ${job.language} failed`
+          });
+          finishLanguage();
         }
       });
     });
-  });
+  }
 }
 
 async function processAudioChunk(audioData, targetLang, ws) {
@@ -388,7 +901,7 @@ async function processAudioChunk(audioData, targetLang, ws) {
   fs.writeFileSync(audioPath, buffer);
   
   // Process through pipeline
-  exec(`python python/transcribe.py ${audioPath}`, (err, transcribedText) => {
+  transcribeFile(audioPath, null, (err, transcribedText) => {
     if (err) {
       ws.send(JSON.stringify({ type: 'error', step: 'STT', message: err.message }));
       return;
@@ -404,7 +917,7 @@ async function processAudioChunk(audioData, targetLang, ws) {
     }));
     
     // Translation step
-    exec(`python python/translate.py "${cleanText}" ${targetLang}`, (err, translatedText) => {
+    translateText(cleanText, targetLang, null, (err, translatedText) => {
       if (err) {
         ws.send(JSON.stringify({ type: 'error', step: 'Translation', message: err.message }));
         return;
@@ -421,15 +934,16 @@ async function processAudioChunk(audioData, targetLang, ws) {
       
       // TTS step
       const outputPath = `public/audio_${timestamp}.wav`;
-      exec(`python python/synthesize.py "${cleanTranslation}" ${targetLang} ${outputPath}`, (err) => {
+      exec(`python python/synthesize.py "${cleanTranslation}" ${targetLang} ${outputPath}`, (err, stdout) => {
         if (err) {
           ws.send(JSON.stringify({ type: 'error', step: 'TTS', message: err.message }));
           return;
         }
+        const audioFile = synthesizedFile(stdout, outputPath);
         
         ws.send(JSON.stringify({ 
           type: 'audio-ready', 
-          audioUrl: `/static/audio_${timestamp}.wav`,
+          audioUrl: `/static/${path.basename(audioFile)}`,
           originalText: cleanText,
           translatedText: cleanTranslation,
           timestamp 
@@ -439,7 +953,7 @@ async function processAudioChunk(audioData, targetLang, ws) {
         setTimeout(() => {
           try {
             fs.unlinkSync(audioPath);
-            fs.unlinkSync(outputPath);
+            fs.unlinkSync(audioFile);
           } catch (e) {}
         }, 30000);
       });
@@ -496,21 +1010,22 @@ app.post("/translate-speech", upload.single("audio"), (req, res) => {
   const audioPath = req.file.path;
   
   // Step 1: Speech-to-Text
-  exec(`python python/transcribe.py ${audioPath}`, (err, transcribedText) => {
+  transcribeFile(audioPath, null, (err, transcribedText) => {
     if (err) return res.status(500).json({ error: "STT error", details: err.message });
     
     const cleanText = transcribedText.trim();
     if (!cleanText) return res.status(400).json({ error: "No speech detected" });
     
     // Step 2: Translation
-    exec(`python python/translate.py "${cleanText}" ${targetLang}`, (err, translatedText) => {
+    translateText(cleanText, targetLang, null, (err, translatedText) => {
       if (err) return res.status(500).json({ error: "Translation error", details: err.message });
       
       const cleanTranslation = translatedText.trim();
       
       // Step 3: Text-to-Speech with target language
-      exec(`python python/synthesize.py "${cleanTranslation}" ${targetLang}`, (err) => {
+      exec(`python python/synthesize.py "${cleanTranslation}" ${targetLang}`, (err, stdout) => {
         if (err) return res.status(500).json({ error: "TTS error", details: err.message });
+        lastSynthesizedFile = synthesizedFile(stdout, 'output.wav');
         
         // Return complete pipeline result
         res.json({
@@ -526,12 +1041,12 @@ app.post("/translate-speech", upload.single("audio"), (req, res) => {
 
 // Get the generated audio file
 app.get("/audio", (req, res) => {
-  res.sendFile(__dirname + "/output.wav");
+  res.sendFile(path.resolve(__dirname, lastSynthesizedFile));
 });
 
 // Individual endpoints for testing
 app.post("/stt", upload.single("audio"), (req, res) => {
-  exec(`python python/transcribe.py ${req.file.path}`, (err, out) => {
+  transcribeFile(req.file.path, null, (err, out) => {
     if (err) return res.status(500).send("STT error");
     res.json({ text: out.trim() });
   });
@@ -541,7 +1056,7 @@ app.post("/translate", (req, res) => {
   const { text, targetLang } = req.body;
   console.log(`Translation request: "${text}" -> ${targetLang}`);
   
-  exec(`python python/translate.py "${text}" ${targetLang}`, { encoding: 'utf8' }, (err, out, stderr) => {
+  translateText(text, targetLang, null, (err, out, stderr) => {
     if (err) {
       console.error('Translation Error:', err.message);
       console.error('Translation Stderr:', stderr);
@@ -566,7 +1081,8 @@ app.post("/tts", (req, res) => {
     }
     
     console.log('TTS completed, sending audio file');
-    res.sendFile(__dirname + "/output.wav");
+    lastSynthesizedFile = synthesizedFile(stdout, 'output.wav');
+    res.sendFile(path.resolve(__dirname, lastSynthesizedFile));
   });
 });
 
@@ -581,7 +1097,7 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
     const audioPath = req.file.path;
 
     // Step 1: Speech-to-text
-    exec(`python python/transcribe.py ${JSON.stringify(audioPath)}`, (sttErr, sttOut, sttStderr) => {
+    transcribeFile(audioPath, null, (sttErr, sttOut, sttStderr) => {
       if (sttErr) {
         console.error('STT error:', sttErr, sttStderr);
         return res.status(500).json({ error: 'STT error', details: sttStderr });
@@ -590,7 +1106,7 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
       const originalText = (sttOut || '').trim();
 
       // Step 2: Translate
-      exec(`python python/translate.py ${JSON.stringify(originalText)} ${targetLang}`, (trErr, trOut, trStderr) => {
+      translateText(originalText, targetLang, null, (trErr, trOut, trStderr) => {
         if (trErr) {
           console.error('Translation error:', trErr, trStderr);
           return res.status(500).json({ error: 'Translation error', details: trStderr });
@@ -614,7 +1130,7 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
             originalText,
             translatedText,
             audioReady: true,
-            audioUrl: `/${outPath}`
+            audioUrl: `/${synthesizedFile(ttsOut, outPath)}`
           });
         });
       });
@@ -633,7 +1149,7 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
   console.log(`Processing audio file: ${audioPath}, target: ${targetLang}`);
   
   // Step 1: Speech-to-Text
-  exec(`python python/transcribe.py ${audioPath}`, (err, transcribedText, stderr) => {
+  transcribeFile(audioPath, null, (err, transcribedText, stderr) => {
     if (err || transcribedText.includes('service error') || transcribedText.includes('internet')) {
       console.log('Online STT failed, trying offline fallback...');
       // Fallback to offline transcription for testing
@@ -645,6 +1161,9 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
         
         const cleanText = fallbackText.trim();
         console.log(`Using fallback transcription: "${cleanText}"`);
+        if (!cleanText || cleanText === 'No audio detected') {
+          return res.status(400).json({ error: "No speech detected or audio unclear" });
+        }
         
         // Continue with translation...
         continueWithTranslation(cleanText, targetLang, videoTimestamp, res);
@@ -664,7 +1183,7 @@ app.post("/live-translate", upload.single("audio"), (req, res) => {
 
 function continueWithTranslation(cleanText, targetLang, videoTimestamp, res) {
   // Step 2: Translation
-  exec(`python python/translate.py "${cleanText}" ${targetLang}`, (err, translatedText, stderr) => {
+  translateText(cleanText, targetLang, null, (err, translatedText, stderr) => {
     if (err) {
       console.error('Translation Error:', err.message);
       console.error('Translation Stderr:', stderr);
@@ -683,14 +1202,15 @@ function continueWithTranslation(cleanText, targetLang, videoTimestamp, res) {
         return res.status(500).json({ error: "TTS error", details: err.message, stderr: stderr });
       }
       
-      console.log(`Audio generated: ${outputFile}`);
+      const audioFile = synthesizedFile(stdout, outputFile);
+      console.log(`Audio generated: ${audioFile}`);
       
       // Return complete pipeline result with video sync
       res.json({
         originalText: cleanText,
         translatedText: cleanTranslation,
         targetLanguage: targetLang,
-        audioUrl: `/${outputFile}`,
+        audioUrl: `/${audioFile}`,
         videoTimestamp: videoTimestamp,
         processingTime: Date.now(),
         audioReady: true
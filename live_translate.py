@@ -1,23 +1,100 @@
-import pyaudio
 import queue
 import threading
 import time
-from google.cloud import speech
-from google.cloud import translate_v2 as translate
+import math
+import wave
+import struct
+import argparse
+from collections import deque
+from types import SimpleNamespace
 
 # Audio recording parameters
 RATE = 16000
 CHUNK = int(RATE / 10)  # 100ms
 
+# Bounded buffers between the pipeline stages
+AUDIO_BUFFER_CHUNKS = 50   # 5 s of audio
+FINALS_BUFFER_SIZE = 20
+
+
+class RingBuffer:
+    """
+    Bounded buffer between two pipeline stages
+    When full, policy 'drop_oldest' discards the oldest item and 'coalesce'
+    merges the new item into the newest queued one (for audio: no samples
+    are lost, the consumer just gets bigger chunks).
+    """
+
+    def __init__(self, maxsize, policy='drop_oldest', merge=None):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._policy = policy
+        self._merge = merge or (lambda older, newer: older + newer)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._items) >= self._maxsize:
+                if self._policy == 'coalesce':
+                    self._items[-1] = self._merge(self._items[-1], item)
+                    self.coalesced += 1
+                    self._cond.notify()
+                    return
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next item, or None once the buffer is closed and drained"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def get_nowait(self):
+        with self._cond:
+            if self._items:
+                return self._items.popleft()
+            if self._closed:
+                return None
+            raise queue.Empty
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+def _merge_audio(older, newer):
+    # Chunks are (capture_time, bytes); keep the newest capture time
+    return (newer[0], older[1] + newer[1])
+
+
 class MicrophoneStream:
-    def __init__(self, rate, chunk):
+    """Captures 16-bit mono audio from the default microphone with pyaudio"""
+
+    def __init__(self, rate, chunk, buffer=None):
         self._rate = rate
         self._chunk = chunk
 
-        self._buff = queue.Queue()
+        self._buff = buffer or RingBuffer(AUDIO_BUFFER_CHUNKS, 'coalesce', _merge_audio)
         self.closed = True
 
     def __enter__(self):
+        import pyaudio
+        self._pyaudio = pyaudio
         self._audio_interface = pyaudio.PyAudio()
         self._audio_stream = self._audio_interface.open(
             format=pyaudio.paInt16,
@@ -36,33 +113,257 @@ class MicrophoneStream:
         self._audio_stream.stop_stream()
         self._audio_stream.close()
         self.closed = True
-        self._buff.put(None)
+        self._buff.close()
         self._audio_interface.terminate()
 
     def _fill_buffer(self, in_data, frame_count, time_info, status_flags):
-        self._buff.put(in_data)
-        return None, pyaudio.paContinue
+        self._buff.put((time.monotonic(), in_data))
+        return None, self._pyaudio.paContinue
 
     def generator(self):
-        while not self.closed:
-            chunk = self._buff.get()
-            if chunk is None:
-                return
-            data = [chunk]
+        return audio_generator(self._buff)
+
+
+class WavFileSource:
+    """Plays a 16 kHz mono 16-bit WAV file into the pipeline in (optionally) real time"""
 
+    def __init__(self, path, chunk=CHUNK, realtime=True):
+        self.path = path
+        self.chunk = chunk
+        self.realtime = realtime
+
+    def run(self, buffer):
+        with wave.open(self.path, 'rb') as wav_file:
+            if wav_file.getframerate() != RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: expected {RATE} Hz mono 16-bit WAV")
+            start = time.monotonic()
+            sent = 0
             while True:
-                try:
-                    chunk = self._buff.get(block=False)
-                    if chunk is None:
-                        return
-                    data.append(chunk)
-                except queue.Empty:
+                frames = wav_file.readframes(self.chunk)
+                if not frames:
                     break
+                if self.realtime:
+                    time.sleep(max(0.0, start + sent / RATE - time.monotonic()))
+                buffer.put((time.monotonic(), frames))
+                sent += len(frames) // 2
+        buffer.close()
+
+
+class SyntheticSource:
+    """Generates a tone with pauses, for running the pipeline without a microphone"""
+
+    def __init__(self, seconds=10.0, frequency=440.0, chunk=CHUNK, realtime=True):
+        self.seconds = seconds
+        self.frequency = frequency
+        self.chunk = chunk
+        self.realtime = realtime
+
+    def run(self, buffer):
+        start = time.monotonic()
+        total = int(self.seconds * RATE)
+        for offset in range(0, total, self.chunk):
+            count = min(self.chunk, total - offset)
+            # 1 s of tone, then 0.5 s of silence
+            samples = [
+                int(8000 * math.sin(2 * math.pi * self.frequency * (offset + i) / RATE))
+                if (offset + i) % (RATE * 3 // 2) < RATE else 0
+                for i in range(count)
+            ]
+            if self.realtime:
+                time.sleep(max(0.0, start + offset / RATE - time.monotonic()))
+            buffer.put((time.monotonic(), struct.pack(f'<{count}h', *samples)))
+        buffer.close()
+
+
+def audio_generator(buffer, state=None):
+    """
+    Yield audio bytes as fast as the recognizer takes them, joining whatever
+    has queued up since the last request (bounded by the buffer size)
+    """
+    while True:
+        item = buffer.get()
+        if item is None:
+            return
+        captured_at, chunk = item
+        data = [chunk]
+
+        while True:
+            try:
+                item = buffer.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            captured_at, chunk = item
+            data.append(chunk)
+
+        if state is not None:
+            state['last_captured_at'] = captured_at
+        yield b''.join(data)
+
+
+class GoogleStreamingRecognizer:
+    """Google Cloud streaming recognition: requests iterator -> responses"""
+
+    def __init__(self, language_code="en-US"):
+        from google.cloud import speech
+        self._speech = speech
+        self._client = speech.SpeechClient()
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=RATE,
+            language_code=language_code,
+        )
+        self._streaming_config = speech.StreamingRecognitionConfig(
+            config=config,
+            interim_results=True,
+        )
+
+    def recognize(self, audio_chunks):
+        requests = (
+            self._speech.StreamingRecognizeRequest(audio_content=content)
+            for content in audio_chunks
+        )
+        return self._client.streaming_recognize(self._streaming_config, requests)
+
+
+class FakeRecognizer:
+    """Offline stand-in: an interim result per chunk, a final one every N chunks"""
+
+    def __init__(self, chunks_per_final=10, delay=0.0):
+        self.chunks_per_final = chunks_per_final
+        self.delay = delay
+
+    def recognize(self, audio_chunks):
+        for index, _ in enumerate(audio_chunks, 1):
+            if self.delay:
+                time.sleep(self.delay)
+            is_final = index % self.chunks_per_final == 0
+            alternative = SimpleNamespace(transcript=f"utterance {index // self.chunks_per_final}")
+            yield SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=is_final)])
+
+
+def google_translate_fn(target_language):
+    from google.cloud import translate_v2 as translate
+    translate_client = translate.Client()
+
+    def translate_text(text):
+        return translate_client.translate(text, target_language=target_language)['translatedText']
+    return translate_text
+
+
+class StageStats:
+    """Latency samples (seconds) per pipeline stage"""
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[stage] = {
+                    'count': len(ordered),
+                    'p50_ms': ordered[len(ordered) // 2] * 1000,
+                    'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                    'max_ms': ordered[-1] * 1000,
+                }
+            return result
+
+
+class TranslationPipeline:
+    """
+    capture -> recognition -> translation, each on its own thread, connected by
+    bounded buffers. Translation of final results never blocks recognition.
+    """
+
+    def __init__(self, recognizer, translate_fn, on_interim=None, on_final=None, on_translation=None):
+        self.recognizer = recognizer
+        self.translate_fn = translate_fn
+        self.on_interim = on_interim or (lambda text: print(f"Original: {text}"))
+        self.on_final = on_final or (lambda text: print(f"Original: {text}"))
+        self.on_translation = on_translation or (lambda text, translated: print(f"Translated: {translated}"))
 
-            yield b''.join(data)
+        self.audio_buffer = RingBuffer(AUDIO_BUFFER_CHUNKS, 'coalesce', _merge_audio)
+        # Finals are only dropped if translation falls hopelessly behind
+        self.finals_buffer = RingBuffer(FINALS_BUFFER_SIZE, 'drop_oldest')
+        self.stats = StageStats()
+
+    def _recognition_loop(self):
+        state = {'last_captured_at': None}
+        try:
+            for response in self.recognizer.recognize(audio_generator(self.audio_buffer, state)):
+                if not response.results:
+                    continue
+
+                result = response.results[0]
+                if not result.alternatives:
+                    continue
+
+                transcript = result.alternatives[0].transcript
+                if state['last_captured_at'] is not None:
+                    self.stats.record('recognition', time.monotonic() - state['last_captured_at'])
+
+                if result.is_final:
+                    self.on_final(transcript)
+                    self.finals_buffer.put((time.monotonic(), transcript))
+                else:
+                    self.on_interim(transcript)
+        finally:
+            self.finals_buffer.close()
+
+    def _translation_loop(self):
+        while True:
+            item = self.finals_buffer.get()
+            if item is None:
+                return
+            queued_at, transcript = item
+            self.stats.record('translation_queue', time.monotonic() - queued_at)
+            start = time.monotonic()
+            try:
+                translated = self.translate_fn(transcript)
+            except Exception as e:
+                print(f"[ERROR] Translation failed: {e}")
+                continue
+            self.stats.record('translation', time.monotonic() - start)
+            self.on_translation(transcript, translated)
+
+    def run(self, source):
+        """Run until the source is exhausted; returns per-stage latency stats"""
+        threads = [
+            threading.Thread(target=source.run, args=(self.audio_buffer,), name='capture', daemon=True),
+            threading.Thread(target=self._recognition_loop, name='recognition', daemon=True),
+            threading.Thread(target=self._translation_loop, name='translation', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        summary = self.stats.summary()
+        summary['buffers'] = {
+            'audio_coalesced': self.audio_buffer.coalesced,
+            'finals_dropped': self.finals_buffer.dropped,
+        }
+        return summary
+
+
+class _MicrophoneSource:
+    """Adapts MicrophoneStream to the source interface used by the pipeline"""
+
+    def run(self, buffer):
+        with MicrophoneStream(RATE, CHUNK, buffer):
+            threading.Event().wait()
 
 
 def listen_print_loop(responses, translate_client, target_language="en"):
+    """Simple synchronous loop: translation of each final blocks recognition"""
     for response in responses:
         if not response.results:
             continue
@@ -80,35 +381,38 @@ def listen_print_loop(responses, translate_client, target_language="en"):
 
 
 def main():
-    # Instantiates clients
-    speech_client = speech.SpeechClient()
-    translate_client = translate.Client()
+    parser = argparse.ArgumentParser(description="Live speech translation pipeline")
+    parser.add_argument('--source', default='mic',
+                        help="'mic', 'synthetic' or a path to a 16 kHz mono WAV file")
+    parser.add_argument('--recognizer', choices=['google', 'fake'], default='google')
+    parser.add_argument('--language', default="en-US", help="language of the input audio")
+    parser.add_argument('--target', default="es", help="target translation language")
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of the synthetic source")
+    parser.add_argument('--fast', action='store_true', help="feed file/synthetic audio faster than real time")
+    args = parser.parse_args()
 
-    # Audio recording parameters
-    language_code = "en-US"  # Language of the input audio
-    target_language = "es"  # Target translation language
+    if args.recognizer == 'google':
+        recognizer = GoogleStreamingRecognizer(args.language)
+        translate_fn = google_translate_fn(args.target)
+    else:
+        recognizer = FakeRecognizer()
+        translate_fn = lambda text: f"[{args.target}] {text}"
 
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=RATE,
-        language_code=language_code,
-    )
-
-    streaming_config = speech.StreamingRecognitionConfig(
-        config=config,
-        interim_results=True,
-    )
-
-    with MicrophoneStream(RATE, CHUNK) as stream:
-        audio_generator = stream.generator()
-        requests = (
-            speech.StreamingRecognizeRequest(audio_content=content)
-            for content in audio_generator
-        )
+    if args.source == 'mic':
+        source = _MicrophoneSource()
+    elif args.source == 'synthetic':
+        source = SyntheticSource(args.seconds, realtime=not args.fast)
+    else:
+        source = WavFileSource(args.source, realtime=not args.fast)
 
-        responses = speech_client.streaming_recognize(streaming_config, requests)
+    pipeline = TranslationPipeline(recognizer, translate_fn)
+    try:
+        summary = pipeline.run(source)
+    except KeyboardInterrupt:
+        summary = pipeline.stats.summary()
 
-        listen_print_loop(responses, translate_client, target_language)
+    for stage, stats in summary.items():
+        print(f"{stage}: {stats}")
 
 
 if __name__ == "__main__":